@@ -0,0 +1,102 @@
+"""Compare the single-pass keyword matcher with the old one-regex-per-keyword approach.
+
+uv run python scripts/bench_keywords.py [--docs 2000] [--doc-chars 20000]
+"""
+import argparse
+import random
+import re
+import string
+import time
+
+import polars as pl
+
+from eurovoc_miner.processor import match_keywords, filter_keyword_matches, keyword_column
+
+
+def legacy_match_keywords(df, keywords):
+    # The pre-Aho-Corasick implementation: one (?i) regex scan per keyword.
+    return df.with_columns([
+        pl.col("text").str.contains(f"(?i){re.escape(kw)}").alias(keyword_column(kw))
+        for kw in keywords
+    ])
+
+
+def legacy_match_whole_words(df, keywords):
+    return df.with_columns([
+        pl.col("text").str.contains(rf"(?i)\b{re.escape(kw)}\b").alias(keyword_column(kw))
+        for kw in keywords
+    ])
+
+
+def check_nested():
+    # A keyword nested in a longer one must still be found, with or without
+    # --whole-word, and the bool, count and offset columns must agree.
+    df = pl.DataFrame({"text": ["Earth observation is key", "earthly matters, earth", "observations", None]})
+    keywords = ["earth", "earth observation", "observation"]
+    for whole_word, legacy in ((False, legacy_match_keywords), (True, legacy_match_whole_words)):
+        matched = match_keywords(df, keywords, whole_word=whole_word)
+        assert legacy(df, keywords).equals(matched), f"nested keywords disagree (whole_word={whole_word})"
+        counts = match_keywords(df, keywords, whole_word=whole_word, output="count")
+        offsets = match_keywords(df, keywords, whole_word=whole_word, output="offset")
+        for kw in keywords:
+            found = matched[keyword_column(kw)]
+            assert (counts[keyword_column(kw, "count")] > 0).equals(found), f"count_{kw} disagrees"
+            assert offsets[keyword_column(kw, "offset")].is_not_null().equals(found.fill_null(False)), \
+                f"offset_{kw} disagrees"
+
+
+def legacy_filter(df, keywords):
+    return df.filter(pl.any_horizontal(pl.col([keyword_column(kw) for kw in keywords])))
+
+
+def make_corpus(n_docs, doc_chars, vocabulary, rng):
+    words = []
+    docs = []
+    for _ in range(n_docs):
+        words.clear()
+        size = 0
+        while size < doc_chars:
+            w = rng.choice(vocabulary)
+            words.append(w)
+            size += len(w) + 1
+        docs.append(" ".join(words))
+    return pl.DataFrame({"text": docs})
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--doc-chars", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    check_nested()
+
+    rng = random.Random(args.seed)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(20000)]
+    df = make_corpus(args.docs, args.doc_chars, vocabulary, rng)
+    mb = df["text"].str.len_bytes().sum() / 1e6
+    print(f"Corpus: {args.docs} docs, {mb:.1f} MB")
+    print(f"{'keywords':>8} {'legacy match':>13} {'new match':>10} {'speedup':>8} {'legacy filter':>14} {'new filter':>11}")
+
+    for n in (10, 100, 1000):
+        keywords = [f"{rng.choice(vocabulary)} {rng.choice(vocabulary)}" if i % 2 else rng.choice(vocabulary)
+                    for i in range(n)]
+        keywords = list(dict.fromkeys(keywords))
+        t_legacy = timed(lambda: legacy_match_keywords(df, keywords))
+        t_new = timed(lambda: match_keywords(df, keywords))
+        legacy = legacy_match_keywords(df, keywords)
+        t_legacy_filter = timed(lambda: legacy_filter(legacy_match_keywords(df, keywords), keywords))
+        t_new_filter = timed(lambda: filter_keyword_matches(df, keywords))
+        assert legacy.equals(match_keywords(df, keywords)), "matchers disagree"
+        print(f"{len(keywords):>8} {t_legacy:>12.2f}s {t_new:>9.2f}s {t_legacy / t_new:>7.1f}x "
+              f"{t_legacy_filter:>13.2f}s {t_new_filter:>10.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Benchmark the mining pipeline offline against scripts/fake_cellar.py.
+
+uv run python scripts/bench_pipeline.py [--docs 300] [--days 5] [--doc-latency 0.1] [--error-rate 0.01]
+uv run python scripts/bench_pipeline.py --fixtures recorded_day/   # replay a recorded fixture
+
+Runs get_docs_text (SPARQL, download, parse), match_keywords and the parquet
+write for every day of the fixture, with all caches and outputs in a
+temporary EUR_LEX_ROOT_DIR, and reports docs/s, MB/s and peak RSS per stage.
+Each run is appended to --results (default scripts/bench_results.jsonl) with
+the commit it ran on, and compared with the last run of the same
+configuration, so regressions show up across commits.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from fake_cellar import synthesize, add_server_arguments, server_from_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+KEYWORDS = ['earth observation', 'copernicus', 'climate', 'fisheries', 'energy']
+
+
+class RssSampler:
+    """Peak RSS of this process while a block runs, sampled every `interval` seconds."""
+
+    def __init__(self, current_rss_mb, interval=0.02):
+        self._current = current_rss_mb
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self._current()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._current())
+        return False
+
+
+def git_revision():
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=HERE,
+                               capture_output=True, text=True).stdout.strip()
+        return f"{rev}-dirty" if dirty else rev
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fixture_days(fixtures):
+    with open(os.path.join(fixtures, 'bindings.json'), encoding='utf-8') as f:
+        return sorted({row['date']['value'][:10] for row in json.load(f)})
+
+
+def run(args, fixtures, root):
+    # The miner reads its endpoints and paths at import, so import it only now.
+    from eurovoc_miner.core import get_docs_text
+    from eurovoc_miner.processor import match_keywords
+    from eurovoc_miner.config import SCHEMA, setup_logging, ensure_dirs
+    from eurovoc_miner.metrics import reset_metrics
+    from eurovoc_miner.pool import current_rss_mb, shutdown_pool
+    import polars as pl
+
+    setup_logging()
+    ensure_dirs()
+    metrics = reset_metrics()
+    stages = {name: {'seconds': 0.0, 'docs': 0, 'mb': 0.0, 'peak_rss_mb': 0.0} for name in ('text', 'keywords', 'write')}
+
+    def measure(name, fn, docs, mb):
+        with RssSampler(current_rss_mb) as rss:
+            start = time.perf_counter()
+            result = fn()
+            stages[name]['seconds'] += time.perf_counter() - start
+        stages[name]['docs'] += docs
+        stages[name]['mb'] += mb
+        stages[name]['peak_rss_mb'] = max(stages[name]['peak_rss_mb'], rss.peak)
+        return result
+
+    out_dir = os.path.join(root, 'bench_out')
+    os.makedirs(out_dir, exist_ok=True)
+    for day in fixture_days(fixtures):
+        d = datetime.date.fromisoformat(day)
+        before = sum(metrics.bytes_by_format.values())
+        docs = measure('text', lambda: list(get_docs_text(d, lang=args.lang.split(','), concurrency=args.concurrency,
+                                                          ordered=not args.unordered)), 0, 0)
+        stages['text']['docs'] += len(docs)
+        stages['text']['mb'] += (sum(metrics.bytes_by_format.values()) - before) / 1e6
+        df = pl.DataFrame(docs, schema=SCHEMA)
+        text_mb = df['text'].str.len_bytes().sum() / 1e6 if len(df) else 0.0
+        df = measure('keywords', lambda: match_keywords(df, KEYWORDS), len(df), text_mb)
+        path = os.path.join(out_dir, f"bench_{day}.parquet")
+        measure('write', lambda: df.write_parquet(path), len(df), text_mb)
+    shutdown_pool()
+
+    for s in stages.values():
+        s['docs_per_second'] = round(s['docs'] / s['seconds'], 2) if s['seconds'] else 0.0
+        s['mb_per_second'] = round(s['mb'] / s['seconds'], 2) if s['seconds'] else 0.0
+        s['seconds'] = round(s['seconds'], 3)
+        s['mb'] = round(s['mb'], 2)
+        s['peak_rss_mb'] = round(s['peak_rss_mb'], 1)
+    report = metrics.report()
+    stages['text']['worker_peak_rss_mb'] = report['peak_rss_mb']['workers']
+    return stages, report
+
+
+def compare(previous, current):
+    print(f"Compared with {previous['revision']} ({previous['recorded_at'][:19]}):")
+    for name, s in current['stages'].items():
+        before = previous['stages'].get(name, {}).get('docs_per_second')
+        if before:
+            change = (s['docs_per_second'] - before) / before * 100
+            print(f"  {name:<9} {before:>9.1f} -> {s['docs_per_second']:>9.1f} docs/s ({change:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', type=str, help='Fixture directory to replay (default: synthesize one)')
+    parser.add_argument('--docs', type=int, default=300, help='Synthetic documents (default: 300)')
+    parser.add_argument('--days', type=int, default=5, help='Days the synthetic documents are spread over (default: 5)')
+    parser.add_argument('--lang', type=str, default='ENG', help='Language code(s), comma-separated (default: ENG)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Document downloads in flight (default: 16)')
+    parser.add_argument('--unordered', action='store_true', help='Yield documents in completion order')
+    parser.add_argument('--results', type=str, default=os.path.join(HERE, 'bench_results.jsonl'),
+                        help='JSON-lines file the run is appended to (default: scripts/bench_results.jsonl)')
+    parser.add_argument('--no-save', action='store_true', help='Do not append this run to --results')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='eur_lex_bench_') as root:
+        fixtures = args.fixtures
+        if fixtures is None:
+            fixtures = os.path.join(root, 'fixtures')
+            synthesize(fixtures, n_docs=args.docs, days=args.days, lang=args.lang, seed=args.seed)
+        with server_from_args(fixtures, args) as server:
+            os.environ.update(server.environment())
+            os.environ['EUR_LEX_ROOT_DIR'] = root
+            started = time.perf_counter()
+            stages, report = run(args, fixtures, root)
+            wall = time.perf_counter() - started
+            requests = dict(server.requests)
+
+    config = {k: getattr(args, k) for k in ('docs', 'days', 'lang', 'concurrency', 'unordered', 'sparql_latency',
+                                           'doc_latency', 'bandwidth_mbps', 'error_rate', 'sparql_error_rate',
+                                           'capacity', 'retry_after', 'seed')}
+    config['fixtures'] = os.path.basename(os.path.normpath(args.fixtures)) if args.fixtures else 'synthetic'
+    record = {
+        'recorded_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'config': config,
+        'wall_seconds': round(wall, 3),
+        'stages': stages,
+        'pipeline_stages': {name: {k: h[k] for k in ('count', 'sum', 'p50', 'p95', 'max')}
+                            for name, h in report['stages'].items()},
+        'requests': requests,
+    }
+
+    print(f"{'stage':<9} {'docs':>6} {'seconds':>8} {'docs/s':>8} {'MB':>8} {'MB/s':>7} {'peak RSS MB':>12}")
+    for name, s in stages.items():
+        print(f"{name:<9} {s['docs']:>6} {s['seconds']:>8.2f} {s['docs_per_second']:>8.1f} {s['mb']:>8.1f} "
+              f"{s['mb_per_second']:>7.1f} {s['peak_rss_mb']:>12.0f}")
+    print(f"Parser workers peak RSS: {stages['text']['worker_peak_rss_mb']:.0f} MB; "
+          f"requests: {requests}; wall {wall:.1f}s")
+
+    previous = None
+    if os.path.exists(args.results):
+        with open(args.results, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get('config') == config:
+                    previous = entry
+    if previous:
+        compare(previous, record)
+    if not args.no_save:
+        with open(args.results, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        print(f"Appended to {args.results}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Check that the CLI starts fast and imports no heavy dependency before it needs one.
+
+uv run python scripts/check_startup.py [--budget 0.5] [--runs 5]
+
+Each command runs in a fresh interpreter against an empty temporary
+EUR_LEX_ROOT_DIR. The median wall time of --runs runs must stay under its
+budget, and `import eurovoc_miner.cli` must not load any of HEAVY. Exits 1
+on a violation, so it can gate CI.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY = ['polars', 'pyarrow', 'pdfminer', 'bs4', 'docx2txt', 'jinja2', 'requests', 'urllib3', 'tqdm']
+
+
+def timed_run(cmd, env):
+    start = time.perf_counter()
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"{' '.join(cmd)} failed:\n{result.stderr}")
+    return elapsed, result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float, default=0.5, help='Seconds allowed for --help (default: 0.5)')
+    parser.add_argument('--dry-run-budget', type=float, default=1.0,
+                        help='Seconds allowed for a backfill --dry-run over an empty dataset (default: 1.0)')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='eur_lex_startup_') as root:
+        env = dict(os.environ, EUR_LEX_ROOT_DIR=root)
+        src = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+        env['PYTHONPATH'] = os.pathsep.join(p for p in (src, env.get('PYTHONPATH')) if p)
+
+        probe = ("import sys, eurovoc_miner.cli; "
+                 f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))")
+        _elapsed, loaded = timed_run([sys.executable, '-c', probe], env)
+        loaded = [m for m in loaded.strip().split(',') if m]
+        print(f"import eurovoc_miner.cli loads: {', '.join(loaded) or 'none of the heavy modules'}")
+        if loaded:
+            failures.append(f"importing the CLI pulls in {', '.join(loaded)}")
+
+        checks = [
+            ('--help', [sys.executable, '-m', 'eurovoc_miner.cli', '--help'], args.budget),
+            ('backfill --dry-run', [sys.executable, '-m', 'eurovoc_miner.cli', 'dataset_', '--backfill-missing',
+                                    '--dry-run', '--from-date', '2026-01-01', '--to-date', '2026-01-31',
+                                    '--report', os.path.join(root, 'report.json')], args.dry_run_budget),
+        ]
+        for name, cmd, budget in checks:
+            times = [timed_run(cmd, env)[0] for _ in range(args.runs)]
+            median = statistics.median(times)
+            verdict = 'ok' if median <= budget else 'OVER BUDGET'
+            print(f"{name:<20} median {median:.3f}s (min {min(times):.3f}s) budget {budget:.2f}s  {verdict}")
+            if median > budget:
+                failures.append(f"{name} took {median:.3f}s (budget {budget:.2f}s)")
+
+    if failures:
+        print('\n'.join(['Startup check failed:', *failures]))
+        return 1
+    print('Startup check passed')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Check the sync planner against a local directory standing in for the HF dataset.
+
+uv run python scripts/check_sync.py [--days 60] [--window 14]
+
+Writes --days synthetic daily parquets, pushes them to an empty remote,
+then checks that:
+- a second push uploads nothing;
+- rewriting one day uploads just that file;
+- a pull into a fresh root downloads only the --window most recent days,
+  while backfill gap detection still sees every day as present.
+
+Prints the transfer counts and exits 1 on a mismatch.
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Runs in a fresh interpreter per step, because EUR_LEX_ROOT_DIR is read on import.
+STEP = r'''
+import datetime, json, os, sys
+import polars as pl
+from eurovoc_miner.catalog import get_catalog
+from eurovoc_miner.config import FILES_DIR
+from eurovoc_miner.sync import LocalBackend, pull, push
+
+action, remote, arg = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+catalog, backend = get_catalog(), LocalBackend(remote)
+if action == 'write':
+    for iso, rows in arg:
+        d = datetime.date.fromisoformat(iso)
+        path = f"{FILES_DIR}/{d.year}/dataset_{iso}_eng.parquet"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pl.DataFrame({'celex': [f"{iso}-{i}" for i in range(rows)], 'text': ['x' * 100] * rows},
+                     schema={'celex': pl.String, 'text': pl.String}).write_parquet(path)
+        catalog.record(path)  # as the miner does for every file it writes
+elif action == 'push':
+    print(json.dumps({'uploaded': len(push(backend, catalog, 'check'))}))
+elif action == 'pull':
+    first, window = (datetime.date.fromisoformat(x) for x in arg)
+    known, downloaded = pull(backend, catalog, first, download_from=window)
+    existing = catalog.existing('dataset_', '_eng', remote=True)
+    local = catalog.existing('dataset_', '_eng')
+    print(json.dumps({'known': known, 'downloaded': downloaded, 'present': len(existing), 'local': len(local),
+                      'missing': len(catalog.gaps('dataset_', '_eng', first, datetime.date.today(), remote=True)[0])}))
+'''
+
+
+def step(root, remote, action, arg):
+    env = dict(os.environ, EUR_LEX_ROOT_DIR=root)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (SRC, env.get('PYTHONPATH')) if p)
+    result = subprocess.run([sys.executable, '-c', STEP, action, remote, json.dumps(arg)], env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"{action} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1]) if action != 'write' else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=60, help='Daily files in the synthetic dataset (default: 60)')
+    parser.add_argument('--window', type=int, default=14, help='Days the pull downloads in full (default: 14)')
+    args = parser.parse_args()
+
+    today = datetime.date.today()
+    days = [(today - datetime.timedelta(days=i)).isoformat() for i in range(args.days)]
+    checks = []
+    with tempfile.TemporaryDirectory(prefix='eur_lex_sync_') as tmp:
+        miner, fresh, remote = (os.path.join(tmp, name) for name in ('miner', 'fresh', 'remote'))
+        step(miner, remote, 'write', [(d, i % 5) for i, d in enumerate(days)])
+        checks.append(('first push', step(miner, remote, 'push', None)['uploaded'], args.days))
+        checks.append(('unchanged push', step(miner, remote, 'push', None)['uploaded'], 0))
+        step(miner, remote, 'write', [(days[3], 7)])
+        checks.append(('push after rewriting one day', step(miner, remote, 'push', None)['uploaded'], 1))
+
+        window = today - datetime.timedelta(days=args.window - 1)
+        pulled = step(fresh, remote, 'pull', [days[-1], window.isoformat()])
+        checks.append(('files downloaded by the pull', pulled['downloaded'], args.window))
+        checks.append(('days present for gap detection', pulled['present'], args.days))
+        checks.append(('days missing for gap detection', pulled['missing'], 0))
+
+    failures = 0
+    for name, got, expected in checks:
+        ok = got == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {got} (expected {expected})")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
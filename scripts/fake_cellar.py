@@ -0,0 +1,522 @@
+"""Local stand-in for the Cellar SPARQL endpoint, the Eurovoc download and the document manifestations.
+
+Serves a fixture directory over HTTP so the miner (and scripts/bench_pipeline.py)
+can run offline. Point the miner at it with the environment overrides in
+config.py, e.g.
+
+    uv run python scripts/fake_cellar.py synth --out bench_fixtures --docs 200 --days 5
+    uv run python scripts/fake_cellar.py serve --fixtures bench_fixtures --port 8765 --doc-latency 0.2 --error-rate 0.02
+    EUR_LEX_SPARQL_ENDPOINT=http://127.0.0.1:8765/sparql EUR_LEX_EUROVOC_XML_URL=http://127.0.0.1:8765/eurovoc \\
+        EUR_LEX_ROOT_DIR=/tmp/eur_lex_offline uv run eur_lex_miner dataset_ --days 5 --lang ENG
+
+Fixtures are either synthetic (`synth`: XHTML, PDF, DOCX and Formex bodies of
+random text) or recorded from the live endpoints (`record`: one day's SPARQL
+result and the documents' preferred manifestations). A fixture directory holds
+bindings.json (SPARQL result rows, with {BASE} in place of the server's
+address), bodies/<id>.<mtype> and eurovoc.xml.
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import os
+import random
+import re
+import string
+import sys
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from urllib.parse import urlparse, parse_qs
+
+CELLAR_PREFIX = 'http://publications.europa.eu/resource/cellar/'
+BASE = '{BASE}'
+
+# Manifestation type -> Accept header, as in parsers.FORMATS (kept literal so the
+# server does not import the miner, whose config reads the environment).
+ACCEPT = {
+    'fmx4': 'application/zip;mtype=fmx4',
+    'xhtml': 'application/xhtml+xml',
+    'html': 'text/html',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml',
+    'doc': 'application/msword',
+    'pdf': 'application/pdf',
+    'pdfa2a': 'application/pdf;type=pdfa2a',
+    'pdfa1a': 'application/pdf;type=pdfa1a',
+}
+MTYPE = {accept: mtype for mtype, accept in ACCEPT.items()}
+
+# Format mixes of the synthetic documents, roughly as seen on Cellar.
+SYNTHETIC_FORMATS = [['fmx4', 'xhtml', 'pdf'], ['xhtml', 'pdfa2a'], ['pdfa2a'], ['docx', 'pdf'], ['pdf']]
+INSTITUTIONS = ['European Commission', 'Council of the European Union', 'European Parliament']
+WORK_TYPES = ['Regulation', 'Decision', 'Directive', 'Communication']
+
+
+# --- Fixture generation ------------------------------------------------------
+
+def make_pdf(pages):
+    """A minimal uncompressed PDF with one text line per entry of each page."""
+    n = len(pages)
+    font = 3 + 2 * n
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>",
+            f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(n))}] /Count {n} >>".encode()]
+    for i, lines in enumerate(pages):
+        ops = ' '.join(f"({line}) Tj 0 -14 Td" for line in lines)
+        stream = f"BT /F1 11 Tf 50 760 Td {ops} ET".encode()
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                    f"/Resources << /Font << /F1 {font} 0 R >> >> >>".encode())
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out, offsets = b"%PDF-1.4\n", []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode()
+    return out
+
+
+def make_xhtml(title, paragraphs):
+    body = ''.join(f"<p>{p}</p>" for p in paragraphs)
+    return (f'<?xml version="1.0" encoding="UTF-8"?><html xmlns="http://www.w3.org/1999/xhtml">'
+            f'<head><title>{title}</title></head><body><h1>{title}</h1>{body}</body></html>').encode()
+
+
+def make_docx(paragraphs):
+    ns = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    body = ''.join(f'<w:p><w:r><w:t>{p}</w:t></w:r></w:p>' for p in paragraphs)
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/'
+                    'package/2006/content-types"><Default Extension="xml" ContentType="application/xml"/></Types>')
+        zf.writestr('word/document.xml', f'<?xml version="1.0"?><w:document xmlns:w="{ns}"><w:body>{body}'
+                                         f'</w:body></w:document>')
+    return buf.getvalue()
+
+
+def make_fmx(celex, title, paragraphs):
+    body = ''.join(f'<P>{p}</P>' for p in paragraphs)
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f'{celex}.doc.xml', f'<DOC><BIB.INSTANCE><NO.CELEX>{celex}</NO.CELEX></BIB.INSTANCE></DOC>')
+        zf.writestr(f'{celex}.000101.fmx.xml', f'<ACT><TITLE><TI><P>{title}</P></TI></TITLE>'
+                                               f'<ENACTING.TERMS>{body}</ENACTING.TERMS></ACT>')
+    return buf.getvalue()
+
+
+def synthesize(out, n_docs=200, days=5, end=None, lang='ENG', pages=(1, 40), seed=0):
+    """Write a synthetic fixture: n_docs documents spread over `days` days ending at `end`.
+
+    `lang` may be a comma-separated list; every work then gets one row per
+    language (all served the same bodies).
+    """
+    rng = random.Random(seed)
+    end = end or datetime.date.today()
+    vocabulary = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(5000)]
+    vocabulary += ['earth', 'observation', 'copernicus', 'climate', 'fisheries', 'agriculture', 'energy']
+    concepts = {str(1000 + i): ' '.join(rng.choices(vocabulary, k=2)) for i in range(300)}
+
+    def sentence():
+        return ' '.join(rng.choices(vocabulary, k=rng.randint(6, 14))).capitalize() + '.'
+
+    os.makedirs(os.path.join(out, 'bodies'), exist_ok=True)
+    bindings = []
+    for i in range(n_docs):
+        day = end - datetime.timedelta(days=rng.randrange(days))
+        cellar_id = hashlib.sha1(f"{seed}-{i}".encode()).hexdigest()[:16]
+        celex = f"3{day.year}R{i:04d}"
+        title = sentence()
+        n_pages = rng.randint(*pages)
+        page_lines = [[sentence() for _ in range(30)] for _ in range(n_pages)]
+        paragraphs = [' '.join(lines) for lines in page_lines]
+        formats = rng.choice(SYNTHETIC_FORMATS)
+        for mtype in formats:
+            if mtype == 'xhtml':
+                body = make_xhtml(title, paragraphs)
+            elif mtype == 'docx':
+                body = make_docx(paragraphs)
+            elif mtype == 'fmx4':
+                body = make_fmx(celex, title, paragraphs)
+            else:
+                body = make_pdf(page_lines)
+            with open(os.path.join(out, 'bodies', f"{cellar_id}.{mtype}"), 'wb') as f:
+                f.write(body)
+        subjects = rng.sample(sorted(concepts.values()), k=rng.randint(1, 5))
+        work_type, authors = rng.choice(WORK_TYPES), '|||'.join(rng.sample(INSTITUTIONS, k=rng.randint(1, 2)))
+        rows = [{
+            'cellarURIs': f"{BASE}/resource/cellar/{cellar_id}",
+            'title': title,
+            'langIdentifier': code.strip(),
+            'mtypes': '|||'.join(formats),
+            'workTypes': work_type,
+            'authors': authors,
+            'date': day.isoformat(),
+            'subjects': '|||'.join(subjects),
+            'workIds': celex,
+            'celexIds': celex,
+            'eliIds': f"http://data.europa.eu/eli/reg/{day.year}/{i}/oj",
+            'procedureIds': '',
+            'directoryCodes': '',
+        } for code in lang.split(',')]
+        bindings.extend({k: {'type': 'literal', 'value': v} for k, v in row.items()} for row in rows)
+    _write_json(os.path.join(out, 'bindings.json'), bindings)
+    with open(os.path.join(out, 'eurovoc.xml'), 'w', encoding='utf-8') as f:
+        f.write(_skos(concepts))
+    print(f"Wrote {n_docs} synthetic documents over {days} days to {out}")
+
+
+def record(out, date, lang=None, max_docs=100, all_formats=False):
+    """Record one day of the live endpoints: SPARQL result, manifestations and the Eurovoc thesaurus."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+    from eurovoc_miner.fetcher import get_json_response, get_session
+    from eurovoc_miner.parsers import select_formats
+    from eurovoc_miner.config import EUROVOC_XML_URL, USER_AGENT
+
+    bindings = get_json_response(date, lang=lang)['results']['bindings'][:max_docs]
+    session = get_session()
+    os.makedirs(os.path.join(out, 'bodies'), exist_ok=True)
+    for row in bindings:
+        url = row['cellarURIs']['value'].split('|||')[0]
+        cellar_id = url.rstrip('/').rsplit('/', 1)[-1]
+        candidates = select_formats(row['mtypes']['value'].split('|||'))
+        for _kind, accept in (candidates if all_formats else candidates[:1]):
+            response = session.get(url, headers={'Accept': accept, 'User-Agent': USER_AGENT,
+                                                 'Accept-Language': row['langIdentifier']['value'].lower()},
+                                   timeout=(10, 120))
+            if response.status_code == 200:
+                with open(os.path.join(out, 'bodies', f"{cellar_id}.{MTYPE[accept]}"), 'wb') as f:
+                    f.write(response.content)
+        row['cellarURIs']['value'] = row['cellarURIs']['value'].replace(CELLAR_PREFIX, f"{BASE}/resource/cellar/")
+    _write_json(os.path.join(out, 'bindings.json'), bindings)
+    response = session.get(EUROVOC_XML_URL, headers={'Accept': 'application/xml', 'Accept-Language': 'en',
+                                                     'User-Agent': USER_AGENT}, timeout=(10, 120))
+    response.raise_for_status()
+    with open(os.path.join(out, 'eurovoc.xml'), 'wb') as f:
+        f.write(response.content)
+    print(f"Recorded {len(bindings)} documents of {date} to {out}")
+
+
+def _skos(concepts):
+    items = ''.join(f'<skos:Concept rdf:about="http://eurovoc.europa.eu/{cid}">'
+                    f'<skos:prefLabel xml:lang="en">{label}</skos:prefLabel></skos:Concept>'
+                    for cid, label in concepts.items())
+    return ('<?xml version="1.0" encoding="UTF-8"?><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" '
+            f'xmlns:skos="http://www.w3.org/2004/02/skos/core#">{items}</rdf:RDF>')
+
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+# --- Server -------------------------------------------------------------------
+
+_DATE = re.compile(r'"(\d{4}-\d{2}-\d{2})"\^\^xsd:date\b(?!Time)')
+_DATETIME = re.compile(r'"([^"]+)"\^\^xsd:dateTime')
+_LANG = re.compile(r'\?langIdentifier\s*=\s*"([^"]+)"')
+_LANGS = re.compile(r'\?langIdentifier\s+IN\s*\(([^)]*)\)')
+_VALUES = re.compile(r'VALUES\s+\?work\s*\{([^}]*)\}')
+_AFTER = re.compile(r'STR\(\?work\)\s*>\s*"([^"]*)"')
+_LIMIT = re.compile(r'\bLIMIT\s+(\d+)\s*$')
+
+
+def _csv_result(result):
+    """A SPARQL JSON result as the endpoint's text/csv output: every value quoted, unbound ones empty."""
+    out = StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    variables = result['head']['vars']
+    writer.writerow(variables)
+    for row in result['results']['bindings']:
+        writer.writerow([row[var]['value'] if var in row else '' for var in variables])
+    return out.getvalue().encode()
+
+
+class FakeCellar:
+    """Threaded HTTP server replaying a fixture directory, with latency and error injection.
+
+    Every response is delayed by `latency` seconds (jittered +-50%) plus its
+    size over `bandwidth_mbps`. A fraction `error_rate` of document requests
+    (`sparql_error_rate` of SPARQL requests) get a 503 instead, which the
+    miner's retry policy then retries. SPARQL responses returning document
+    rows take `sparql_row_latency` seconds more per row, like a query whose
+    cost grows with the window (work listings do not). With `capacity`,
+    document requests beyond that many in flight are answered 503 as well,
+    with a Retry-After of `retry_after` seconds if set, like an overloaded
+    Cellar. Document responses carry an ETag and honour If-None-Match.
+    """
+
+    def __init__(self, fixtures, port=0, sparql_latency=0.0, doc_latency=0.0, bandwidth_mbps=0.0,
+                 error_rate=0.0, sparql_error_rate=0.0, capacity=0, retry_after=0, seed=0, sparql_row_latency=0.0):
+        with open(os.path.join(fixtures, 'bindings.json'), encoding='utf-8') as f:
+            self.bindings = json.load(f)
+        self.bodies_dir = os.path.join(fixtures, 'bodies')
+        self.eurovoc = os.path.join(fixtures, 'eurovoc.xml')
+        self.sparql_latency = sparql_latency
+        self.sparql_row_latency = sparql_row_latency
+        self.doc_latency = doc_latency
+        self.bandwidth_mbps = bandwidth_mbps
+        self.error_rate = error_rate
+        self.sparql_error_rate = sparql_error_rate
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.active = 0
+        self.requests = {'sparql': 0, 'document': 0, 'eurovoc': 0, 'errors': 0, 'overloaded': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self.bindings = json.loads(json.dumps(self.bindings).replace(BASE, self.base_url))
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self):
+        """Environment overrides that point the miner at this server."""
+        return {'EUR_LEX_SPARQL_ENDPOINT': f"{self.base_url}/sparql",
+                'EUR_LEX_EUROVOC_XML_URL': f"{self.base_url}/eurovoc"}
+
+    def _draw(self):
+        with self._lock:
+            return self._rng.random()
+
+    def _delay(self, latency, size):
+        seconds = latency * (0.5 + self._draw()) if latency else 0.0
+        if self.bandwidth_mbps:
+            seconds += size * 8 / (self.bandwidth_mbps * 1e6)
+        if seconds:
+            time.sleep(seconds)
+
+    def _enter(self):
+        """Take a document slot; False (and counted) when over capacity."""
+        with self._lock:
+            if self.capacity and self.active >= self.capacity:
+                self.requests['overloaded'] += 1
+                return False
+            self.active += 1
+            return True
+
+    def _leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def _count(self, kind, error=False):
+        with self._lock:
+            self.requests[kind] += 1
+            self.requests['errors'] += error
+
+    def sparql(self, query):
+        """The SPARQL JSON result of the fixture rows matching the query's date range and language filter.
+
+        A modification window, (since, until] on xsd:dateTime, matches rows
+        by their lastModified value (default: midnight UTC of their date),
+        which is then returned as ?lastModified. A VALUES ?work block
+        matches those works only. A work listing (ORDER BY STR(?work))
+        returns the distinct ?work URIs of the matching rows after the
+        keyset bound, up to its LIMIT, each with its earliest ?day.
+        """
+        dates, modified = _DATE.findall(query), _DATETIME.findall(query)
+        start, end = dates[:2] if len(dates) >= 2 else ('0000-00-00', '9999-99-99')
+        lang, langs = _LANG.search(query), _LANGS.search(query)
+        wanted = {lang.group(1)} if lang else set(re.findall(r'"([^"]+)"', langs.group(1))) if langs else None
+        values = _VALUES.search(query)
+        works = set(re.findall(r'<([^>]+)>', values.group(1))) if values else None
+        rows = []
+        for row in self.bindings:
+            row = dict(row)
+            last_modified = row.pop('lastModified', None) or {'type': 'literal',
+                                                              'value': row['date']['value'][:10] + 'T00:00:00Z'}
+            if works is not None:
+                keep = row['cellarURIs']['value'] in works
+            elif modified:
+                row['lastModified'] = last_modified
+                keep = modified[0] < last_modified['value'] <= modified[1]
+            else:
+                keep = start <= row['date']['value'][:10] < end
+            if keep and (wanted is None or row['langIdentifier']['value'] in wanted):
+                rows.append(row)
+        if 'ORDER BY STR(?work)' in query:
+            after = _AFTER.search(query)
+            days = {}
+            for row in rows:
+                work = row['cellarURIs']['value']
+                if after is None or work > after.group(1):
+                    days[work] = min(days.get(work, row['date']['value']), row['date']['value'])
+            listed = sorted(days)[:int(_LIMIT.search(query).group(1))]
+            return {'head': {'vars': ['work', 'day']},
+                    'results': {'bindings': [{'work': {'type': 'uri', 'value': work},
+                                              'day': {'type': 'literal', 'value': days[work]}} for work in listed]}}
+        return {'head': {'vars': sorted({var for row in rows for var in row})}, 'results': {'bindings': rows}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_args):
+                pass
+
+            def _send(self, status, body=b'', content_type='application/octet-stream', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _sparql(self, params):
+                failed = server._draw() < server.sparql_error_rate
+                server._count('sparql', failed)
+                if failed:
+                    server._delay(server.sparql_latency, 0)
+                    return self._send(503)
+                result = server.sparql(params.get('query', [''])[0])
+                if params.get('format', [''])[0] == 'text/csv':
+                    body, content_type = _csv_result(result), 'text/csv'
+                else:
+                    body, content_type = json.dumps(result).encode(), 'application/sparql-results+json'
+                if 'cellarURIs' in result['head']['vars']:
+                    time.sleep(server.sparql_row_latency * len(result['results']['bindings']))
+                server._delay(server.sparql_latency, len(body))
+                return self._send(200, body, content_type)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != '/sparql':
+                    return self._send(404)
+                length = int(self.headers.get('Content-Length', 0))
+                return self._sparql(parse_qs(self.rfile.read(length).decode()))
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/sparql':
+                    return self._sparql(parse_qs(url.query))
+                if url.path == '/eurovoc':
+                    server._count('eurovoc')
+                    with open(server.eurovoc, 'rb') as f:
+                        return self._send(200, f.read(), 'application/xml')
+                if url.path.startswith('/resource/cellar/'):
+                    if not server._enter():
+                        server._count('document', True)
+                        headers = {'Retry-After': str(server.retry_after)} if server.retry_after else None
+                        return self._send(503, headers=headers)
+                    try:
+                        return self._document(url)
+                    finally:
+                        server._leave()
+                self._send(404)
+
+            def _document(self, url):
+                failed = server._draw() < server.error_rate
+                server._count('document', failed)
+                if failed:
+                    server._delay(server.doc_latency, 0)
+                    return self._send(503)
+                cellar_id = url.path.rsplit('/', 1)[-1]
+                mtype = MTYPE.get(self.headers.get('Accept', ''))
+                path = os.path.join(server.bodies_dir, f"{cellar_id}.{mtype}")
+                if mtype is None or not os.path.exists(path):
+                    server._delay(server.doc_latency, 0)
+                    return self._send(404)
+                with open(path, 'rb') as f:
+                    body = f.read()
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    server._delay(server.doc_latency, 0)
+                    return self._send(304, headers={'ETag': etag})
+                server._delay(server.doc_latency, len(body))
+                return self._send(200, body, self.headers.get('Accept'), {'ETag': etag})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-cellar', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--sparql-latency', type=float, default=0.5, help='Mean SPARQL response time in s (default: 0.5)')
+    parser.add_argument('--doc-latency', type=float, default=0.1, help='Mean document response time in s (default: 0.1)')
+    parser.add_argument('--bandwidth-mbps', type=float, default=0.0, help='Simulated bandwidth per response (default: unlimited)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of document requests answered 503')
+    parser.add_argument('--sparql-error-rate', type=float, default=0.0, help='Fraction of SPARQL requests answered 503')
+    parser.add_argument('--sparql-row-latency', type=float, default=0.0,
+                        help='Extra SPARQL response time per document row returned, in s (default: 0)')
+    parser.add_argument('--capacity', type=int, default=0,
+                        help='Answer 503 to document requests beyond this many in flight (default: 0, unlimited)')
+    parser.add_argument('--retry-after', type=int, default=0, help='Retry-After seconds sent with capacity 503s')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def server_from_args(fixtures, args, port=0):
+    return FakeCellar(fixtures, port=port, sparql_latency=args.sparql_latency, doc_latency=args.doc_latency,
+                      bandwidth_mbps=args.bandwidth_mbps, error_rate=args.error_rate,
+                      sparql_error_rate=args.sparql_error_rate, capacity=args.capacity,
+                      retry_after=args.retry_after, seed=args.seed, sparql_row_latency=args.sparql_row_latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    synth = sub.add_parser('synth', help='Write a synthetic fixture directory')
+    synth.add_argument('--out', required=True)
+    synth.add_argument('--docs', type=int, default=200)
+    synth.add_argument('--days', type=int, default=5)
+    synth.add_argument('--end-date', type=str, help='Last day of the fixture (default: today)')
+    synth.add_argument('--lang', type=str, default='ENG', help='Language code(s), comma-separated (default: ENG)')
+    synth.add_argument('--seed', type=int, default=0)
+
+    rec = sub.add_parser('record', help='Record one day of the live endpoints into a fixture directory')
+    rec.add_argument('--out', required=True)
+    rec.add_argument('--date', required=True, help='YYYY-MM-DD')
+    rec.add_argument('--lang', type=str, help='Language code, e.g. ENG')
+    rec.add_argument('--max-docs', type=int, default=100)
+    rec.add_argument('--all-formats', action='store_true', help='Record every parseable manifestation, not just the preferred one')
+
+    serve = sub.add_parser('serve', help='Serve a fixture directory')
+    serve.add_argument('--fixtures', required=True)
+    serve.add_argument('--port', type=int, default=8765)
+    add_server_arguments(serve)
+
+    args = parser.parse_args()
+    if args.command == 'synth':
+        end = datetime.date.fromisoformat(args.end_date) if args.end_date else None
+        synthesize(args.out, n_docs=args.docs, days=args.days, end=end, lang=args.lang, seed=args.seed)
+    elif args.command == 'record':
+        record(args.out, datetime.date.fromisoformat(args.date), lang=args.lang, max_docs=args.max_docs,
+               all_formats=args.all_formats)
+    else:
+        server = server_from_args(args.fixtures, args, port=args.port)
+        print(f"Serving {args.fixtures} at {server.base_url}")
+        for name, value in server.environment().items():
+            print(f"  export {name}={value}")
+        server.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
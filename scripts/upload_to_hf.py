@@ -1,6 +1,8 @@
 import os
 import datetime
-from huggingface_hub import HfApi
+import logging
+from eurovoc_miner.catalog import get_catalog
+from eurovoc_miner.sync import HFBackend, push
 
 def upload():
     # 1. Get secrets from environment variables
@@ -10,27 +12,19 @@ def upload():
     if not token or not dataset_id:
         raise ValueError("HF_TOKEN or HF_DATASET environment variables are missing.")
 
-    # Local directory where miner saved the parquet files. The miner writes
-    # into year-subdirs (files/YYYY/dataset_*.parquet) that mirror the HF layout
-    # 1:1, so we upload the contents of ./files/ into HF's files/ and the
-    # directory structure is preserved without any path rewriting.
-    local_folder_path = "./files"
+    # The miner writes into year-subdirs (files/YYYY/dataset_*.parquet) that
+    # mirror the HF layout 1:1, so paths map onto HF's files/ unchanged.
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    print(f"Uploading changed files from ./files to {dataset_id}...")
 
-    # 2. Initialize API
-    print(f"Logging in and uploading files from {local_folder_path} to {dataset_id}...")
-    api = HfApi(token=token)
-
-    # 3. Upload Folder. Content-hash dedupe on HF means re-uploading unchanged
-    # seeded files is a no-op; only new/modified parquets create commits.
-    api.upload_folder(
-        folder_path=local_folder_path,
-        repo_id=dataset_id,
-        repo_type="dataset",
-        path_in_repo="files",
-        ignore_patterns=[".gitkeep", ".DS_Store"],
-        commit_message=f"Weekly update: {datetime.date.today()}"
-    )
-    print("Upload complete!")
+    # 2. Compare the dataset catalog's content hashes with the HF listing and
+    # upload only the files that differ, in parallel batches, together with
+    # the per-year manifests the next run seeds its gap detection from
+    # (see eurovoc_miner/sync.py). Unchanged seeded files are never re-hashed
+    # or sent.
+    changed = push(HFBackend(dataset_id, token=token), get_catalog(),
+                   message=f"Weekly update: {datetime.date.today()}")
+    print(f"Upload complete! {len(changed)} files changed.")
 
 if __name__ == "__main__":
     upload()
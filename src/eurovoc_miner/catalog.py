@@ -0,0 +1,235 @@
+import datetime
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from .config import FILES_DIR, CATALOG_FILE
+
+log = logging.getLogger(__name__)
+
+# dataset_2026-04-01_eng.parquet -> prefix 'dataset_', date, lang 'eng'. Range
+# files (dataset_2026-01-01_to_2026-01-30_eng.parquet) deliberately don't match.
+FILENAME_RE = re.compile(r"^(?P<prefix>(?:(?!\d{4}-\d{2}-\d{2}).)*)(?P<date>\d{4}-\d{2}-\d{2})(?:_(?P<lang>[a-z]{2,3}))?\.parquet$")
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def schema_fingerprint(schema):
+    """Short stable hash of an Arrow schema's field names and types (metadata ignored)."""
+    text = schema.remove_metadata().to_string(show_schema_metadata=False)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+class Catalog:
+    """SQLite catalog of the per-day parquet files under FILES_DIR.
+
+    One row per file: date, lang, path, row count, byte size, content hash,
+    schema fingerprint and mined-at timestamp. The miner records every file
+    it writes; refresh() picks up files written by anything else (HF seeding,
+    manual copies) by stat-ing every parquet and re-reading only those whose
+    size or mtime changed. A directory's mtime only changes when entries are
+    added or removed, not when a file is overwritten in place, so it is used
+    solely to skip looking for deleted files. Gap detection and upload
+    planning are then plain queries.
+
+    A second table holds the metadata of files that exist only on the
+    remote copy of the dataset (see sync.py), so gap detection can count
+    them as present without downloading them.
+    """
+
+    def __init__(self, path=CATALOG_FILE, root=FILES_DIR):
+        self.path = path
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                prefix TEXT NOT NULL,
+                date TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                rows INTEGER,
+                bytes INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                schema_fp TEXT,
+                mtime REAL NOT NULL,
+                mined_at TEXT NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_key ON files(prefix, lang, date)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL NOT NULL)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS remote_files (
+                path TEXT PRIMARY KEY,
+                prefix TEXT NOT NULL,
+                date TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                rows INTEGER,
+                bytes INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            )""")
+
+    def _relpath(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def _entry(self, full, mined_at=None):
+        m = FILENAME_RE.match(os.path.basename(full))
+        if m is None:
+            return None
+        import pyarrow.parquet as pq  # only needed once a file is new or changed
+        st = os.stat(full)
+        try:
+            meta = pq.ParquetFile(full).metadata
+            rows, schema_fp = meta.num_rows, schema_fingerprint(meta.schema.to_arrow_schema())
+        except Exception as exc:
+            log.warning(f"Could not read parquet metadata for {full}: {exc}")
+            rows, schema_fp = None, None
+        if mined_at is None:
+            mined_at = datetime.datetime.fromtimestamp(st.st_mtime, datetime.timezone.utc).isoformat()
+        return (self._relpath(full), m['prefix'], m['date'], m['lang'] or '', rows, st.st_size,
+                file_sha256(full), schema_fp, st.st_mtime, mined_at)
+
+    def record(self, path, mined_at=None):
+        """Add or update the entry for one file just written.
+
+        Returns (path relative to root, sha256), or None for files that are
+        not per-day parquets (which are not cataloged).
+        """
+        if mined_at is None:
+            mined_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        entry = self._entry(path, mined_at)
+        if entry is None:
+            return None
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", entry)
+        return entry[0], entry[6]
+
+    def refresh(self):
+        """Bring the catalog up to date with the files on disk. Returns (updated, removed)."""
+        if not os.path.isdir(self.root):
+            return 0, 0
+        with self._lock:
+            known_dirs = dict(self._conn.execute("SELECT path, mtime FROM dirs"))
+            known_files = {p: (size, mtime) for p, size, mtime in
+                           self._conn.execute("SELECT path, bytes, mtime FROM files")}
+        updates, removed, dir_mtimes = [], [], {}
+        stack = [self.root]
+        while stack:
+            d = stack.pop()
+            rel_dir = self._relpath(d)
+            dir_mtime = os.stat(d).st_mtime
+            dir_mtimes[rel_dir] = dir_mtime
+            changed = known_dirs.get(rel_dir) != dir_mtime
+            for entry in os.scandir(d):
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.endswith('.parquet'):
+                    rel = self._relpath(entry.path)
+                    st = entry.stat()
+                    if known_files.get(rel) != (st.st_size, st.st_mtime):
+                        row = self._entry(entry.path)
+                        if row is not None:
+                            updates.append(row)
+            # Deletions always change the directory's mtime.
+            if changed:
+                prefix = '' if rel_dir == '.' else rel_dir + os.sep
+                for rel in known_files:
+                    if rel.startswith(prefix) and os.sep not in rel[len(prefix):] \
+                            and not os.path.exists(os.path.join(self.root, rel)):
+                        removed.append((rel,))
+        # Whole directories that disappeared.
+        removed.extend((rel,) for rel in known_files if (os.path.dirname(rel) or '.') not in dir_mtimes)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", updates)
+            self._conn.executemany("DELETE FROM files WHERE path = ?", removed)
+            self._conn.execute("DELETE FROM dirs")
+            self._conn.executemany("INSERT INTO dirs VALUES (?, ?)", dir_mtimes.items())
+            self._conn.execute("COMMIT")
+        if updates or removed:
+            log.info(f"Catalog refreshed: {len(updates)} files updated, {len(removed)} removed")
+        return len(updates), len(removed)
+
+    def existing(self, prefix, lang_suffix, remote=False):
+        """Return {iso_date: (path, num_rows)} for one prefix/lang.
+
+        If a date exists in several locations (flat + year-subdir), the copy
+        with the most rows wins, as with the old filesystem scan. With
+        remote=True, dates that only the remote copy has are included with
+        path None.
+        """
+        lang = lang_suffix.lstrip('_')
+        out = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, path, rows FROM files WHERE prefix = ? AND lang = ? ORDER BY path",
+                (prefix, lang)).fetchall()
+            remote_rows = self._conn.execute(
+                "SELECT date, rows FROM remote_files WHERE prefix = ? AND lang = ? ORDER BY path",
+                (prefix, lang)).fetchall() if remote else []
+        for date, rel, nrows in rows:
+            prev = out.get(date)
+            if prev is None or (nrows is not None and (prev[1] is None or nrows > prev[1])):
+                out[date] = (os.path.join(self.root, rel), nrows)
+        for date, nrows in remote_rows:
+            out.setdefault(date, (None, nrows))
+        return out
+
+    def gaps(self, prefix, lang_suffix, from_date, to_date, remote=False):
+        """Return ([missing dates], [dates whose file has 0 rows]) in [from_date, to_date]."""
+        existing = self.existing(prefix, lang_suffix, remote=remote)
+        missing, empty = [], []
+        d = from_date
+        while d <= to_date:
+            rec = existing.get(d.isoformat())
+            if rec is None or rec[1] is None:
+                missing.append(d)
+            elif rec[1] == 0:
+                empty.append(d)
+            d += datetime.timedelta(days=1)
+        return missing, empty
+
+    def files(self, mined_since=None):
+        """Return [(path, sha256, bytes)] for all cataloged files, optionally only those mined since an ISO timestamp."""
+        query, params = "SELECT path, sha256, bytes FROM files", ()
+        if mined_since:
+            query, params = query + " WHERE mined_at >= ?", (mined_since,)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY path", params).fetchall()
+
+    def entries(self):
+        """Return [(path, prefix, date, lang, rows, bytes, sha256)] for all cataloged files."""
+        with self._lock:
+            return self._conn.execute("SELECT path, prefix, date, lang, rows, bytes, sha256 FROM files "
+                                      "ORDER BY path").fetchall()
+
+    def set_remote(self, directory, entries):
+        """Replace the remote metadata under one directory (e.g. a year) with
+        entries [(path, prefix, date, lang, rows, bytes, sha256)]."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM remote_files WHERE path LIKE ?", (directory + os.sep + '%',))
+            self._conn.executemany("INSERT OR REPLACE INTO remote_files VALUES (?, ?, ?, ?, ?, ?, ?)", entries)
+            self._conn.execute("COMMIT")
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Return the process-wide Catalog."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog()
+    return _catalog
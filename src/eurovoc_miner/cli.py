@@ -1,86 +1,255 @@
 import argparse
+import contextlib
 import datetime
 import os
-import re
-import polars as pl
+import sys
+import time
 import logging
-from .core import get_docs_text
-from .processor import clean_text_batch, match_keywords, filter_keyword_matches
-from .config import FILES_DIR, SCHEMA
+from .metrics import get_metrics, reset_metrics, STAGES
+from .pool import shutdown_pool
+from .config import (FILES_DIR, COMPACT_DIR, DOWNLOAD_CONCURRENCY, STREAM_MAX_BATCH_MB, FORMAT_PRIORITY,
+                     DOC_TIMEOUT, DOC_MAX_BYTES, RUN_REPORT_FILE, KEYWORD_OUTPUTS, OFFICIAL_LANGUAGES, LIMITER_MAX_RATE,
+                     QUEUE_LEASE_SECONDS, SYNC_WORKERS, SYNC_BATCH_FILES, WATCH_OVERLAP_SECONDS, SPARQL_MAX_CONCURRENCY,
+                     setup_logging, ensure_dirs)
+
+# Polars, pyarrow, the parsers and the HTTP stack are imported inside the
+# functions that need them, so --help, --dry-run and the catalog report start
+# without paying for them (see scripts/check_startup.py).
 
 log = logging.getLogger(__name__)
 
 
-def _mine_one_day(date, output_prefix, lang_filter, lang_suffix, keywords,
-                  save_only_kw, unique_on):
-    """Mine a single date and write its parquet. Returns ('rows'|'empty', n_rows, path).
+def _build_frame(docs, args, seen=None):
+    """Turn mined docs into the DataFrame written for one file (or one streamed batch).
 
-    Mirrors the original per-day code path (days=1) so backfilled files are
-    schema-identical to weekly-run output.
+    Shared by lookback and backfill so every file is cleaned, keyword-matched,
+    deduplicated and filtered the same way. Empty results still get the
+    keyword columns so the schema stays stable across files. --unique-on
+    keeps the last row of each key. When streaming, `seen` holds the keys of
+    the batches already written: rows written cannot be replaced, so there a
+    key's row from an earlier batch wins.
     """
-    docs = list(get_docs_text(date, lang=lang_filter, days=1))
+    import polars as pl
+    from .config import SCHEMA
+    from .processor import clean_text_batch, filter_keyword_matches
+
+    metrics = get_metrics()
     if not docs:
         df = pl.DataFrame([], schema=SCHEMA)
-        df = match_keywords(df, keywords)
-        status = 'empty'
-    else:
+        return _match_keywords(df, args)
+
+    with metrics.timed('clean'):
         df = pl.DataFrame(docs, schema=SCHEMA)
         df = clean_text_batch(df)
-        df = match_keywords(df, keywords)
-        if unique_on:
-            if unique_on in df.columns:
-                original_len = len(df)
-                df = df.unique(subset=[unique_on], keep='last')
-                if len(df) < original_len:
-                    log.info(f"Deduplicated: {original_len} -> {len(df)} (unique on {unique_on})")
-            else:
-                log.warning(f"Column '{unique_on}' not found for deduplication. Available: {df.columns}")
-        if save_only_kw and keywords:
-            df = filter_keyword_matches(df, keywords)
-            log.info(f"Filtered to {len(df)} keyword matches.")
-        status = 'rows'
+    with metrics.timed('keywords'):
+        df = _match_keywords(df, args)
+    if args.unique_on:
+        if args.unique_on in df.columns:
+            original_len = len(df)
+            df = df.unique(subset=[args.unique_on], keep='last')
+            if seen is not None:
+                # Streaming: a key already written by an earlier batch wins.
+                keys = df[args.unique_on].to_list()
+                df = df.filter(pl.Series([key not in seen for key in keys], dtype=pl.Boolean))
+                seen.update(keys)
+            if len(df) < original_len:
+                log.info(f"Deduplicated: {original_len} -> {len(df)} records (unique on {args.unique_on})")
+        else:
+            log.warning(f"Column '{args.unique_on}' not found for deduplication. Available: {df.columns}")
+    if args.save_only_keyword_matches and args.keywords:
+        df = filter_keyword_matches(df, args.keywords, whole_word=args.whole_word,
+                                    case_sensitive=args.case_sensitive)
+        log.info(f"Filtered to {len(df)} keyword matches.")
+    return df
+
+
+def _match_keywords(df, args):
+    from .processor import match_keywords
+    return match_keywords(df, args.keywords, whole_word=args.whole_word,
+                          case_sensitive=args.case_sensitive, output=args.keyword_output)
+
+
+def _text_options(args):
+    """get_docs_text keyword arguments taken from the command line."""
+    return {
+        'priority': args.format_priority,
+        # Streamed files take documents as they finish; in-memory writes keep SPARQL
+        # order, as do streamed ones with --unique-on, whose surviving rows depend on it.
+        'ordered': not args.stream_batch_size or bool(args.unique_on),
+        'timeout': args.doc_timeout,
+        'max_bytes': args.max_doc_mb * 1024 * 1024,
+    }
+
+
+def _route(docs, outputs):
+    """Split docs into one list per output file, by language (key None takes every language)."""
+    parts = {key: [] for key in outputs}
+    for doc in docs:
+        key = None if None in outputs else doc['lang']
+        if key in parts:
+            parts[key].append(doc)
+        else:
+            log.warning(f"{doc['url']} is in unrequested language '{doc['lang']}', skipping")
+    return parts
+
+
+def _write_docs(docs, outputs, args):
+    """Write a get_docs_text stream to one parquet per language. Returns {lang: (n_docs, n_rows)}.
+
+    `outputs` maps a lower-case language code (or None for a file holding
+    every language) to its output path. By default the whole window is
+    collected and split into one DataFrame per language. With
+    --stream-batch-size the stream is cleaned, matched and written in batches
+    (each batch one row group per language), so peak memory follows the
+    batch size and --max-batch-mb rather than the total text volume of the
+    window.
+    """
+    from .writer import IncrementalParquetWriter, iter_batches
+
+    if not args.stream_batch_size:
+        written = {}
+        for key, part in _route(docs, outputs).items():
+            df = _build_frame(part, args)
+            with get_metrics().timed('write'):
+                df.write_parquet(outputs[key])
+            written[key] = (len(part), len(df))
+        return written
+
+    n_docs = dict.fromkeys(outputs, 0)
+    seen = {key: set() for key in outputs} if args.unique_on else {}
+    with contextlib.ExitStack() as stack:
+        writers = {key: stack.enter_context(IncrementalParquetWriter(path)) for key, path in outputs.items()}
+        for batch in iter_batches(docs, args.stream_batch_size, args.max_batch_mb * 1024 * 1024):
+            for key, part in _route(batch, outputs).items():
+                if not part:
+                    continue
+                n_docs[key] += len(part)
+                df = _build_frame(part, args, seen=seen.get(key))
+                if len(df):
+                    with get_metrics().timed('write'):
+                        writers[key].write(df)
+        for writer in writers.values():
+            if writer.rows == 0:
+                # Nothing survived (or nothing mined): still write the stable empty schema.
+                writer.write(_build_frame([], args))
+    return {key: (n_docs[key], writers[key].rows) for key in outputs}
+
+
+def _record_output(output_path):
+    """Register a freshly written file in the catalog and the document index."""
+    from .catalog import get_catalog
+    from .docindex import get_doc_index
+    with get_metrics().timed('index'):
+        recorded = get_catalog().record(output_path)
+        if recorded is not None:
+            get_doc_index().update_file(*recorded)
+
+
+def _reusable(output_paths, args):
+    """Texts from the files about to be overwritten, when --reuse-existing is on."""
+    if not args.reuse_existing:
+        return None
+    from .core import load_reusable_texts
+    reuse = {}
+    for path in output_paths:
+        if os.path.exists(path):
+            reuse.update(load_reusable_texts(path))
+    return reuse
+
+
+def _parse_langs(values):
+    """--lang values -> upper-case language codes, [] meaning no language filter.
+
+    Codes may be given as separate arguments or comma-separated; ALL expands
+    to OFFICIAL_LANGUAGES.
+    """
+    langs = []
+    for value in values or []:
+        for code in value.split(','):
+            code = code.strip().upper()
+            if code == 'ALL':
+                langs.extend(OFFICIAL_LANGUAGES)
+            elif code:
+                langs.append(code)
+    return list(dict.fromkeys(langs))
+
 
-    filename = f"{output_prefix}{date}{lang_suffix}.parquet"
+def _lang_keys(langs):
+    """Output keys for `langs`: lower-case codes, or [None] (one file, every language) without a filter."""
+    return [lang.lower() for lang in langs] or [None]
+
+
+def _lang_suffix(key):
+    return f"_{key}" if key else ""
+
+
+def _label(date, key):
+    return f"{date} {key.upper()}" if key else f"{date}"
+
+
+def _output_path(args, date, key, days=1):
+    """Path of the parquet for a date (or a days-long range) and language key.
+
+    Files go to a year subdir so the local layout mirrors the HF dataset
+    (files/YYYY/dataset_YYYY-MM-DD_eng.parquet). The start date's year is
+    used for batched range files.
+    """
+    if days > 1:
+        end_date = date + datetime.timedelta(days=days - 1)
+        filename = f"{args.output_prefix}{date}_to_{end_date}{_lang_suffix(key)}.parquet"
+    else:
+        filename = f"{args.output_prefix}{date}{_lang_suffix(key)}.parquet"
     year_dir = os.path.join(FILES_DIR, str(date.year))
     os.makedirs(year_dir, exist_ok=True)
-    output_path = os.path.join(year_dir, filename)
-    df.write_parquet(output_path)
-    return status, len(df), output_path
+    return os.path.join(year_dir, filename)
 
 
-def _scan_existing(output_prefix, lang_suffix):
-    """Return {iso_date: (path, num_rows)} for matching parquets under FILES_DIR.
+def _mine(date, args, langs, days=1, meta=None):
+    """Mine a date (or a days-long window) and write one parquet per language.
 
-    Walks recursively so files/2026/dataset_2026-04-01_eng.parquet is found
-    even though the miner writes flat. num_rows comes from parquet metadata
-    only (no payload load). Files whose metadata cannot be read are treated
-    as missing (None).
+    Returns {lang key: ('rows'|'empty', n_rows, path)}. Every language's
+    documents go through a single get_docs_text call, so their downloads and
+    parses share the downloader and the parser pool. With days=1 this is the
+    original per-day code path, so backfilled files are schema-identical to
+    weekly-run output. `meta` is the window's prefetched SPARQL metadata, if
+    any.
     """
-    import pyarrow.parquet as pq
-    suffix = f"{lang_suffix}.parquet"
-    out = {}
-    if not os.path.isdir(FILES_DIR):
-        return out
-    for root, _dirs, files in os.walk(FILES_DIR):
-        for entry in files:
-            if not entry.startswith(output_prefix) or not entry.endswith(suffix):
-                continue
-            stem = entry[len(output_prefix):-len(suffix)]
-            # Per-day filenames only. Skip date-range files produced by --days-per-request>1.
-            if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", stem):
-                continue
-            full = os.path.join(root, entry)
-            try:
-                nrows = pq.ParquetFile(full).metadata.num_rows
-            except Exception as exc:
-                log.warning(f"Could not read parquet metadata for {full}: {exc}")
-                nrows = None
-            # If the same date appears in multiple locations (flat + year-subdir),
-            # prefer the one with the most rows so re-scans don't churn.
-            prev = out.get(stem)
-            if prev is None or (nrows is not None and (prev[1] is None or nrows > prev[1])):
-                out[stem] = (full, nrows)
-    return out
+    from .core import get_docs_text
+
+    outputs = {key: _output_path(args, date, key, days) for key in _lang_keys(langs)}
+    docs = get_docs_text(date, lang=langs, days=days, concurrency=args.download_concurrency,
+                         docs=meta, reuse=_reusable(outputs.values(), args), **_text_options(args))
+    written = _write_docs(docs, outputs, args)
+    results = {}
+    for key, path in outputs.items():
+        _record_output(path)
+        n_docs, n_rows = written[key]
+        results[key] = ('rows' if n_docs else 'empty', n_rows, path)
+    return results
+
+
+def _log_saved(date, results):
+    for key, (status, n_rows, path) in results.items():
+        if status == 'empty':
+            log.info(f"∅ No documents for {_label(date, key)}, creating empty file.")
+            log.info(f"✓ Saved empty file to {path}")
+        else:
+            log.info(f"✓ Saved {n_rows} records to {path}")
+
+
+def _scan_existing(output_prefix, keys):
+    """Return {lang key: {iso_date: (path, num_rows)}} for matching per-day parquets under FILES_DIR.
+
+    Served from the dataset catalog (see catalog.py) after an incremental
+    refresh, so only files added or changed since the last run have their
+    parquet footer read. Files whose metadata cannot be read are treated as
+    missing (None). Files known only from the remote manifests (`sync pull`)
+    count as present, with path None.
+    """
+    from .catalog import get_catalog
+    catalog = get_catalog()
+    catalog.refresh()
+    return {key: catalog.existing(output_prefix, _lang_suffix(key), remote=True) for key in keys}
 
 
 def _parse_iso(s, flag_name):
@@ -90,11 +259,67 @@ def _parse_iso(s, flag_name):
         raise SystemExit(f"Invalid {flag_name} '{s}': expected YYYY-MM-DD ({exc})")
 
 
-def _run_backfill(args, lang_filter, lang_suffix):
-    if args.days_per_request != 1:
-        raise SystemExit("--backfill-missing requires --days-per-request 1 "
-                         "(per-day filenames are needed to detect gaps).")
+def _split_by_day(start, days, meta):
+    """Partition a window's SPARQL docs into {date: docs} for every day of the window.
+
+    Days without documents map to an empty list, so they still get their
+    (empty) per-day file.
+    """
+    by_day = {start + datetime.timedelta(days=i): [] for i in range(days)}
+    for doc in meta:
+        try:
+            day = datetime.date.fromisoformat(doc['date'][:10])
+        except ValueError:
+            log.warning(f"Unparseable date '{doc['date']}' for {doc['url']}, skipping")
+            continue
+        if day in by_day:
+            by_day[day].append(doc)
+        else:
+            log.warning(f"{doc['url']} is dated {day}, outside window {start} (+{days}d), skipping")
+    return by_day
+
+
+def _group_windows(dates, max_days):
+    """Merge sorted dates into (start, days) windows of consecutive days, at most max_days long."""
+    windows = []
+    for d in sorted(dates):
+        if windows:
+            start, days = windows[-1]
+            if d == start + datetime.timedelta(days=days) and days < max_days:
+                windows[-1] = (start, days + 1)
+                continue
+        windows.append((d, 1))
+    return windows
+
+
+def _configure_limits(args):
+    """Size the adaptive limiters from the command line (before the first request).
+
+    Limiters are per process, so the --queue-workers processes draining one
+    queue each take that share of the download concurrency, request rate
+    and SPARQL concurrency; together they stay within the configured load.
+    """
+    from .throttle import configure_limiter
+    workers = max(1, args.queue_workers)
+    configure_limiter('cellar', max_concurrency=max(1, args.download_concurrency // workers),
+                      max_rate=args.max_request_rate / workers)
+    if workers > 1:
+        configure_limiter('sparql', max_concurrency=max(1, SPARQL_MAX_CONCURRENCY // workers))
 
+
+def _parse_shard(value):
+    """'K/N' -> (K, N): this worker only takes dates whose ordinal is K modulo N."""
+    try:
+        k, n = (int(x) for x in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected K/N, e.g. 0/4, got '{value}'")
+    if not 0 <= k < n:
+        raise argparse.ArgumentTypeError(f"shard index must be in [0, {n}), got {k}")
+    return k, n
+
+
+def _scan_gaps(args, langs):
+    """Find the (date, language) files to backfill. Returns (from_date, to_date, {date: {lang key: reason}})."""
     today = datetime.date.today()
     to_date = _parse_iso(args.to_date, '--to-date') if args.to_date else today
     if args.from_date:
@@ -105,11 +330,13 @@ def _run_backfill(args, lang_filter, lang_suffix):
                              "(refusing to re-mine every empty file back to 1973).")
         from_date = None  # resolved below from existing files
 
-    existing = _scan_existing(args.output_prefix, lang_suffix)
+    keys = _lang_keys(langs)
+    existing = _scan_existing(args.output_prefix, keys)
     if from_date is None:
-        if not existing:
+        known = [d for files in existing.values() for d in files]
+        if not known:
             raise SystemExit("No existing files found and no --from-date given; nothing to backfill.")
-        from_date = min(datetime.date.fromisoformat(d) for d in existing)
+        from_date = min(datetime.date.fromisoformat(d) for d in known)
 
     if to_date < from_date:
         raise SystemExit(f"--to-date {to_date} is before --from-date {from_date}.")
@@ -117,164 +344,658 @@ def _run_backfill(args, lang_filter, lang_suffix):
         log.warning(f"--to-date {to_date} is in the future; clamping to today ({today}).")
         to_date = today
 
-    to_fetch = []  # list of (date, reason)
+    to_fetch = {}  # date -> {lang key: reason}
     skipped_present = 0
     skipped_empty = 0
     d = from_date
     while d <= to_date:
         iso = d.isoformat()
-        rec = existing.get(iso)
-        if rec is None:
-            to_fetch.append((d, 'missing'))
-        else:
-            _path, nrows = rec
-            if nrows == 0:
-                if args.retry_empty:
-                    to_fetch.append((d, 'empty'))
-                else:
-                    skipped_empty += 1
+        if args.shard and d.toordinal() % args.shard[1] != args.shard[0]:
+            d += datetime.timedelta(days=1)
+            continue
+        for key in keys:
+            rec = existing[key].get(iso)
+            if rec is None:
+                to_fetch.setdefault(d, {})[key] = 'missing'
             else:
-                skipped_present += 1
+                _path, nrows = rec
+                if nrows == 0:
+                    if args.retry_empty:
+                        to_fetch.setdefault(d, {})[key] = 'empty'
+                    else:
+                        skipped_empty += 1
+                else:
+                    skipped_present += 1
         d += datetime.timedelta(days=1)
 
     n_total = (to_date - from_date).days + 1
-    log.info(f"Backfill scan: {from_date} -> {to_date} ({n_total} days). "
-             f"To fetch: {len(to_fetch)} (missing={sum(1 for _, r in to_fetch if r == 'missing')}, "
-             f"empty-retry={sum(1 for _, r in to_fetch if r == 'empty')}). "
+    reasons = [reason for wanted in to_fetch.values() for reason in wanted.values()]
+    per_lang = f" x {len(keys)} languages" if len(keys) > 1 else ""
+    shard = f", shard {args.shard[0]}/{args.shard[1]}" if args.shard else ""
+    log.info(f"Backfill scan: {from_date} -> {to_date} ({n_total} days{per_lang}{shard}). "
+             f"To fetch: {len(reasons)} (missing={reasons.count('missing')}, "
+             f"empty-retry={reasons.count('empty')}). "
              f"Skipped: {skipped_present} with rows, {skipped_empty} empty (use --retry-empty to include).")
-
-    if args.dry_run:
-        for date, reason in to_fetch:
-            log.info(f"DRY-RUN would fetch {date}  [{reason}]")
-        return
-
-    if not to_fetch:
-        log.info("Nothing to do.")
-        return
-
-    summary = {'rows': 0, 'empty': 0, 'errors': 0}
-    fetched_with_rows = []
-    fetched_empty = []
-    errors = []
-    for date, reason in to_fetch:
-        try:
-            status, n, path = _mine_one_day(
-                date, args.output_prefix, lang_filter, lang_suffix,
-                args.keywords, args.save_only_keyword_matches, args.unique_on)
-            summary[status] += 1
-            if status == 'rows':
-                fetched_with_rows.append((date, n, path))
-                log.info(f"✓ Backfilled {date} [{reason}] -> {n} records ({path})")
-            else:
-                fetched_empty.append((date, path))
-                log.info(f"∅ Backfilled {date} [{reason}] -> empty (SPARQL returned 0 docs)")
-        except Exception as exc:
-            summary['errors'] += 1
-            errors.append((date, repr(exc)))
-            log.error(f"✗ Failed to backfill {date} [{reason}]: {exc}")
-
+    return from_date, to_date, to_fetch
+
+
+def _work_queue(args, langs, queue):
+    """Claim dates from the queue, mine them and record each file's outcome, until nothing is claimable."""
+    import socket
+    from .core import prefetch_docs
+    _configure_limits(args)
+
+    prefix = args.output_prefix
+    keys = [key or '' for key in _lang_keys(langs)]
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    # Enough dates per claim to fill the SPARQL windows and the prefetch pipeline.
+    batch = args.days_per_request * (1 + args.pipeline_depth)
+    with queue.heartbeat(owner):
+        while claimed := queue.claim(prefix, owner, keys, batch):
+            to_fetch = {datetime.date.fromisoformat(date): {key or None: reason for key, reason in wanted.items()}
+                        for date, wanted in claimed.items()}
+            # Consecutive gap days share one SPARQL window (--days-per-request)
+            # whose rows are fanned out into the usual per-day files; the
+            # window's query covers only the languages that have a gap.
+            windows = _group_windows(to_fetch, args.days_per_request)
+            needed = {key for wanted in to_fetch.values() for key in wanted}
+            query_langs = [lang for lang in langs if lang.lower() in needed]
+            for start, days, meta, failed in prefetch_docs(windows, lang=query_langs, depth=args.pipeline_depth):
+                for date, day_meta in _split_by_day(start, days, meta).items():
+                    wanted = to_fetch.get(date)
+                    if not wanted:
+                        continue
+                    if date in failed:
+                        for key, reason in wanted.items():
+                            retry = queue.fail(prefix, date.isoformat(), key or '', owner, 'incomplete SPARQL metadata')
+                            log.error(f"✗ Failed to backfill {_label(date, key)} [{reason}]: incomplete SPARQL "
+                                      f"metadata" + (" (will retry)" if retry else ""))
+                        continue
+                    day_langs = [lang for lang in langs if lang.lower() in wanted]
+                    if day_langs:
+                        day_meta = [doc for doc in day_meta if doc['lang'] in wanted]
+                    try:
+                        results = _mine(date, args, day_langs, meta=day_meta)
+                    except Exception as exc:
+                        for key, reason in wanted.items():
+                            retry = queue.fail(prefix, date.isoformat(), key or '', owner, repr(exc))
+                            log.error(f"✗ Failed to backfill {_label(date, key)} [{reason}]: {exc}"
+                                      + (" (will retry)" if retry else ""))
+                        continue
+                    for key, (status, n, path) in results.items():
+                        reason = wanted[key]
+                        queue.complete(prefix, date.isoformat(), key or '', owner, status, n, path)
+                        if status == 'rows':
+                            log.info(f"✓ Backfilled {_label(date, key)} [{reason}] -> {n} records ({path})")
+                        else:
+                            log.info(f"∅ Backfilled {_label(date, key)} [{reason}] -> empty (SPARQL returned 0 docs)")
+
+
+def _log_queue_summary(queue, args, langs, from_date=None, to_date=None):
+    """The backfill summary, computed from the queue state."""
+    keys = [key or '' for key in _lang_keys(langs)]
+    summary = queue.summary(args.output_prefix, keys, from_date, to_date)
+    scope = f"{from_date} -> {to_date}" if from_date else f"queue {queue.path}"
     log.info("=" * 60)
-    log.info(f"Backfill summary ({from_date} -> {to_date}):")
-    log.info(f"  Attempted   : {len(to_fetch)}")
+    log.info(f"Backfill summary ({scope}):")
+    log.info(f"  Attempted   : {summary['tasks']}")
     log.info(f"  With rows   : {summary['rows']}")
     log.info(f"  Still empty : {summary['empty']}")
-    log.info(f"  Errors      : {summary['errors']}")
-    if errors:
+    log.info(f"  Errors      : {summary['failed']}")
+    if summary['pending'] or summary['leased']:
+        log.info(f"  Pending     : {summary['pending']}")
+        log.info(f"  Leased      : {summary['leased']} (being mined by other workers, or by one that died)")
+    if summary['errors']:
         log.info("  Errored dates:")
-        for date, msg in errors:
-            log.info(f"    {date}: {msg}")
-    if fetched_empty:
+        for date, key, msg in summary['errors']:
+            log.info(f"    {_label(date, key)}: {msg}")
+    if summary['empty_dates']:
         log.info("  Empty-after-fetch dates (genuine zero-publication days or persistent API trouble):")
-        for date, _path in fetched_empty:
-            log.info(f"    {date}")
+        for date, key in summary['empty_dates']:
+            log.info(f"    {_label(date, key)}")
     log.info("=" * 60)
 
 
-def _run_lookback(args, lang_filter, lang_suffix):
+def _run_backfill(args, langs):
+    """Backfill through a work queue: enqueue the gap scan, then mine what can be claimed.
+
+    Without --queue the queue lives in memory for this run. With it, the
+    queue file outlives the run: a restart resumes where it stopped, and
+    any number of `--queue-action work` processes (or hosts sharing the
+    file) can drain it together.
+    """
+    from .workqueue import WorkQueue
+
+    action = args.queue_action
+    if action != 'run' and not args.queue:
+        raise SystemExit(f"--queue-action {action} requires --queue.")
+    if action == 'status':
+        _log_queue_summary(WorkQueue(args.queue), args, langs)
+        return
+
+    from_date = to_date = None
+    if action in ('run', 'enqueue'):
+        from_date, to_date, to_fetch = _scan_gaps(args, langs)
+        if args.dry_run:
+            for date, wanted in to_fetch.items():
+                for key, reason in wanted.items():
+                    log.info(f"DRY-RUN would fetch {_label(date, key)}  [{reason}]")
+            return
+        if not to_fetch and not args.queue:
+            log.info("Nothing to do.")
+            return
+    queue = WorkQueue(args.queue or ':memory:', lease_seconds=args.lease_minutes * 60)
+    if action in ('run', 'enqueue'):
+        tasks = [(date.isoformat(), key or '', reason)
+                 for date, wanted in to_fetch.items() for key, reason in wanted.items()]
+        added = queue.enqueue(args.output_prefix, tasks)
+        if args.queue:
+            log.info(f"Queued {added} new or reopened tasks in {args.queue} ({len(tasks) - added} already pending)")
+        if action == 'enqueue':
+            return
+    _work_queue(args, langs, queue)
+    _log_queue_summary(queue, args, langs, from_date, to_date)
+
+
+def _run_lookback(args, langs):
+    from .core import prefetch_docs
+    _configure_limits(args)
+
     total_days = args.lookback if args.lookback is not None else args.days
 
+    windows = []
     for i in range(0, total_days, args.days_per_request):
         current_batch_days = min(args.days_per_request, total_days - i)
         date = datetime.date.today() - datetime.timedelta(days=i + current_batch_days - 1)
-
+        windows.append((date, current_batch_days))
+
+    # One SPARQL request per window for all requested languages; each
+    # language still gets its own file.
+    for date, current_batch_days, meta, failed in prefetch_docs(windows, lang=langs, depth=args.pipeline_depth):
+        if current_batch_days > 1 and args.split_by_day:
+            # One SPARQL request for the window, but the standard per-day files.
+            for day, day_meta in sorted(_split_by_day(date, current_batch_days, meta).items(), reverse=True):
+                if day in failed:
+                    # Not written: an empty or partial file would pass for a complete day.
+                    log.error(f"Failed to process {day}: incomplete SPARQL metadata")
+                    continue
+                try:
+                    _log_saved(day, _mine(day, args, langs, meta=day_meta))
+                except Exception as e:
+                    log.error(f"Failed to process {day}: {e}")
+            continue
+
+        batch_desc = f"{date}" if current_batch_days == 1 else f"{date} to {date + datetime.timedelta(days=current_batch_days-1)}"
+        if failed:
+            log.error(f"Failed to process {batch_desc}: incomplete SPARQL metadata")
+            continue
         try:
-            docs = list(get_docs_text(date, lang=lang_filter, days=current_batch_days))
+            _log_saved(date, _mine(date, args, langs, days=current_batch_days, meta=meta))
+        except Exception as e:
+            log.error(f"Failed to process {batch_desc}: {e}")
 
-            if not docs:
-                df = pl.DataFrame([], schema=SCHEMA)
-                df = match_keywords(df, args.keywords)
-                log.info(f"∅ No documents for {date}, creating empty file.")
-            else:
-                df = pl.DataFrame(docs, schema=SCHEMA)
-                df = clean_text_batch(df)
-                df = match_keywords(df, args.keywords)
-
-                if args.unique_on:
-                    if args.unique_on in df.columns:
-                        original_len = len(df)
-                        df = df.unique(subset=[args.unique_on], keep="last")
-                        if len(df) < original_len:
-                            log.info(f"Deduplicated: {original_len} -> {len(df)} records (unique on {args.unique_on})")
-                    else:
-                        log.warning(f"Column '{args.unique_on}' not found for deduplication. Available: {df.columns}")
 
-                if args.save_only_keyword_matches and args.keywords:
-                    df = filter_keyword_matches(df, args.keywords)
-                    log.info(f"Filtered to {len(df)} keyword matches.")
+def _merge_day(date, args, langs, meta):
+    """Mine the given documents of one day and merge them into its per-language files.
 
-            if current_batch_days > 1:
-                end_date = date + datetime.timedelta(days=current_batch_days - 1)
-                filename = f"{args.output_prefix}{date}_to_{end_date}{lang_suffix}.parquet"
-            else:
-                filename = f"{args.output_prefix}{date}{lang_suffix}.parquet"
-
-            # Place in year-subdir so local layout mirrors the HF dataset
-            # (files/YYYY/dataset_YYYY-MM-DD_eng.parquet). The start date's year
-            # is used for batched range files.
-            year_dir = os.path.join(FILES_DIR, str(date.year))
-            os.makedirs(year_dir, exist_ok=True)
-            output_path = os.path.join(year_dir, filename)
-
-            df.write_parquet(output_path)
-            if not docs:
-                log.info(f"✓ Saved empty file to {output_path}")
-            else:
-                log.info(f"✓ Saved {len(df)} records to {output_path}")
+    Returns {lang key: (n_rows mined, n_rows replaced, n_rows in the file, path)}
+    for the files that changed. Existing rows are matched on url (and on
+    --unique-on, if set); see watch.merge_into.
 
+    Only files that exist locally are merged into. A file made of the
+    modified works alone would pass for the complete day (in the catalog,
+    for backfill and for `sync push`), so a language without a local file
+    gets the whole day mined instead, through _mine; its n_rows replaced
+    is None. Any failure raises, so that the watch mark stays put.
+    """
+    from .core import get_docs_text
+    from .watch import merge_into
+
+    outputs = {key: _output_path(args, date, key) for key in _lang_keys(langs)}
+    missing = [key for key, path in outputs.items() if not os.path.exists(path)]
+    results = {}
+    if missing:
+        log.info(f"No local file for {', '.join(_label(date, key) for key in missing)}: mining the whole day")
+        for key, (_status, n_rows, path) in _mine(date, args, [lang for lang in langs
+                                                                if lang.lower() in missing]).items():
+            results[key] = (n_rows, None, n_rows, path)
+        outputs = {key: path for key, path in outputs.items() if key not in missing}
+        if not outputs:
+            return results
+        meta = [doc for doc in meta if doc['lang'] in outputs]
+    docs = get_docs_text(date, lang=langs, concurrency=args.download_concurrency, docs=meta,
+                         reuse=_reusable(outputs.values(), args), **_text_options(args))
+    merge_keys = ('url', args.unique_on) if args.unique_on and args.unique_on != 'url' else ('url',)
+    for key, part in _route(docs, outputs).items():
+        if not part:
+            continue
+        df = _build_frame(part, args)
+        with get_metrics().timed('write'):
+            replaced, n_rows = merge_into(outputs[key], df, merge_keys)
+        _record_output(outputs[key])
+        results[key] = (len(df), replaced, n_rows, outputs[key])
+    return results
+
+
+def _watch_pass(args, langs, state, since=None):
+    """Mine the works modified since the watch mark into their per-day files, then advance the mark.
+
+    The window starts WATCH_OVERLAP_SECONDS before the mark (or at `since`;
+    without either, --lookback days back) and ends now. The mark only moves
+    if every affected day was merged. Returns whether it did.
+    """
+    from .core import get_modified_docs
+
+    keys = _lang_keys(langs)
+    until = datetime.datetime.now(datetime.timezone.utc)
+    mark = state.mark(args.output_prefix, keys)
+    if since is None and mark is not None:
+        since = mark - datetime.timedelta(seconds=WATCH_OVERLAP_SECONDS)
+    elif since is None:
+        days = args.lookback if args.lookback is not None else args.days
+        since = until - datetime.timedelta(days=days)
+        log.info(f"No watch mark for '{args.output_prefix}' yet; starting {days} days back")
+
+    meta = get_modified_docs(since, until, lang=langs)
+    by_day = {}
+    for doc in meta:
+        try:
+            by_day.setdefault(datetime.date.fromisoformat(doc['date'][:10]), []).append(doc)
+        except ValueError:
+            log.warning(f"Unparseable date '{doc['date']}' for {doc['url']}, skipping")
+    log.info(f"Watch: {len(meta)} documents modified in ({since:%Y-%m-%d %H:%M}, {until:%Y-%m-%d %H:%M}] UTC, "
+             f"dated on {len(by_day)} days")
+
+    failed = 0
+    for day, day_meta in sorted(by_day.items()):
+        try:
+            for key, (n_new, replaced, n_rows, path) in _merge_day(day, args, langs, day_meta).items():
+                if replaced is None:
+                    log.info(f"✓ Mined the whole day into {path} ({n_rows} records)")
+                else:
+                    log.info(f"✓ Merged {n_new} records into {path} ({replaced} replaced, {n_rows} in file)")
         except Exception as e:
-            batch_desc = f"{date}" if current_batch_days == 1 else f"{date} to {date + datetime.timedelta(days=current_batch_days-1)}"
-            log.error(f"Failed to process {batch_desc}: {e}")
+            failed += 1
+            log.error(f"Failed to process {day}: {e}")
+    if failed:
+        log.warning(f"Watch mark not advanced: {failed} days failed and will be retried next pass")
+        return False
+    state.advance(args.output_prefix, keys, until)
+    log.info(f"Watch mark advanced to {until:%Y-%m-%d %H:%M:%S} UTC")
+    return True
+
+
+def _run_watch(args, langs):
+    from .watch import WatchState
+
+    _configure_limits(args)
+    state = WatchState()
+    since = None
+    if args.watch_since:
+        try:
+            since = datetime.datetime.fromisoformat(args.watch_since)
+        except ValueError as exc:
+            raise SystemExit(f"Invalid --watch-since '{args.watch_since}': expected an ISO date or timestamp ({exc})")
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+    while True:
+        try:
+            ok = _watch_pass(args, langs, state, since=since)
+        except Exception as e:
+            log.error(f"Watch pass failed, mark not advanced: {e}")
+            ok = False
+        since = None
+        if not args.watch_interval:
+            if not ok:
+                sys.exit(1)
+            return
+        log.info(f"Next watch pass in {args.watch_interval:g} minutes")
+        time.sleep(args.watch_interval * 60)
+
+
+def _run_catalog(argv):
+    from .catalog import get_catalog
+
+    parser = argparse.ArgumentParser(prog='eur_lex_miner catalog',
+                                     description='Refresh the dataset catalog and report gaps from it')
+    parser.add_argument('--prefix', type=str, default='dataset_', help='Output prefix to report on (default: dataset_)')
+    parser.add_argument('--lang', type=str, help='Language code of the files to report on (e.g. ENG)')
+    parser.add_argument('--from-date', type=str, help='Range start (YYYY-MM-DD). Default: earliest cataloged date.')
+    parser.add_argument('--to-date', type=str, help='Range end (YYYY-MM-DD). Default: latest cataloged date.')
+    parser.add_argument('--mined-since', type=str,
+                        help='Instead of the gap report, list the files (path, sha256, bytes) mined at or after '
+                             'this ISO timestamp, e.g. to plan an upload')
+    args = parser.parse_args(argv)
+    lang_suffix = f"_{args.lang.lower()}" if args.lang else ""
+
+    catalog = get_catalog()
+    catalog.refresh()
+    if args.mined_since:
+        for path, sha256, size in catalog.files(mined_since=args.mined_since):
+            print(f"{path}\t{sha256}\t{size}")
+        return
+
+    existing = catalog.existing(args.prefix, lang_suffix)
+    if not existing:
+        raise SystemExit(f"No cataloged files for prefix '{args.prefix}'{' lang ' + args.lang if args.lang else ''}.")
+    from_date = _parse_iso(args.from_date, '--from-date') if args.from_date else datetime.date.fromisoformat(min(existing))
+    to_date = _parse_iso(args.to_date, '--to-date') if args.to_date else datetime.date.fromisoformat(max(existing))
+    missing, empty = catalog.gaps(args.prefix, lang_suffix, from_date, to_date)
+    n_total = (to_date - from_date).days + 1
+    print(f"Range analyzed: {from_date} to {to_date} ({n_total} days)")
+    print(f"Days with rows: {n_total - len(missing) - len(empty)}")
+    print(f"Empty days    : {len(empty)}")
+    print(f"Missing days  : {len(missing)}")
+    if missing:
+        print("First 20 missing dates:")
+        for d in missing[:20]:
+            print(f"  {d}")
+
+
+def _run_compact(argv):
+    from .compact import compact, GRANULARITIES
+
+    parser = argparse.ArgumentParser(prog='eur_lex_miner compact',
+                                     description='Rewrite daily files into Hive-partitioned (year=/month=) parquet '
+                                                 'sorted by date and celex, for analysis')
+    parser.add_argument('--prefix', type=str, default='dataset_', help='Output prefix of the daily files (default: dataset_)')
+    parser.add_argument('--lang', type=str, help='Language code of the daily files (e.g. ENG)')
+    parser.add_argument('--granularity', choices=GRANULARITIES, default='month',
+                        help='Partition size (default: month)')
+    parser.add_argument('--from-date', type=str, help='Only rebuild partitions touching dates from here (YYYY-MM-DD)')
+    parser.add_argument('--to-date', type=str, help='Only rebuild partitions touching dates up to here (YYYY-MM-DD)')
+    parser.add_argument('--output', type=str, default=COMPACT_DIR, help=f'Root of the compacted datasets (default: {COMPACT_DIR})')
+    parser.add_argument('--force', action='store_true', help='Rebuild partitions even if they are newer than their daily files')
+    parser.add_argument('--dry-run', action='store_true', help='Report which partitions would be rebuilt')
+    args = parser.parse_args(argv)
+    lang_suffix = f"_{args.lang.lower()}" if args.lang else ""
+    from_date = _parse_iso(args.from_date, '--from-date') if args.from_date else None
+    to_date = _parse_iso(args.to_date, '--to-date') if args.to_date else None
+
+    results = compact(args.prefix, lang_suffix, granularity=args.granularity, from_date=from_date,
+                      to_date=to_date, root=args.output, force=args.force, dry_run=args.dry_run)
+    rebuilt = {part: rows for part, rows in results.items() if rows is not None}
+    log.info(f"Compaction: {len(rebuilt)} partitions rebuilt ({sum(rebuilt.values())} rows), "
+             f"{len(results) - len(rebuilt)} up to date")
+
+
+def _run_query(argv):
+    import polars as pl
+    from .catalog import get_catalog
+    from .docindex import get_doc_index, INDEXED_FIELDS
+    from .query import run_query, DEFAULT_COLUMNS
+
+    parser = argparse.ArgumentParser(prog='eur_lex_miner query',
+                                     description='Query the mined daily files; concept, institution and directory '
+                                                 'code filters are answered from the document index')
+    parser.add_argument('--prefix', type=str, default='dataset_', help='Output prefix of the daily files (default: dataset_)')
+    parser.add_argument('--lang', type=str, help='Language code of the daily files (e.g. ENG)')
+    parser.add_argument('--concept', nargs='+', help='Eurovoc concept id(s), e.g. 5877')
+    parser.add_argument('--institution', nargs='+', help='Institution label(s), e.g. "European Commission"')
+    parser.add_argument('--directory-code', nargs='+', help='Directory code label(s)')
+    parser.add_argument('--from-date', type=str, help='Range start (YYYY-MM-DD)')
+    parser.add_argument('--to-date', type=str, help='Range end (YYYY-MM-DD)')
+    parser.add_argument('--columns', type=str, default=','.join(DEFAULT_COLUMNS),
+                        help=f'Comma-separated columns to return (default: {",".join(DEFAULT_COLUMNS)})')
+    parser.add_argument('--limit', type=int, help='Return at most this many documents')
+    parser.add_argument('--count', action='store_true', help='Only print the number of matching documents')
+    parser.add_argument('--output', type=str, help='Write the result to this .parquet/.csv file instead of printing it')
+    args = parser.parse_args(argv)
+    lang_suffix = f"_{args.lang.lower()}" if args.lang else ""
+    from_date = _parse_iso(args.from_date, '--from-date') if args.from_date else None
+    to_date = _parse_iso(args.to_date, '--to-date') if args.to_date else None
+    filters = {field: getattr(args, field) for field in INDEXED_FIELDS if getattr(args, field)}
+
+    catalog = get_catalog()
+    catalog.refresh()
+    index = get_doc_index()
+    if filters:
+        index.sync(catalog)
+    columns = [c.strip() for c in args.columns.split(',') if c.strip()]
+    df = run_query(catalog, index, args.prefix, lang_suffix, columns=columns, filters=filters,
+                   from_date=from_date, to_date=to_date, limit=args.limit)
+
+    if args.count:
+        print(len(df))
+    elif args.output and args.output.endswith('.csv'):
+        df.with_columns(pl.col(pl.List(pl.String)).list.join('|')).write_csv(args.output)
+        log.info(f"✓ Saved {len(df)} records to {args.output}")
+    elif args.output:
+        df.write_parquet(args.output)
+        log.info(f"✓ Saved {len(df)} records to {args.output}")
+    else:
+        with pl.Config(tbl_rows=50, fmt_str_lengths=80):
+            print(df)
+
+
+def _run_search(argv):
+    import polars as pl
+    from .catalog import get_catalog
+    from .search import get_search_index
+
+    parser = argparse.ArgumentParser(prog='eur_lex_miner search',
+                                     description='Full-text search over the mined texts, ranked with BM25')
+    parser.add_argument('query', type=str,
+                        help='Words (implicitly ANDed), "quoted phrases", AND / OR / NOT and parentheses, '
+                             'e.g. \'"earth observation" AND (copernicus OR sentinel) NOT galileo\'')
+    parser.add_argument('--prefix', type=str, default='dataset_', help='Output prefix of the daily files (default: dataset_)')
+    parser.add_argument('--lang', type=str, help='Language code of the daily files (e.g. ENG)')
+    parser.add_argument('--from-date', type=str, help='Range start (YYYY-MM-DD)')
+    parser.add_argument('--to-date', type=str, help='Range end (YYYY-MM-DD)')
+    parser.add_argument('--limit', type=int, default=20, help='Number of results to return (default: 20)')
+    parser.add_argument('--no-update', action='store_true',
+                        help='Search the index as it is instead of first indexing new or changed daily files')
+    parser.add_argument('--output', type=str, help='Write the results to this .parquet/.csv file instead of printing them')
+    args = parser.parse_args(argv)
+    lang_suffix = f"_{args.lang.lower()}" if args.lang else ""
+    from_date = _parse_iso(args.from_date, '--from-date').isoformat() if args.from_date else None
+    to_date = _parse_iso(args.to_date, '--to-date').isoformat() if args.to_date else None
+
+    catalog = get_catalog()
+    index = get_search_index()
+    if not args.no_update:
+        catalog.refresh()
+        index.sync(catalog)
+    existing = catalog.existing(args.prefix, lang_suffix)
+    paths = [os.path.relpath(path, catalog.root) for iso, (path, _rows) in existing.items()
+             if (from_date is None or iso >= from_date) and (to_date is None or iso <= to_date)]
+    try:
+        df = index.search(args.query, paths, limit=args.limit)
+    except ValueError as exc:
+        raise SystemExit(f"Invalid query: {exc}")
+
+    if args.output and args.output.endswith('.csv'):
+        df.write_csv(args.output)
+        log.info(f"✓ Saved {len(df)} results to {args.output}")
+    elif args.output:
+        df.write_parquet(args.output)
+        log.info(f"✓ Saved {len(df)} results to {args.output}")
+    else:
+        with pl.Config(tbl_rows=args.limit, fmt_str_lengths=80):
+            print(df)
+
+
+def _run_sync(argv):
+    from .catalog import get_catalog
+    from .sync import open_backend, pull, push
+
+    parser = argparse.ArgumentParser(prog='eur_lex_miner sync',
+                                     description='Seed the dataset catalog from a remote copy of files/ (manifests '
+                                                 'only, plus an optional recent window), or upload the files whose '
+                                                 'content changed')
+    parser.add_argument('action', choices=('pull', 'push'))
+    parser.add_argument('--remote', type=str, required=True,
+                        help='hf://<user>/<dataset> (token from HF_TOKEN), or a local directory standing in for it')
+    parser.add_argument('--from-date', type=str,
+                        help='pull: read the metadata of files dated from here on (YYYY-MM-DD). Default: Jan 1 of this year')
+    parser.add_argument('--to-date', type=str, help='pull: ... and up to here (YYYY-MM-DD). Default: today')
+    parser.add_argument('--download-from', type=str,
+                        help='pull: also download the files dated from here on, e.g. the window a --reuse-existing '
+                             'run refreshes. Default: metadata only')
+    parser.add_argument('--prefix', type=str, help='pull: only download files with this output prefix')
+    parser.add_argument('--lang', nargs='+', metavar='LANG', help='pull: only download files of these languages')
+    parser.add_argument('--message', type=str, default=f"Update {datetime.date.today()}", help='push: commit message')
+    parser.add_argument('--workers', type=int, default=SYNC_WORKERS,
+                        help=f'Transfers in flight (default: {SYNC_WORKERS})')
+    parser.add_argument('--batch-files', type=int, default=SYNC_BATCH_FILES,
+                        help=f'push: files per commit (default: {SYNC_BATCH_FILES})')
+    parser.add_argument('--dry-run', action='store_true', help='push: only report what would be uploaded')
+    args = parser.parse_args(argv)
+
+    backend = open_backend(args.remote)
+    catalog = get_catalog()
+    if args.action == 'push':
+        push(backend, catalog, args.message, workers=args.workers, batch_files=args.batch_files, dry_run=args.dry_run)
+        return
+    today = datetime.date.today()
+    from_date = _parse_iso(args.from_date, '--from-date') if args.from_date else today.replace(month=1, day=1)
+    to_date = _parse_iso(args.to_date, '--to-date') if args.to_date else today
+    download_from = _parse_iso(args.download_from, '--download-from') if args.download_from else None
+    pull(backend, catalog, from_date, to_date, download_from=download_from, prefix=args.prefix,
+         langs=[key for key in _lang_keys(_parse_langs(args.lang)) if key], workers=args.workers)
+
+
+# Subcommands are dispatched on the first argument; anything else is the
+# classic "eur_lex_miner <output_prefix> ..." invocation.
+SUBCOMMANDS = {
+    'catalog': _run_catalog,
+    'compact': _run_compact,
+    'query': _run_query,
+    'search': _run_search,
+    'sync': _run_sync,
+}
 
 
 def run():
+    setup_logging()
+    ensure_dirs()
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(description='Eurovoc Miner - European Commission Cellar Data Extraction')
     parser.add_argument('output_prefix', type=str, help='Prefix for the output Parquet files')
     parser.add_argument('--days', type=int, default=1, help='Number of days to process (alias for --lookback)')
     parser.add_argument('--lookback', type=int, help='Safety margin: how many days into the past to search')
-    parser.add_argument('--lang', type=str, help='Filter by language code (e.g. ENG, SPA, FRA)')
+    parser.add_argument('--lang', nargs='+', metavar='LANG',
+                        help='Language code(s) to mine (e.g. ENG, or ENG FRA DEU), or ALL for the official EU '
+                             'languages. Several languages share one SPARQL query per window and each gets its '
+                             'own _<lang> files')
     parser.add_argument('--keywords', nargs='+', help='Optional keywords to match in full text')
+    parser.add_argument('--keywords-file', type=str, help='File with one keyword per line (# comments allowed), added to --keywords')
+    parser.add_argument('--whole-word', action='store_true', help='Only match keywords on word boundaries')
+    parser.add_argument('--case-sensitive', action='store_true', help='Match keywords case-sensitively (default: case-folded)')
+    parser.add_argument('--keyword-output', choices=KEYWORD_OUTPUTS, default='bool',
+                        help='Keyword columns to add: match_* booleans (default), count_* hit counts or offset_* first-hit offsets')
     parser.add_argument('--save-only-keyword-matches', action='store_true', help='Only save records that match at least one of the provided keywords')
     parser.add_argument('--days-per-request', type=int, default=1, help='Number of days to fetch in a single SPARQL request')
-    parser.add_argument('--unique-on', type=str, help='Column name to ensure uniqueness (e.g. celex)')
+    parser.add_argument('--reuse-existing', action='store_true',
+                        help='Take the text of documents already present (same url, celex and formats) in the '
+                             'parquet being refreshed instead of downloading and parsing them again')
+    parser.add_argument('--split-by-day', action='store_true',
+                        help='With --days-per-request > 1, write the standard per-day files (empty days included) '
+                             'instead of one _to_ range file')
+    parser.add_argument('--unique-on', type=str,
+                        help='Column name to ensure uniqueness (e.g. celex); the last row of each key is kept, '
+                             'or with --stream-batch-size the first batch\'s row for keys spanning batches')
+    parser.add_argument('--download-concurrency', type=int, default=DOWNLOAD_CONCURRENCY,
+                        help=f'Maximum document downloads in flight; the adaptive limiter settles at or below it '
+                             f'(default: {DOWNLOAD_CONCURRENCY})')
+    parser.add_argument('--max-request-rate', type=float, default=LIMITER_MAX_RATE,
+                        help=f'Cap on document requests per second; backs off on 429/503 and slow responses '
+                             f'(default: {LIMITER_MAX_RATE:g}, 0 = no cap)')
+    parser.add_argument('--format-priority', type=lambda v: [f.strip() for f in v.split(',') if f.strip()],
+                        default=FORMAT_PRIORITY,
+                        help=f'Comma-separated manifestation types to try, in order; later ones are fallbacks '
+                             f'when earlier ones fail or are empty (default: {",".join(FORMAT_PRIORITY)})')
+    parser.add_argument('--doc-timeout', type=float, default=DOC_TIMEOUT,
+                        help=f'Give up parsing a document after this many seconds and try its next format; '
+                             f'skipped documents are listed in skipped.jsonl (default: {DOC_TIMEOUT}, 0 = no limit)')
+    parser.add_argument('--max-doc-mb', type=int, default=DOC_MAX_BYTES // (1024 * 1024),
+                        help=f'Skip manifestations larger than this many MB (default: {DOC_MAX_BYTES // (1024 * 1024)}, '
+                             f'0 = no limit)')
+    parser.add_argument('--pipeline-depth', type=int, default=0,
+                        help='Prefetch SPARQL results for this many upcoming dates while the current one is '
+                             'downloaded, parsed and written (default: 0, strictly sequential)')
+    parser.add_argument('--stream-batch-size', type=int, default=0,
+                        help='Write each file incrementally in batches of this many documents (one row group each) '
+                             'instead of building the whole window in memory (default: 0, off)')
+    parser.add_argument('--max-batch-mb', type=int, default=STREAM_MAX_BATCH_MB,
+                        help=f'With --stream-batch-size, also flush a batch once its text reaches this many MB '
+                             f'(default: {STREAM_MAX_BATCH_MB})')
+    parser.add_argument('--report', type=str, default=RUN_REPORT_FILE,
+                        help=f'Write the JSON run report (stage latencies, bytes per format, cache hits, docs/s, '
+                             f'peak RSS) here at exit (default: {RUN_REPORT_FILE})')
+    parser.add_argument('--prometheus-textfile', type=str,
+                        help='Also write the run metrics in Prometheus textfile-collector format to this path')
+    parser.add_argument('--profile', nargs='+', choices=STAGES, default=[], metavar='STAGE',
+                        help=f'Run these stages under cProfile; merged stats go next to the report as '
+                             f'<report>.<stage>.prof (stages: {", ".join(STAGES)})')
 
     bf = parser.add_argument_group('backfill', 'Intelligent backfill: re-mine only dates with no parquet (or empty parquets) in a range.')
     bf.add_argument('--backfill-missing', action='store_true',
-                    help='Enable backfill mode. Scans FILES_DIR for the given prefix/lang and re-fetches only the dates that are missing within the range.')
+                    help='Enable backfill mode. Checks the dataset catalog for the given prefix/lang and re-fetches only the dates that are missing within the range.')
     bf.add_argument('--retry-empty', action='store_true',
                     help='In backfill mode, also re-fetch dates whose existing parquet has 0 rows. Requires --from-date.')
     bf.add_argument('--from-date', type=str, help='Backfill range start (YYYY-MM-DD). Default: earliest existing matching date.')
     bf.add_argument('--to-date', type=str, help='Backfill range end (YYYY-MM-DD). Default: today.')
     bf.add_argument('--dry-run', action='store_true', help='Report what would be backfilled; no SPARQL/document fetches.')
+    bf.add_argument('--queue', type=str,
+                    help='Keep the backfill work in this SQLite queue file (e.g. cache/backfill_queue.sqlite), so '
+                         'a restart resumes where it stopped and several workers can share it. Default: in memory.')
+    bf.add_argument('--queue-action', choices=('run', 'enqueue', 'work', 'status'), default='run',
+                    help='run: scan for gaps, enqueue and mine (default); enqueue: only scan and enqueue; '
+                         'work: only mine what is queued; status: print the queue summary')
+    bf.add_argument('--queue-workers', type=int, default=1, metavar='N',
+                    help='Number of worker processes sharing the --queue file. Request limits are per process, so '
+                         'each worker takes 1/N of --download-concurrency, --max-request-rate and the SPARQL '
+                         'concurrency, keeping their combined load at the configured limits (default: 1)')
+    bf.add_argument('--lease-minutes', type=float, default=QUEUE_LEASE_SECONDS / 60,
+                    help=f'A claimed date returns to the queue if its worker stops renewing it for this long '
+                         f'(default: {QUEUE_LEASE_SECONDS // 60})')
+    bf.add_argument('--shard', type=_parse_shard, metavar='K/N',
+                    help='Only backfill dates whose ordinal is K modulo N, e.g. one shard per CI matrix job '
+                         'when the workers share no queue file')
+
+    wa = parser.add_argument_group('watch', 'Incremental mode: mine only the works created or modified since the '
+                                            'previous run, merging them into their per-day files.')
+    wa.add_argument('--watch', action='store_true',
+                    help='Query the works whose Cellar last-modification time is past the stored mark, merge them '
+                         'into the per-day files of their dates, then advance the mark. Without a mark, starts '
+                         '--lookback days back.')
+    wa.add_argument('--watch-interval', type=float, default=0,
+                    help='Keep running, one pass every this many minutes (default: 0, a single pass)')
+    wa.add_argument('--watch-since', type=str,
+                    help='Start the first pass here (ISO date or timestamp, UTC by default) instead of at the mark')
 
     args = parser.parse_args()
+    if args.watch and args.backfill_missing:
+        parser.error('--watch and --backfill-missing are separate modes')
+    if args.keywords_file:
+        from .processor import load_keywords
+        args.keywords = (args.keywords or []) + load_keywords(args.keywords_file)
 
-    lang_filter = args.lang.upper() if args.lang else None
-    lang_suffix = f"_{args.lang.lower()}" if args.lang else ""
+    langs = _parse_langs(args.lang)
 
-    if args.backfill_missing:
-        _run_backfill(args, lang_filter, lang_suffix)
-    else:
-        _run_lookback(args, lang_filter, lang_suffix)
+    metrics = reset_metrics(profile=args.profile)
+    try:
+        if args.watch:
+            _run_watch(args, langs)
+        elif args.backfill_missing:
+            _run_backfill(args, langs)
+        else:
+            _run_lookback(args, langs)
+    finally:
+        shutdown_pool()
+        # Limiter state, if any request was made (importing throttle just for
+        # this would pull urllib3 into dry runs).
+        throttle = sys.modules.get('eurovoc_miner.throttle')
+        if throttle is not None:
+            for name, stats in throttle.limiter_stats().items():
+                metrics.set_limiter(name, stats)
+        report = metrics.write_report(args.report)
+        if args.prometheus_textfile:
+            metrics.write_prometheus(args.prometheus_textfile, report)
 
 
 if __name__ == "__main__":
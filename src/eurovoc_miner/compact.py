@@ -0,0 +1,116 @@
+import datetime
+import logging
+import os
+import shutil
+import polars as pl
+from .catalog import get_catalog
+from .config import COMPACT_DIR, COMPACT_ROW_GROUP_SIZE, COMPACT_COMPRESSION_LEVEL
+
+log = logging.getLogger(__name__)
+
+GRANULARITIES = ('month', 'year')
+PARTITION_FILE = 'part-0.parquet'
+
+
+def partition_of(date, granularity):
+    """Hive-style partition path for a date, e.g. 'year=2026/month=04'."""
+    if granularity == 'year':
+        return f"year={date.year}"
+    return f"year={date.year}/month={date.month:02d}"
+
+
+def dataset_dir(prefix, lang_suffix, root=COMPACT_DIR):
+    """Compacted dataset for one prefix/lang, e.g. compact/dataset_eng."""
+    return os.path.join(root, f"{prefix.rstrip('_')}{lang_suffix}")
+
+
+def plan_partitions(existing, granularity, from_date=None, to_date=None):
+    """Group cataloged daily files ({iso: (path, rows)}) into {partition: [paths]}.
+
+    Every partition touched by [from_date, to_date] gets *all* of its daily
+    files, not only those inside the range, so a rebuild never drops data.
+    Empty (0-row) and unreadable files are left out.
+    """
+    touched = set()
+    by_partition = {}
+    for iso, (path, rows) in existing.items():
+        d = datetime.date.fromisoformat(iso)
+        part = partition_of(d, granularity)
+        if (from_date is None or d >= from_date) and (to_date is None or d <= to_date):
+            touched.add(part)
+        if rows:
+            by_partition.setdefault(part, []).append(path)
+    return {part: sorted(by_partition.get(part, [])) for part in sorted(touched)}
+
+
+def is_up_to_date(part_dir, sources):
+    """True when the partition file is newer than every daily file it was built from."""
+    target = os.path.join(part_dir, PARTITION_FILE)
+    if not os.path.exists(target):
+        return False
+    built = os.path.getmtime(target)
+    return all(os.path.getmtime(p) <= built for p in sources)
+
+
+def compact_partition(sources, part_dir, row_group_size=COMPACT_ROW_GROUP_SIZE):
+    """Rewrite one partition from its daily files. Returns the number of rows written.
+
+    Rows are sorted by date, celex so the row-group statistics on those
+    columns are tight enough for filter pushdown. Daily files whose keyword
+    columns differ are aligned (missing columns become null). The partition
+    file is written next to its final name and swapped in with os.replace,
+    so readers never see a half-written partition and other partitions are
+    not touched. A partition with no rows left is removed.
+    """
+    if not sources:
+        if os.path.isdir(part_dir):
+            shutil.rmtree(part_dir)
+        return 0
+
+    os.makedirs(part_dir, exist_ok=True)
+    target = os.path.join(part_dir, PARTITION_FILE)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    frame = pl.concat([pl.scan_parquet(p) for p in sources], how='diagonal_relaxed')
+    try:
+        frame.sort(['date', 'celex']).sink_parquet(
+            tmp,
+            compression='zstd',
+            compression_level=COMPACT_COMPRESSION_LEVEL,
+            statistics=True,
+            row_group_size=row_group_size,
+        )
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return pl.scan_parquet(target).select(pl.len()).collect().item()
+
+
+def compact(prefix, lang_suffix, granularity='month', from_date=None, to_date=None,
+            root=COMPACT_DIR, force=False, dry_run=False):
+    """Compact the daily files of one prefix/lang into partitions under root.
+
+    Partitions whose file is newer than all of their daily inputs are skipped
+    unless force is set. Returns {partition: rows written, or None if skipped}.
+    """
+    catalog = get_catalog()
+    catalog.refresh()
+    existing = catalog.existing(prefix, lang_suffix)
+    plan = plan_partitions(existing, granularity, from_date, to_date)
+    out_dir = dataset_dir(prefix, lang_suffix, root)
+
+    results = {}
+    for part, sources in plan.items():
+        part_dir = os.path.join(out_dir, part)
+        if not force and sources and is_up_to_date(part_dir, sources):
+            results[part] = None
+            continue
+        if dry_run:
+            log.info(f"DRY-RUN would compact {part} from {len(sources)} daily files")
+            results[part] = None
+            continue
+        rows = compact_partition(sources, part_dir)
+        results[part] = rows
+        log.info(f"✓ Compacted {part}: {len(sources)} daily files -> {rows} rows")
+    return results
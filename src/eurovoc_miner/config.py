@@ -3,51 +3,200 @@ import logging
 
 # Centralized configuration for the Eurovoc Miner
 
-# Paths
+# Paths. EUR_LEX_ROOT_DIR moves everything the miner writes (files, cache,
+# logs), e.g. to keep a benchmark away from the real dataset.
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-ROOT_DIR = os.path.dirname(BASE_DIR)
+ROOT_DIR = os.environ.get('EUR_LEX_ROOT_DIR') or os.path.dirname(BASE_DIR)
 FILES_DIR = os.path.join(ROOT_DIR, 'files')
 CACHE_DIR = os.path.join(ROOT_DIR, 'cache')
+COMPACT_DIR = os.path.join(ROOT_DIR, 'compact')
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'eurovoc_miner', 'templates')
 
-# Create necessary directories
-os.makedirs(FILES_DIR, exist_ok=True)
-os.makedirs(CACHE_DIR, exist_ok=True)
-
 # Logging
 LOG_FILE = os.path.join(ROOT_DIR, 'collect.log')
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
-
-# Network
+
+
+def ensure_dirs():
+    """Create the output and cache directories. Called by entry points, not on import."""
+    os.makedirs(FILES_DIR, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+
+def setup_logging(log_file=LOG_FILE):
+    """Log INFO and above to the console and to log_file. Called by entry points, not on import."""
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+
+# Network. The endpoints can be pointed elsewhere (e.g. scripts/fake_cellar.py)
+# with EUR_LEX_SPARQL_ENDPOINT / EUR_LEX_EUROVOC_XML_URL.
 USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
-SPARQL_ENDPOINT = "https://publications.europa.eu/webapi/rdf/sparql"
-EUROVOC_XML_URL = 'http://publications.europa.eu/resource/dataset/eurovoc'
+SPARQL_ENDPOINT = os.environ.get('EUR_LEX_SPARQL_ENDPOINT', "https://publications.europa.eu/webapi/rdf/sparql")
+EUROVOC_XML_URL = os.environ.get('EUR_LEX_EUROVOC_XML_URL', 'http://publications.europa.eu/resource/dataset/eurovoc')
+# A SPARQL window returning at least this many rows is treated as truncated by
+# the endpoint's result cap and bisected into smaller windows.
+SPARQL_MAX_ROWS = 10000
+# (connect, read) seconds. Fail fast when the SPARQL endpoint hangs — the
+# April 2026 weekly runs burned the full 6h GH Actions budget on calls that
+# never returned because no read timeout was set. 90s is generous for any
+# healthy day-window query (typically <5s) and tight enough that 14 stuck
+# dates fit comfortably inside the 30-min job cap.
+SPARQL_TIMEOUT = (10, 90)
+# Query plan (see fetcher.get_bindings). 'two-phase' first lists a window's
+# work URIs, SPARQL_LIST_PAGE_SIZE per page, then fetches their details in
+# VALUES chunks of SPARQL_DETAIL_CHUNK works (POSTed, SPARQL_DETAIL_TIMEOUT
+# (connect, read) seconds each, SPARQL_MAX_CONCURRENCY in flight); 'single'
+# sends the one monolithic query per window.
+SPARQL_PLAN = os.environ.get('EUR_LEX_SPARQL_PLAN', 'two-phase')
+SPARQL_LIST_PAGE_SIZE = 5000
+SPARQL_DETAIL_CHUNK = 100
+SPARQL_DETAIL_TIMEOUT = (10, 30)
+
+# Eurovoc label index (see eurovoc.py). Rebuilt from EUROVOC_XML_URL once the
+# file is older than EUROVOC_INDEX_MAX_AGE seconds; one fetch per language.
+EUROVOC_INDEX_FILE = os.path.join(CACHE_DIR, 'eurovoc_index.arrow')
+EUROVOC_INDEX_MAX_AGE = 120 * 60
+EUROVOC_LANGS = ['en']
+
+# Extracted-text cache (see textcache.py): zstd-compressed texts keyed on
+# (url, accept, lang), evicted least-recently-used beyond this many bytes.
+TEXT_CACHE_FILE = os.path.join(CACHE_DIR, 'texts.sqlite')
+TEXT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Dataset catalog (see catalog.py): one row per per-day parquet under FILES_DIR.
+CATALOG_FILE = os.path.join(FILES_DIR, '_catalog.sqlite')
+
+# Inverted index concept/institution/directory code -> documents (see docindex.py).
+DOC_INDEX_FILE = os.path.join(CACHE_DIR, 'doc_index.sqlite')
+
+# Full-text search segments, one per daily file (see search.py).
+FTS_DIR = os.path.join(CACHE_DIR, 'fts')
+
+# Compaction (see compact.py): rows per row group and zstd level of the
+# partitioned copies. Texts are large, so row groups are kept fairly small to
+# let date/celex statistics prune at a useful granularity.
+COMPACT_ROW_GROUP_SIZE = 16384
+COMPACT_COMPRESSION_LEVEL = 9
+
+# --lang ALL: the official EU languages, as Cellar language identifiers. All
+# requested languages share one SPARQL query per window; its rows are split
+# into the usual _<lang> per-day files.
+OFFICIAL_LANGUAGES = ['BUL', 'CES', 'DAN', 'DEU', 'ELL', 'ENG', 'EST', 'FIN', 'FRA', 'GLE', 'HRV', 'HUN',
+                      'ITA', 'LAV', 'LIT', 'MLT', 'NLD', 'POL', 'POR', 'RON', 'SLK', 'SLV', 'SPA', 'SWE']
+
+# Keyword columns written by --keyword-output (see processor.match_keywords).
+KEYWORD_OUTPUTS = ('bool', 'count', 'offset')
+
+# Streaming writes (--stream-batch-size): text ceiling per batch, in MB.
+STREAM_MAX_BATCH_MB = 256
+
+# Manifestation policy (see parsers.py): formats are tried cheapest first,
+# later ones only when an earlier one fails or parses to an empty text.
+FORMAT_PRIORITY = ['fmx4', 'xhtml', 'html', 'docx', 'doc', 'pdf', 'pdfa2a', 'pdfa1a']
+# At most PDF_MAX_PAGES pages of a PDF are extracted (0 = no limit), split into
+# shards of PDF_PAGES_PER_SHARD pages that run on separate pool workers. A PDF
+# cut at the cap is logged to SKIPPED_FILE and cached under its own key.
+PDF_MAX_PAGES = 2000
+PDF_PAGES_PER_SHARD = 25
+
+# Per-document limits: bodies above DOC_MAX_BYTES are not parsed and a parse
+# (or PDF shard) running longer than DOC_TIMEOUT seconds is interrupted. Both
+# move on to the document's next format and are logged to SKIPPED_FILE.
+DOC_MAX_BYTES = 200 * 1024 * 1024
+DOC_TIMEOUT = 300
+SKIPPED_FILE = os.path.join(ROOT_DIR, 'skipped.jsonl')
+
+# Backfill work queue (see workqueue.py, --queue). A claimed date is handed
+# back to other workers if its lease is not renewed for QUEUE_LEASE_SECONDS;
+# a task that fails QUEUE_MAX_ATTEMPTS times is given up.
+QUEUE_LEASE_SECONDS = 15 * 60
+QUEUE_MAX_ATTEMPTS = 2
+
+# Dataset sync (see sync.py, `eur_lex_miner sync`). Every year directory of
+# the remote copy carries a SYNC_MANIFEST_NAME with each file's content hash,
+# size and row count: a pull seeds gap detection from it without downloading
+# parquets, a push uploads only files whose hash differs, SYNC_BATCH_FILES
+# per commit with SYNC_WORKERS transfers in flight.
+SYNC_MANIFEST_NAME = '_manifest.json'
+SYNC_BATCH_FILES = 200
+SYNC_WORKERS = 8
+
+# Watch mode (--watch, see watch.py). The last-modification high-water mark
+# per prefix and language is kept in WATCH_STATE_FILE, next to the files so
+# that `sync` carries it between runs. Each pass re-reads the
+# WATCH_OVERLAP_SECONDS before the mark, for works Cellar indexes late; a
+# modification window of SPARQL_MAX_ROWS rows is bisected down to
+# WATCH_MIN_SPAN_SECONDS.
+WATCH_STATE_FILE = os.path.join(FILES_DIR, '_watch_state.json')
+WATCH_OVERLAP_SECONDS = 6 * 3600
+WATCH_MIN_SPAN_SECONDS = 60
+
+# Run report (see metrics.py): per-stage latency histograms, bytes per format,
+# cache hits and peak RSS of a mining run, written as JSON at exit.
+RUN_REPORT_FILE = os.path.join(ROOT_DIR, 'run_report.json')
 
 # Concurrency
 MAX_WORKERS = os.cpu_count() or 1
+# Parser workers are replaced after this many tasks, and the pool is renewed
+# as soon as a worker's RSS exceeds WORKER_MAX_RSS_MB (0 disables either).
+WORKER_MAX_TASKS = 200
+WORKER_MAX_RSS_MB = 1024
+# Document downloads are almost entirely network wait, so they are not tied to
+# the CPU count. One pooled session serves this many requests in flight.
+DOWNLOAD_CONCURRENCY = 64
+# (connect, read) seconds for a single document download.
+DOWNLOAD_TIMEOUT = (10, 120)
+# SPARQL queries in flight at once (prefetching windows, see --pipeline-depth).
+SPARQL_MAX_CONCURRENCY = 4
+
+# Adaptive request limiter (see throttle.py). Downloads start at a quarter of
+# --download-concurrency and settle, AIMD-style, at the most the endpoint
+# sustains: +1 slot per LIMITER_INTERVAL seconds while requests queue for
+# one, x LIMITER_BACKOFF on a 429/5xx, a timeout, or a time to first byte
+# above LIMITER_LATENCY_FACTOR x (and LIMITER_LATENCY_SLACK s over) the best
+# seen. Requests are also capped at LIMITER_MAX_RATE per second (0 = no cap;
+# --max-request-rate), and Retry-After pauses them for up to LIMITER_MAX_PAUSE s.
+LIMITER_MIN_CONCURRENCY = 2
+LIMITER_MAX_RATE = 50.0
+LIMITER_MIN_RATE = 1.0
+LIMITER_LATENCY_FACTOR = 3.0
+LIMITER_LATENCY_SLACK = 0.5
+LIMITER_BACKOFF = 0.5
+LIMITER_INTERVAL = 2.0
+LIMITER_MAX_PAUSE = 120
+# Increases are logged at most this often (backoffs always are).
+LIMITER_LOG_INTERVAL = 30
+
+# Data Schema. Built on first access (module __getattr__) so that importing
+# config does not import polars.
+def _schema():
+    import polars as pl
+    return {
+        "url": pl.String,
+        "celex": pl.String,
+        "eli": pl.String,
+        "title": pl.String,
+        "date": pl.String,
+        "lang": pl.String,
+        "institutions": pl.List(pl.String),
+        "work_types": pl.List(pl.String),
+        "procedure_ids": pl.List(pl.String),
+        "directory_codes": pl.List(pl.String),
+        "formats": pl.List(pl.String),
+        "eurovoc_concepts": pl.List(pl.String),
+        "eurovoc_concepts_ids": pl.List(pl.String),
+        "text": pl.String,
+    }
+
 
-# Data Schema
-import polars as pl
-SCHEMA = {
-    "url": pl.String,
-    "celex": pl.String,
-    "eli": pl.String,
-    "title": pl.String,
-    "date": pl.String,
-    "lang": pl.String,
-    "institutions": pl.List(pl.String),
-    "work_types": pl.List(pl.String),
-    "procedure_ids": pl.List(pl.String),
-    "directory_codes": pl.List(pl.String),
-    "formats": pl.List(pl.String),
-    "eurovoc_concepts": pl.List(pl.String),
-    "eurovoc_concepts_ids": pl.List(pl.String),
-    "text": pl.String,
-}
+def __getattr__(name):
+    if name == 'SCHEMA':
+        globals()['SCHEMA'] = schema = _schema()
+        return schema
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,57 +1,480 @@
 import logging
 import datetime
-from concurrent.futures import ProcessPoolExecutor
+import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import polars as pl
 from tqdm import tqdm
-from .fetcher import get_json_response, get_concepts_id
-from .parsers import get_body
-from .config import MAX_WORKERS
+from .fetcher import get_bindings, get_modified_bindings, IncompleteResult
+from .eurovoc import get_index
+from .parsers import select_formats, parse_body_timed, parse_pdf_pages_timed, pdf_shards, PARSE_ERROR
+from .downloader import get_downloader
+from .textcache import get_text_cache
+from .pool import get_pool
+from .metrics import get_metrics
+from .config import (MAX_WORKERS, DOWNLOAD_CONCURRENCY, FORMAT_PRIORITY, PDF_PAGES_PER_SHARD,
+                     DOC_MAX_BYTES, DOC_TIMEOUT, SKIPPED_FILE, PDF_MAX_PAGES)
 
 log = logging.getLogger(__name__)
 
+_PENDING = object()
+
+# SPARQL variables that hold '|||'-separated terms -> the list columns they fill.
+_TERM_COLUMNS = {'authors': 'institutions', 'workTypes': 'work_types', 'procedureIds': 'procedure_ids',
+                 'directoryCodes': 'directory_codes'}
+_SPARQL_VARS = ['cellarURIs', 'title', 'langIdentifier', 'mtypes', 'date', 'subjects', 'celexIds', 'eliIds',
+                *_TERM_COLUMNS]
+# Columns that describe the work, identical for every language of it.
+_WORK_COLUMNS = ['url', 'celex', 'eli', 'date', *_TERM_COLUMNS.values(), 'eurovoc_concepts']
+
+def _first(expr):
+    """The first of the '|||'-separated values (e.g. of several cellar URIs), untrimmed."""
+    return expr.str.split('|||').list.first()
+
+def _terms(expr, keep_empty=False):
+    """All '|||'-separated values, trimmed; empty ones dropped unless keep_empty."""
+    terms = expr.str.split('|||').list.eval(pl.element().str.strip_chars())
+    return terms if keep_empty else terms.list.eval(pl.element().filter(pl.element() != ''))
+
+def meta_schema():
+    """SCHEMA without `text`: the columns of the documents get_docs yields."""
+    from .config import SCHEMA
+    return {name: dtype for name, dtype in SCHEMA.items() if name != 'text'}
+
+def decode_bindings(rows):
+    """Turn SPARQL result rows (String columns, see fetcher.get_csv_response) into document metadata.
+
+    Splitting, trimming and first-value selection run as Polars expressions
+    over whole columns. Work-level fields are taken from each work's first
+    row and its Eurovoc concepts resolved once, not once per language.
+    Documents without (resolvable) concepts are dropped. Returns a frame
+    with meta_schema() columns and types.
+    """
+    schema = meta_schema()
+    if not rows.height:
+        return pl.DataFrame(schema=schema)
+    rows = rows.with_columns([pl.lit('').alias(var) for var in _SPARQL_VARS if var not in rows.columns])
+    rows = rows.with_columns(pl.col(_SPARQL_VARS).fill_null(''))
+    docs = rows.select(
+        pl.col('cellarURIs').alias('_work'),
+        _first(pl.col('cellarURIs')).alias('url'),
+        _first(pl.col('celexIds')).alias('celex'),
+        _first(pl.col('eliIds')).alias('eli'),
+        _first(pl.col('title')).alias('title'),
+        pl.col('date'),
+        pl.col('langIdentifier').str.to_lowercase().alias('lang'),
+        *(_terms(pl.col(var)).alias(column) for var, column in _TERM_COLUMNS.items()),
+        _terms(pl.col('mtypes'), keep_empty=True).alias('formats'),
+        _terms(pl.col('subjects').str.replace_all('\xa0', ' ', literal=True)).alias('eurovoc_concepts'),
+    ).with_columns(pl.col(_WORK_COLUMNS).first().over('_work'))
+
+    works = docs.unique('_work', keep='first', maintain_order=True)
+    # One join against the label index for the whole result set.
+    with get_metrics().timed('eurovoc'):
+        concept_ids = get_index().resolve_series(works['eurovoc_concepts'])
+    works = works.select('_work', concept_ids.alias('eurovoc_concepts_ids')).drop_nulls()
+    return (docs.join(works, on='_work', how='inner', maintain_order='left')
+            .select(list(schema))
+            .cast(schema))
+
+def get_docs_frame(d, lang=None, days=1):
+    """Document metadata of a window as a DataFrame (see decode_bindings).
+
+    `lang` is one language code or a list of them (see
+    fetcher.get_sparql_query); with several, one query returns a row per
+    work and language. Windows that time out or come back too large are
+    bisected (see fetcher.get_bindings). Failures are raised, so that they
+    are not mistaken for days without documents: IncompleteResult when only
+    some days failed, a RequestException when the whole window did.
+    """
+    return decode_bindings(get_bindings(d, lang=lang, days=days))
+
+def _dicts(frame):
+    # Column-wise to_list() is cheaper than iter_rows(named=True) for the list columns.
+    names = frame.columns
+    for values in zip(*(frame[name].to_list() for name in names)):
+        yield dict(zip(names, values))
+
 def get_docs(d, lang=None, days=1):
-    """Yield document metadata from SPARQL results."""
+    """Yield document metadata dicts, one per row of get_docs_frame."""
+    yield from _dicts(get_docs_frame(d, lang=lang, days=days))
+
+def get_modified_docs(since, until, lang=None):
+    """Document metadata dicts (as get_docs yields) of the works last modified in (since, until].
+
+    Their dates can be anywhere. Errors are raised, not logged: see
+    fetcher.get_modified_bindings.
+    """
+    return list(_dicts(decode_bindings(get_modified_bindings(since, until, lang=lang))))
+
+def _window_docs(d, lang, days):
+    """(docs, failed dates) of a window: the days whose metadata could not be fetched completely
+    (every day when the query failed) are logged and left out of docs."""
     try:
-        results = get_json_response(d, lang=lang, days=days)
-        for r in results['results']['bindings']:
-            subjects = r.get('subjects', {}).get('value', '').replace('\xa0', ' ').split('|||')
-            terms = [t.strip() for t in subjects if t.strip()]
-            if not terms:
-                continue
-                
-            concept_ids = list(get_concepts_id(terms))
-            if not concept_ids:
-                continue
-                
-            # Flatten dictionary and set core fields
-            doc = {
-                'url': r['cellarURIs']['value'].split('|||')[0],  # Take first if multiple
-                'celex': r.get('celexIds', {}).get('value', '').split('|||')[0],
-                'eli': r.get('eliIds', {}).get('value', '').split('|||')[0],
-                'title': r['title']['value'].split('|||')[0],
-                'date': r['date']['value'],
-                'lang': r['langIdentifier']['value'].lower(),
-                'institutions': [t.strip() for t in r.get('authors', {}).get('value', '').split('|||') if t.strip()],
-                'work_types': [t.strip() for t in r.get('workTypes', {}).get('value', '').split('|||') if t.strip()],
-                'procedure_ids': [t.strip() for t in r.get('procedureIds', {}).get('value', '').split('|||') if t.strip()],
-                'directory_codes': [t.strip() for t in r.get('directoryCodes', {}).get('value', '').split('|||') if t.strip()],
-                'formats': [t.strip() for t in r['mtypes']['value'].split('|||')],
-                'eurovoc_concepts': terms,
-                'eurovoc_concepts_ids': concept_ids
-            }
-            yield doc
+        return list(get_docs(d, lang=lang, days=days)), set()
+    except IncompleteResult as e:
+        failed = {day.isoformat() for day in e.failed_dates}
+        log.error(f"Incomplete docs for {d} (+{days}d), not mining {', '.join(sorted(failed))}: {e}")
+        docs = [doc for doc in _dicts(decode_bindings(e.rows)) if doc['date'][:10] not in failed]
+        return docs, e.failed_dates
+    except Exception as e:
+        log.error(f"Error fetching docs for {d} (+{days}d): {e}")
+        return [], {d + datetime.timedelta(days=i) for i in range(days)}
+
+def prefetch_docs(windows, lang=None, depth=0):
+    """Yield (d, days, docs, failed dates) for each (d, days) window, in order.
+
+    Days in `failed dates` have incomplete metadata (see _window_docs) and
+    must not be written. With depth > 0 the SPARQL metadata for up to
+    `depth` upcoming windows is fetched on background threads while the
+    caller is still downloading, parsing and writing the current one.
+    depth=0 queries each window only when it is reached, exactly like the
+    sequential loop.
+    """
+    if depth <= 0:
+        for d, days in windows:
+            yield d, days, *_window_docs(d, lang, days)
+        return
+
+    windows = iter(windows)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=depth, thread_name_prefix='sparql') as executor:
+        def submit_next():
+            for d, days in windows:
+                pending.append((d, days, executor.submit(_window_docs, d, lang, days)))
+                return
+
+        for _ in range(depth):
+            submit_next()
+        while pending:
+            d, days, future = pending.popleft()
+            submit_next()
+            yield d, days, *future.result()
+
+def _with_text(r, text):
+    if not text or not text.strip():
+        return None
+    r['text'] = text
+    return r
+
+def _reuse_key(url, celex, lang, formats):
+    return url, celex, lang, tuple(sorted(formats or []))
+
+def load_reusable_texts(path):
+    """Map (url, celex, lang, formats) -> text for the documents already in a mined parquet.
+
+    Only the identity columns and `text` are read (projection), so the rest
+    of the file is never decoded. Returns {} when the file is missing or
+    unreadable.
+    """
+    try:
+        df = pl.read_parquet(path, columns=['url', 'celex', 'lang', 'formats', 'text'])
     except Exception as e:
-        log.error(f"Error fetching docs for {d}: {e}")
+        log.warning(f"Could not read {path} for text reuse: {e}")
+        return {}
+    return {_reuse_key(url, celex, lang, formats): text
+            for url, celex, lang, formats, text in df.iter_rows() if text}
+
+class _FormatStats:
+    """Per-format download bytes and parse time for one get_docs_text call."""
+
+    def __init__(self):
+        self.docs = {}
+        self.bytes = {}
+        self.seconds = {}
 
-def get_docs_text(d, lang=None, days=1):
-    """Fetch and parse all documents for a given date or range in parallel."""
-    docs = list(get_docs(d, lang=lang, days=days))
+    def add(self, accept, size=0, seconds=0.0, docs=0):
+        self.docs[accept] = self.docs.get(accept, 0) + docs
+        self.bytes[accept] = self.bytes.get(accept, 0) + size
+        self.seconds[accept] = self.seconds.get(accept, 0.0) + seconds
+
+    def log(self):
+        for accept in sorted(self.seconds, key=self.seconds.get, reverse=True):
+            n = self.docs[accept]
+            log.info(f"Parse timing [{accept}]: {n} docs, {self.bytes[accept] / 1e6:.1f} MB, "
+                     f"{self.seconds[accept]:.1f}s ({self.seconds[accept] / max(n, 1):.2f}s/doc)")
+
+
+def _gather_shards(r, futures):
+    """One Future for the page shards of a PDF, resolving to (doc or None or PARSE_ERROR, seconds, timed_out, truncated).
+
+    A shard that failed fails the whole document (PARSE_ERROR), so that a
+    text with pages missing is neither cached nor written; the document
+    falls back to its next format instead.
+    """
+    combined = Future()
+    lock = threading.Lock()
+
+    def on_done(_future):
+        with lock:
+            if combined.done() or not all(f.done() for f in futures):
+                return
+            results = [f.result() if not f.exception() else (PARSE_ERROR, 0.0, False, False) for f in futures]
+            timed_out = any(t for _text, _s, t, _tr in results)
+            if timed_out:
+                doc = None
+            elif any(text == PARSE_ERROR for text, _s, _t, _tr in results):
+                doc = PARSE_ERROR
+            else:
+                doc = _with_text(r, ''.join(text for text, _s, _t, _tr in results))
+            truncated = doc not in (None, PARSE_ERROR) and any(tr for _text, _s, _t, tr in results)
+            combined.set_result((doc, sum(s for _text, s, _t, _tr in results), timed_out, truncated))
+
+    for f in futures:
+        f.add_done_callback(on_done)
+    return combined
+
+def _cache_accept(accept, truncated):
+    """The text cache's format key: a text cut at PDF_MAX_PAGES is kept apart from full extractions."""
+    return f"{accept};maxpages={PDF_MAX_PAGES}" if truncated else accept
+
+_skipped_lock = threading.Lock()
+
+def record_skipped(r, accept, reason, **details):
+    """Append a document that was not parsed (timeout, size cap) or only in part to SKIPPED_FILE as one JSON line."""
+    entry = {'url': r.get('url'), 'celex': r.get('celex'), 'date': r.get('date'), 'lang': r.get('lang'),
+             'accept': accept, 'reason': reason,
+             'recorded_at': datetime.datetime.now(datetime.timezone.utc).isoformat(), **details}
+    with _skipped_lock, open(SKIPPED_FILE, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+def get_docs_text(d, lang=None, days=1, concurrency=DOWNLOAD_CONCURRENCY, docs=None, reuse=None,
+                  priority=FORMAT_PRIORITY, ordered=True, timeout=DOC_TIMEOUT, max_bytes=DOC_MAX_BYTES):
+    """Fetch and parse all documents for a given date or range.
+
+    Each document's manifestations are tried in `priority` order (cheapest
+    structured formats first, see parsers.select_formats); when one fails to
+    download, parses to nothing, is larger than `max_bytes` or does not
+    parse within `timeout` seconds, the next one is fetched in a follow-up
+    round. Size and deadline skips are also written to SKIPPED_FILE. Texts
+    already in the extracted-text cache are reused without a download (or
+    after a 304 when Cellar gave us validators). Everything else goes
+    through the shared asyncio downloader (up to `concurrency` in flight)
+    and each body is handed to the recycling process pool as soon as it
+    arrives; large PDFs are split into page-range shards parsed on separate
+    workers.
+
+    Results are yielded as soon as they are ready: in SPARQL order by
+    default, or with ordered=False in completion order, so one slow document
+    never holds back the ones behind it. Pass `docs` to reuse metadata that
+    was already fetched (see prefetch_docs), and `reuse` (see
+    load_reusable_texts) to take the text of documents whose identity and
+    manifestations are unchanged from a previous run's output.
+    """
+    if docs is None:
+        docs = list(get_docs(d, lang=lang, days=days))
     if not docs:
         return
-        
+
     date_range = f"{d}" if days == 1 else f"{d} to {d + datetime.timedelta(days=days-1)}"
     log.info(f"Processing {len(docs)} documents for {date_range}")
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        results = tqdm(executor.map(get_body, docs), total=len(docs), desc=date_range, colour='green')
-        for doc in results:
+    cache = get_text_cache()
+    metrics = get_metrics()
+    stats = _FormatStats()
+    slots = []          # per document in SPARQL order: _PENDING, finished doc (or None), or a parse future
+    attempts = {}       # id(r) -> (slot, candidates, index of the candidate being tried, cache entry or None)
+    downloads = {}      # slot -> (r, accept, Download) while its parse is running
+    running = set()     # slots holding a parse future
+    finished = deque()  # slots that became final, in completion order
+    queued = []         # download jobs for the next round
+    skipped = 0
+    truncated_docs = 0
+
+    def resolve(slot, value):
+        slots[slot] = value
+        if isinstance(value, Future):
+            running.add(slot)
+        elif value is not _PENDING:
+            finished.append(slot)
+
+    def attempt(slot, r, candidates, start):
+        # Move r on to its first candidate from `start` that isn't known to be empty.
+        for i in range(start, len(candidates)):
+            kind, accept = candidates[i]
+            entry = cache.get(r['url'], accept, r['lang'])
+            if entry is None and kind == 'pdf' and PDF_MAX_PAGES:
+                entry = cache.get(r['url'], _cache_accept(accept, True), r['lang'])
+            if entry is not None and not (entry.etag or entry.last_modified):
+                if entry.text.strip():
+                    resolve(slot, _with_text(r, entry.text))
+                    return
+                continue  # cached as empty in this format
+            headers = {}
+            if entry is not None and entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry is not None and entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+            attempts[id(r)] = (slot, candidates, i, entry)
+            resolve(slot, _PENDING)
+            queued.append((r, kind, accept, headers))
+            return
+        resolve(slot, None)
+
+    reused = 0
+    for r in docs:
+        candidates = select_formats(r.get('formats', []), priority)
+        if not candidates:
+            continue
+        slots.append(_PENDING)
+        if reuse:
+            text = reuse.get(_reuse_key(r['url'], r['celex'], r['lang'], r['formats']))
+            if text is not None:
+                resolve(len(slots) - 1, _with_text(r, text))
+                reused += 1
+                continue
+        attempt(len(slots) - 1, r, candidates, 0)
+    if reuse is not None:
+        metrics.count('reused_texts', reused)
+        log.info(f"Reused text for {reused} documents from existing output; fetching {len(slots) - reused}")
+
+    in_flight = set()
+    max_outstanding = MAX_WORKERS * 2
+    # One pool serves every window of the run; only its workers are recycled.
+    pool = get_pool()
+    recycled, restarted = pool.recycled, pool.restarted
+    with tqdm(total=len(slots), desc=date_range, colour='green') as progress:
+
+        def submit(fn, *args):
+            nonlocal in_flight
+            in_flight = {f for f in in_flight if not f.done()}
+            if len(in_flight) >= max_outstanding:
+                # Bound the bodies queued for the pool; this backs up the downloader too.
+                _done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            future = pool.submit(fn, *args)
+            in_flight.add(future)
+            return future
+
+        def parse(r, kind, content):
+            shards = pdf_shards(content, PDF_PAGES_PER_SHARD) if kind == 'pdf' else None
+            if shards is None:
+                return submit(parse_body_timed, r, kind, content, timeout, metrics.profile_dir)
+            log.info(f"Splitting {r['url']} into {len(shards)} page shards")
+            return _gather_shards(r, [submit(parse_pdf_pages_timed, r['url'], content, first, last, timeout, metrics.profile_dir)
+                                      for first, last in shards])
+
+        def skip(slot, r, accept, reason, **details):
+            nonlocal skipped
+            skipped += 1
+            metrics.count(f"skipped_{reason}")
+            log.warning(f"Skipping {r['url']} ({accept}): {reason}")
+            record_skipped(r, accept, reason, **details)
+            _slot, candidates, i, _entry = attempts[id(r)]
+            attempt(slot, r, candidates, i + 1)
+
+        def settle(slot):
+            # The parse of slot finished: cache it, and fall back to the next format if it came back empty.
+            nonlocal truncated_docs
+            running.discard(slot)
+            try:
+                doc, seconds, timed_out, truncated = slots[slot].result()
+            except Exception as e:
+                log.error(f"Parse worker failed: {e}")
+                doc, seconds, timed_out, truncated = PARSE_ERROR, 0.0, False, False
+            failed = doc == PARSE_ERROR
+            if failed:
+                doc = None
+            r, accept, download = downloads.pop(slot)
+            stats.add(accept, len(download.content), seconds, docs=1)
+            metrics.observe('parse', seconds)
+            metrics.add_format(accept, 0, docs=1)
+            if timed_out:
+                # Not cached, so a later run with a longer deadline tries again.
+                skip(slot, r, accept, 'timeout', seconds=round(seconds, 1), bytes=len(download.content))
+                return
+            if truncated:
+                # The text is still written, but recorded as partial.
+                truncated_docs += 1
+                metrics.count('truncated_pdfs')
+                log.warning(f"Truncated {r['url']} ({accept}) at {PDF_MAX_PAGES} pages")
+                record_skipped(r, accept, 'truncated', pages=PDF_MAX_PAGES, bytes=len(download.content))
+            # Empty extractions are cached too, so they are not re-parsed next
+            # run; failed parses (parser error, dead worker) are not, so they are.
+            if not failed:
+                cache.put(r['url'], _cache_accept(accept, truncated), r['lang'], doc['text'] if doc else '',
+                          etag=download.etag, last_modified=download.last_modified)
+            if doc:
+                resolve(slot, doc)
+            else:
+                _slot, candidates, i, _entry = attempts[id(r)]
+                attempt(slot, r, candidates, i + 1)
+
+        next_slot = 0
+
+        def emit(slot):
+            doc = slots[slot]
+            slots[slot] = None
+            progress.update()
+            progress.set_postfix(parsing=len(running), skipped=skipped, refresh=False)
             if doc:
-                yield doc
+                metrics.count('documents')
+            return doc
+
+        def drain(block):
+            # Settle finished parses (all of them if block), then yield what is
+            # final: in SPARQL order up to the first unfinished slot, or
+            # everything in completion order.
+            nonlocal next_slot
+            for slot in sorted(running):
+                if block or slots[slot].done():
+                    settle(slot)
+            if ordered:
+                while next_slot < len(slots) and slots[next_slot] is not _PENDING \
+                        and not isinstance(slots[next_slot], Future):
+                    doc = emit(next_slot)
+                    next_slot += 1
+                    if doc:
+                        yield doc
+                finished.clear()
+                return
+            while finished:
+                doc = emit(finished.popleft())
+                if doc:
+                    yield doc
+
+        yield from drain(block=False)
+        downloader = get_downloader(concurrency)
+        while queued:
+            jobs, queued[:] = list(queued), []
+            for r, kind, download in downloader.iter_downloads(jobs):
+                slot, candidates, i, entry = attempts[id(r)]
+                accept = candidates[i][1]
+                if download.status == 304 and entry is not None:
+                    if entry.text.strip():
+                        resolve(slot, _with_text(r, entry.text))
+                    else:
+                        attempt(slot, r, candidates, i + 1)
+                else:
+                    if entry is not None:
+                        cache.record_stale()
+                    if download.content and max_bytes and len(download.content) > max_bytes:
+                        skip(slot, r, accept, 'too_large', bytes=len(download.content))
+                    elif download.content:
+                        downloads[slot] = (r, accept, download)
+                        resolve(slot, parse(r, kind, download.content))
+                    else:
+                        attempt(slot, r, candidates, i + 1)
+                yield from drain(block=False)
+            # Settle every remaining parse so its fallbacks join the next round.
+            yield from drain(block=True)
+            if queued:
+                metrics.count('fallbacks', len(queued))
+                log.info(f"Falling back to another format for {len(queued)} documents")
+        yield from drain(block=True)
+
+    stats.log()
+    if skipped:
+        log.warning(f"{skipped} documents hit the size cap or deadline; recorded in {SKIPPED_FILE}")
+    if truncated_docs:
+        log.warning(f"{truncated_docs} PDFs were cut at {PDF_MAX_PAGES} pages; recorded in {SKIPPED_FILE}")
+    metrics.worker_rss(pool.peak_rss_mb)
+    if pool.recycled > recycled:
+        metrics.count('worker_recycles', pool.recycled - recycled)
+        log.info(f"Parser pool recycled {pool.recycled - recycled} times for high worker RSS")
+    if pool.restarted > restarted:
+        metrics.count('worker_pool_restarts', pool.restarted - restarted)
+    cache.evict()
+    cache_stats = cache.stats()
+    metrics.set_cache('text_cache', cache_stats)
+    log.info(f"Text cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['stale']} stale "
+             f"({cache_stats['entries']} entries, {cache_stats['bytes'] / 1e6:.1f} MB)")
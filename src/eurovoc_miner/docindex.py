@@ -0,0 +1,141 @@
+import logging
+import os
+import sqlite3
+import threading
+import polars as pl
+from .config import FILES_DIR, DOC_INDEX_FILE
+
+log = logging.getLogger(__name__)
+
+# Indexed field -> list column of the daily files it is taken from.
+INDEXED_FIELDS = {
+    'concept': 'eurovoc_concepts_ids',
+    'institution': 'institutions',
+    'directory_code': 'directory_codes',
+}
+
+
+class DocIndex:
+    """Inverted index from concept id, institution and directory code to documents.
+
+    Postings are (field, value) -> (date, celex, file, row), where file is
+    relative to FILES_DIR and row is the document's position in that file.
+    Building them reads only the identity and list columns of a daily file,
+    never `text`. Each file is indexed under the sha256 the catalog recorded
+    for it, so sync() only re-reads files whose content changed. Values are
+    compared case-insensitively.
+    """
+
+    def __init__(self, path=DOC_INDEX_FILE, root=FILES_DIR):
+        self.path = path
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                sha256 TEXT NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                field TEXT NOT NULL,
+                value TEXT NOT NULL COLLATE NOCASE,
+                date TEXT NOT NULL,
+                file_id INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                celex TEXT,
+                PRIMARY KEY (field, value, date, file_id, row)
+            ) WITHOUT ROWID""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_file ON postings(file_id)")
+
+    def _postings(self, rel_path):
+        df = pl.read_parquet(os.path.join(self.root, rel_path),
+                             columns=['date', 'celex', *INDEXED_FIELDS.values()]).with_row_index('row')
+        rows = []
+        for field, column in INDEXED_FIELDS.items():
+            exploded = (df.select('row', 'date', 'celex', pl.col(column).alias('value'))
+                          .explode('value')
+                          .drop_nulls(['value', 'date'])
+                          .unique(['value', 'row']))
+            rows.extend((field, value, date[:10], row, celex)
+                        for row, date, celex, value in exploded.iter_rows())
+        return rows
+
+    def update_file(self, rel_path, sha256):
+        """(Re)index one daily file if its content hash changed. Returns True if it was indexed."""
+        with self._lock:
+            known = self._conn.execute("SELECT id, sha256 FROM files WHERE path = ?", (rel_path,)).fetchone()
+        if known is not None and known[1] == sha256:
+            return False
+        try:
+            rows = self._postings(rel_path)
+        except Exception as exc:
+            log.warning(f"Could not index {rel_path}: {exc}")
+            return False
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            if known is not None:
+                self._conn.execute("DELETE FROM postings WHERE file_id = ?", (known[0],))
+                self._conn.execute("UPDATE files SET sha256 = ? WHERE id = ?", (sha256, known[0]))
+                file_id = known[0]
+            else:
+                file_id = self._conn.execute("INSERT INTO files (path, sha256) VALUES (?, ?)",
+                                             (rel_path, sha256)).lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO postings VALUES (?, ?, ?, ?, ?, ?)",
+                ((field, value, date, file_id, row, celex) for field, value, date, row, celex in rows))
+            self._conn.execute("COMMIT")
+        return True
+
+    def remove_file(self, rel_path):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM postings WHERE file_id IN (SELECT id FROM files WHERE path = ?)",
+                               (rel_path,))
+            self._conn.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+            self._conn.execute("COMMIT")
+
+    def sync(self, catalog):
+        """Bring the index in line with the catalog's files. Returns (indexed, removed)."""
+        cataloged = {path: sha256 for path, sha256, _size in catalog.files()}
+        with self._lock:
+            known = dict(self._conn.execute("SELECT path, sha256 FROM files"))
+        indexed = sum(self.update_file(path, sha256) for path, sha256 in cataloged.items()
+                      if known.get(path) != sha256)
+        gone = [path for path in known if path not in cataloged]
+        for path in gone:
+            self.remove_file(path)
+        if indexed or gone:
+            log.info(f"Document index synced: {indexed} files indexed, {len(gone)} removed")
+        return indexed, len(gone)
+
+    def lookup(self, field, values, from_date=None, to_date=None):
+        """Return {(file, row): (date, celex)} for documents carrying any of values in field."""
+        query = ("SELECT f.path, p.row, p.date, p.celex FROM postings p JOIN files f ON f.id = p.file_id "
+                 f"WHERE p.field = ? AND p.value IN ({', '.join('?' * len(values))})")
+        params = [field, *values]
+        if from_date is not None:
+            query += " AND p.date >= ?"
+            params.append(from_date.isoformat())
+        if to_date is not None:
+            query += " AND p.date <= ?"
+            params.append(to_date.isoformat())
+        with self._lock:
+            return {(path, row): (date, celex) for path, row, date, celex in self._conn.execute(query, params)}
+
+
+_doc_index = None
+_doc_index_lock = threading.Lock()
+
+
+def get_doc_index():
+    """Return the process-wide DocIndex."""
+    global _doc_index
+    with _doc_index_lock:
+        if _doc_index is None:
+            _doc_index = DocIndex()
+    return _doc_index
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .config import USER_AGENT, DOWNLOAD_CONCURRENCY, DOWNLOAD_TIMEOUT
+from .fetcher import get_session
+from .throttle import get_limiter
+from .metrics import get_metrics
+
+log = logging.getLogger(__name__)
+
+_DONE = object()
+
+# status is the final HTTP status (None if the request raised). content is only
+# set for a 200; a 304 answers a conditional request made with cached validators.
+Download = namedtuple('Download', ['status', 'content', 'etag', 'last_modified'])
+
+
+class Downloader:
+    """Asyncio download stage backed by one pooled, keep-alive session.
+
+    The session comes from fetcher.get_session(), so every request gets the
+    same urllib3 Retry policy as the SPARQL and Eurovoc calls. The blocking
+    session calls run on a dedicated thread pool sized to the concurrency
+    limit, and an asyncio semaphore keeps at most that many requests in
+    flight; within it, the process-wide 'cellar' limiter (throttle.py)
+    decides how many actually run and how fast.
+    """
+
+    def __init__(self, concurrency=DOWNLOAD_CONCURRENCY):
+        self.concurrency = concurrency
+        self.limiter = get_limiter('cellar')
+        self.session = get_session(pool_maxsize=concurrency, limiter=self.limiter)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='download')
+
+    def _get(self, url, accept, lang, extra_headers):
+        headers = {'Accept': accept, 'Accept-Language': lang, 'User-Agent': USER_AGENT}
+        headers.update(extra_headers or {})
+        metrics = get_metrics()
+        with self.limiter.slot() as report, metrics.timed('download'):
+            response = self.session.get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+            content = response.content
+            report(response)
+        metrics.count(f"http_{response.status_code}")
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if response.status_code == 200:
+            metrics.add_format(accept, len(content))
+            return Download(200, content, etag, last_modified)
+        if response.status_code != 304:
+            log.warning(f"HTTP {response.status_code} for {url} ({accept})")
+        return Download(response.status_code, None, etag, last_modified)
+
+    async def _fetch_all(self, jobs, out, cancelled):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(job):
+            r, kind, accept, extra_headers = job
+            async with semaphore:
+                download = Download(None, None, None, None)
+                if not cancelled.is_set():
+                    try:
+                        download = await loop.run_in_executor(
+                            self._executor, self._get, r['url'], accept, r['lang'], extra_headers)
+                    except Exception as e:
+                        log.error(f"Error downloading {r.get('url')}: {e}")
+                # Hand-off happens inside the semaphore: while the consumer is
+                # behind, finished bodies hold their slot and no new request starts.
+                await asyncio.to_thread(out.put, (r, kind, download))
+
+        await asyncio.gather(*(fetch(job) for job in jobs))
+
+    def iter_downloads(self, jobs):
+        """Download (r, kind, accept, extra_headers) jobs concurrently; yield (r, kind, Download) as each completes.
+
+        extra_headers (or None) is merged into the request, e.g. for
+        conditional If-None-Match / If-Modified-Since revalidation. The event
+        loop runs on a background thread so callers can hand bytes to the
+        parse step while the remaining downloads are still in flight. At most
+        2 x concurrency bodies are held at once; a slow consumer throttles
+        the downloads instead of letting them pile up in memory.
+        """
+        out = queue.Queue(maxsize=self.concurrency)
+        cancelled = threading.Event()
+
+        def run():
+            try:
+                asyncio.run(self._fetch_all(list(jobs), out, cancelled))
+            finally:
+                out.put(_DONE)
+
+        thread = threading.Thread(target=run, name='download-loop', daemon=True)
+        thread.start()
+        item = None
+        try:
+            while (item := out.get()) is not _DONE:
+                yield item
+        finally:
+            # Closed early: skip the remaining requests and let the loop finish.
+            cancelled.set()
+            while item is not _DONE:
+                item = out.get()
+            thread.join()
+
+
+_downloader = None
+
+
+def get_downloader(concurrency=DOWNLOAD_CONCURRENCY):
+    """Return the process-wide Downloader, so connections stay warm across dates."""
+    global _downloader
+    if _downloader is None or _downloader.concurrency != concurrency:
+        _downloader = Downloader(concurrency)
+    return _downloader
@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+import polars as pl
+from .config import USER_AGENT, EUROVOC_XML_URL, EUROVOC_INDEX_FILE, EUROVOC_INDEX_MAX_AGE, EUROVOC_LANGS
+from .fetcher import get_session
+from .metrics import get_metrics
+
+log = logging.getLogger(__name__)
+
+XS = '{http://www.w3.org/2001/XMLSchema}'
+SKOS = '{http://www.w3.org/2004/02/skos/core#}'
+RDF = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+SKOS_KINDS = {SKOS + 'prefLabel': 'pref', SKOS + 'altLabel': 'alt'}
+INDEX_SCHEMA = {'lang': pl.String, 'label': pl.String, 'id': pl.String, 'kind': pl.String}
+
+
+def iter_labels(source, lang='en'):
+    """Stream (lang, label, id, kind) rows out of a Eurovoc XML document.
+
+    Understands the XSD enumeration served at EUROVOC_XML_URL (one language
+    per request, preferred labels only) and SKOS RDF/XML exports (every
+    language, preferred and alternative labels). Each element is cleared once
+    read, so memory stays flat whatever the size of the thesaurus.
+    """
+    for _event, elem in ET.iterparse(source, events=('end',)):
+        if elem.tag == XS + 'enumeration':
+            value = elem.get('value', '')
+            doc = elem.find(f'{XS}annotation/{XS}documentation')
+            if ':' in value and doc is not None and doc.text:
+                label = doc.text.split('/')[0].strip()
+                if label:
+                    yield lang, label.lower(), value.split(':')[1], 'pref'
+            elem.clear()
+        elif elem.tag == SKOS + 'Concept':
+            concept_id = elem.get(RDF + 'about', '').rstrip('/').rsplit('/', 1)[-1]
+            for child in elem:
+                kind = SKOS_KINDS.get(child.tag)
+                if kind and child.text and child.text.strip():
+                    yield child.get(XML_LANG, lang).lower(), child.text.strip().lower(), concept_id, kind
+            elem.clear()
+
+
+def build_index(path=EUROVOC_INDEX_FILE, langs=EUROVOC_LANGS):
+    """Download the thesaurus once per language and write the compact index to `path`.
+
+    The index is an uncompressed Arrow IPC file (lang, label, id, kind), so it
+    can be memory-mapped on load. The file is replaced atomically; an existing
+    index is kept if the download yields no labels.
+    """
+    rows = []
+    session = get_session()
+    for lang in langs:
+        response = session.get(
+            EUROVOC_XML_URL,
+            headers={'Accept': 'application/xml', 'Accept-Language': lang, 'User-Agent': USER_AGENT},
+            # (connect, read) seconds. Bounds an individual hung request so a slow
+            # Publications Office endpoint cannot stall the whole job indefinitely.
+            timeout=(10, 120),
+            stream=True,
+        )
+        response.raise_for_status()
+        response.raw.decode_content = True
+        rows.extend(iter_labels(response.raw, lang))
+
+    if not rows:
+        log.error("Failed to parse Eurovoc XML structure")
+        return
+
+    # Later duplicates win, matching the dict-building behaviour of the old lookup.
+    df = (pl.DataFrame(rows, schema=INDEX_SCHEMA, orient='row')
+          .unique(subset=['lang', 'label', 'kind'], keep='last', maintain_order=True))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.write_ipc(tmp, compression='uncompressed')
+    os.replace(tmp, path)
+    log.info(f"Built Eurovoc index with {len(df)} labels for {', '.join(langs)} -> {path}")
+
+
+class EurovocIndex:
+    """In-memory label -> concept id lookup, one dict per language.
+
+    Preferred labels take precedence over alternative labels that happen to
+    share the same text.
+    """
+
+    def __init__(self, frame):
+        self._maps = {}
+        self._tables = {}
+        for kind in ('alt', 'pref'):
+            part = frame.filter(pl.col('kind') == kind)
+            for lang, label, concept_id in zip(part['lang'], part['label'], part['id']):
+                self._maps.setdefault(lang, {})[label] = concept_id
+
+    def __len__(self):
+        return sum(len(m) for m in self._maps.values())
+
+    def lookup(self, term, lang='en'):
+        """Return the concept id for a label, or None."""
+        return self._maps.get(lang, {}).get(term.strip().lower())
+
+    def resolve(self, terms, lang='en'):
+        """Yield the unique concept ids for `terms`, in order, warning on unknown labels."""
+        yield from self._resolve(terms, self._maps.get(lang, {}), None)
+
+    def resolve_many(self, term_lists, lang='en'):
+        """Resolve every document of a SPARQL result at once. Returns a list of id lists.
+
+        Unknown labels are reported once per batch rather than once per document.
+        """
+        mapping = self._maps.get(lang, {})
+        missing = set()
+        resolved = [list(self._resolve(terms, mapping, missing)) for terms in term_lists]
+        for term in sorted(missing):
+            log.warning(f"Eurovoc term not found: {term}")
+        return resolved
+
+    def _table(self, lang):
+        table = self._tables.get(lang)
+        if table is None:
+            mapping = self._maps.get(lang, {})
+            table = pl.DataFrame({'label': list(mapping), 'id': list(mapping.values())},
+                                 schema={'label': pl.String, 'id': pl.String})
+            self._tables[lang] = table
+        return table
+
+    def resolve_series(self, terms, lang='en'):
+        """resolve_many for a List(String) Series, as one join. Returns a List(String) Series, null where no term resolved."""
+        rows = terms.rename('term').to_frame().with_row_index('row')
+        pairs = (rows.explode('term').drop_nulls('term')
+                 .with_columns(pl.col('term').str.strip_chars().str.to_lowercase().alias('label'))
+                 .join(self._table(lang), on='label', how='left', maintain_order='left'))
+        for term in sorted(pairs.filter(pl.col('id').is_null())['term'].unique()):
+            log.warning(f"Eurovoc term not found: {term}")
+        ids = pairs.drop_nulls('id').group_by('row', maintain_order=True).agg(pl.col('id').unique(maintain_order=True))
+        return rows.select('row').join(ids, on='row', how='left', maintain_order='left')['id']
+
+    @staticmethod
+    def _resolve(terms, mapping, missing):
+        seen = set()
+        for e in terms:
+            cid = mapping.get(e.strip().lower())
+            if cid is None:
+                if missing is None:
+                    log.warning(f"Eurovoc term not found: {e}")
+                else:
+                    missing.add(e)
+            elif cid not in seen:
+                seen.add(cid)
+                yield cid
+
+
+def load_index(path=EUROVOC_INDEX_FILE, max_age=EUROVOC_INDEX_MAX_AGE):
+    """Load the index from disk, rebuilding it first when missing or older than max_age seconds."""
+    fresh = os.path.exists(path) and time.time() - os.path.getmtime(path) <= max_age
+    get_metrics().set_cache('eurovoc_index', {'hits': int(fresh), 'misses': int(not fresh)})
+    if not fresh:
+        try:
+            build_index(path)
+        except Exception as e:
+            if not os.path.exists(path):
+                raise
+            log.warning(f"Could not refresh Eurovoc index, using stale copy: {e}")
+    if not os.path.exists(path):
+        return EurovocIndex(pl.DataFrame([], schema=INDEX_SCHEMA))
+    return EurovocIndex(pl.read_ipc(path, memory_map=True))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the process-wide EurovocIndex, loading it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = load_index()
+    return _index
@@ -1,20 +1,39 @@
 import datetime
 import requests
-import jinja2
-import xmltodict
 import logging
-from joblib import expires_after
+from concurrent.futures import ThreadPoolExecutor
+import polars as pl
 from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
-from .config import USER_AGENT, SPARQL_ENDPOINT, EUROVOC_XML_URL, TEMPLATES_DIR, CACHE_DIR
-from joblib import Memory
+from .throttle import ThrottledRetry, get_limiter
+from .config import (USER_AGENT, SPARQL_ENDPOINT, TEMPLATES_DIR, SPARQL_MAX_ROWS, SPARQL_TIMEOUT, SPARQL_PLAN,
+                     SPARQL_LIST_PAGE_SIZE, SPARQL_DETAIL_CHUNK, SPARQL_DETAIL_TIMEOUT, SPARQL_MAX_CONCURRENCY,
+                     WATCH_MIN_SPAN_SECONDS)
+from .metrics import get_metrics
 
 log = logging.getLogger(__name__)
-memory = Memory(CACHE_DIR, verbose=0)
 
-def get_session():
+class IncompleteResult(Exception):
+    """Raised by get_bindings when some days of a window could not be fetched.
+
+    `rows` holds what was fetched and `failed_dates` the days that may be
+    missing documents: they must not be written as if complete.
+    """
+
+    def __init__(self, rows, failed_dates, reason):
+        super().__init__(f"{len(failed_dates)} days incomplete ({reason})")
+        self.rows = rows
+        self.failed_dates = failed_dates
+
+def get_session(pool_maxsize=10, limiter=None):
+    """Build a requests session with the shared retry policy.
+
+    pool_maxsize bounds the keep-alive connections kept per host; callers that
+    share one session across many concurrent requests should size it to match.
+    Responses and errors that urllib3 retries internally are reported to
+    `limiter` (see throttle.py), if given.
+    """
     session = requests.Session()
-    retry = Retry(
+    retry = ThrottledRetry(
         total=3,
         connect=3,
         # Don't retry on read timeouts. If the server accepted the request but
@@ -24,85 +43,277 @@ def get_session():
         read=False,
         backoff_factor=1,
         status_forcelist=[500, 502, 503, 504],
+        # SPARQL queries POSTed for their length are read-only, so they are
+        # retried like GETs.
+        allowed_methods=ThrottledRetry.DEFAULT_ALLOWED_METHODS | {'POST'},
         # Avoid raising for retried status codes; let the caller see the final
         # response and decide.
         raise_on_status=False,
+        limiter=limiter,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
     return session
 
-@memory.cache(cache_validation_callback=expires_after(minutes=120))
-def get_eurovoc_terms_and_id():
-    """Fetch and parse the Eurovoc taxonomy."""
-    eurovoc_terms_and_id = {}
-    session = get_session()
-    response = session.get(
-        EUROVOC_XML_URL,
-        headers={'Accept': 'application/xml', 'Accept-Language': 'en', 'User-Agent': USER_AGENT},
-        # (connect, read) seconds. Bounds an individual hung request so a slow
-        # Publications Office endpoint cannot stall the whole job indefinitely.
-        timeout=(10, 120),
-    )
-    data = xmltodict.parse(response.content)
-    
-    # Documentation suggests it's under xs:enumeration
-    try:
-        nodes = data['xs:schema']['xs:simpleType']['xs:restriction']['xs:enumeration']
-        for term in nodes:
-            try:
-                name = term['xs:annotation']['xs:documentation'].split('/')[0].strip()
-                eurovoc_id = term['@value'].split(':')[1]
-                eurovoc_terms_and_id[name.lower()] = eurovoc_id
-            except (KeyError, IndexError):
-                continue
-    except KeyError:
-        log.error("Failed to parse Eurovoc XML structure")
-        
-    return eurovoc_terms_and_id
-
-def get_sparql_query(d, lang=None, days=1):
-    """Render the SPARQL query template."""
-    start = d.strftime('%Y-%m-%d')
-    end = (d + datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+def as_langs(lang):
+    """Normalize a language filter (None, one code or a list of codes) to a list of codes."""
+    if lang is None:
+        return []
+    if isinstance(lang, str):
+        return [lang]
+    return list(lang)
+
+def _xsd_datetime(t):
+    return t.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def _render(name, **context):
+    import jinja2
     environment = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATES_DIR))
-    template = environment.get_template("query.j2")
-    return template.render(start=start, end=end, lang=lang)
+    return environment.get_template(name).render(**context)
 
-def get_json_response(d, lang=None, days=1):
-    """Execute SPARQL query and return JSON response."""
+def _window(d, days):
+    if d is None:
+        return None, None
+    return d.strftime('%Y-%m-%d'), (d + datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+
+def get_sparql_query(d, lang=None, days=1, modified=None, works=None):
+    """Render the SPARQL query template.
+
+    `lang` is one language code or a list of them; several languages are
+    fetched by the same query (one row per work and language). With
+    `modified`, a (since, until) pair of aware datetimes, the works last
+    modified in (since, until] are selected instead of those dated in the
+    window (d is then ignored), and each row carries ?lastModified. With
+    `works`, a list of work URIs, exactly those are selected (a VALUES
+    block; d and modified are ignored).
+    """
+    start, end = _window(d, days)
+    if modified:
+        modified = tuple(_xsd_datetime(t) for t in modified)
+    return _render("query.j2", start=start, end=end, langs=as_langs(lang), modified=modified, works=works)
+
+def get_works_query(d, days=1, modified=None, after=None, limit=SPARQL_LIST_PAGE_SIZE):
+    """Render the work listing template: at most `limit` work URIs of the window (or modification
+    period, see get_sparql_query) greater than `after`, in URI order."""
+    start, end = _window(d, days)
+    if modified:
+        modified = tuple(_xsd_datetime(t) for t in modified)
+    return _render("works.j2", start=start, end=end, modified=modified, after=after, limit=limit)
+
+def _execute(query, result_format, decode, method='GET', timeout=SPARQL_TIMEOUT):
+    """Send a SPARQL query, asking for `result_format`, and return decode(response).
+
+    Queries carrying long VALUES blocks are POSTed (form-encoded), since
+    they would not fit in a URL.
+    """
     headers = {'User-Agent': USER_AGENT}
-    query = get_sparql_query(d, lang=lang, days=days)
     params = {
         "default-graph-uri": "",
         "query": query,
-        "format": "application/sparql-results+json",
+        "format": result_format,
         "timeout": "0",
         "debug": "on",
         "run": "Run Query"
     }
 
-    session = get_session()
-    # (connect, read) seconds. Fail fast when the SPARQL endpoint hangs — the
-    # April 2026 weekly runs burned the full 6h GH Actions budget on calls that
-    # never returned because no read timeout was set here. 90s is generous for
-    # any healthy day-window query (typically <5s) and tight enough that 14
-    # stuck dates fit comfortably inside the 30-min job cap.
-    response = session.get(SPARQL_ENDPOINT, headers=headers, params=params, timeout=(10, 90))
-    response.raise_for_status()
-    return response.json()
-
-def get_concepts_id(list_of_eurovoc_terms):
-    """Map terms to IDs."""
-    terms_map = get_eurovoc_terms_and_id()
-    seen = set()
-    for e in list_of_eurovoc_terms:
-        term_clean = e.strip().lower()
-        if term_clean in terms_map:
-            cid = terms_map[term_clean]
-            if cid not in seen:
-                seen.add(cid)
-                yield cid
+    limiter = get_limiter('sparql')
+    session = get_session(limiter=limiter)
+    metrics = get_metrics()
+    metrics.count('sparql_requests')
+    with limiter.slot() as report, metrics.timed('sparql'):
+        if method == 'POST':
+            response = session.post(SPARQL_ENDPOINT, headers=headers, data=params, timeout=timeout)
+        else:
+            response = session.get(SPARQL_ENDPOINT, headers=headers, params=params, timeout=timeout)
+        report(response)
+        response.raise_for_status()
+        return decode(response)
+
+def _run_query(d, lang, days, result_format, decode, modified=None):
+    """Execute the SPARQL query, asking for `result_format`, and return decode(response)."""
+    return _execute(get_sparql_query(d, lang=lang, days=days, modified=modified), result_format, decode)
+
+def get_json_response(d, lang=None, days=1):
+    """Execute SPARQL query and return JSON response."""
+    return _run_query(d, lang, days, "application/sparql-results+json", lambda response: response.json())
+
+def _read_csv(response):
+    if not response.content.strip():
+        return pl.DataFrame()
+    return pl.read_csv(response.content, infer_schema=False, missing_utf8_is_empty_string=True)
+
+def get_csv_response(d, lang=None, days=1, modified=None):
+    """Execute SPARQL query and return its rows as a DataFrame, one String column per variable.
+
+    The CSV result is parsed by Polars in one pass, without materialising
+    the JSON bindings; unbound values are empty strings.
+    """
+    return _run_query(d, lang, days, "text/csv", _read_csv, modified=modified)
+
+def _is_overload(exc):
+    if isinstance(exc, requests.Timeout):
+        return True
+    response = getattr(exc, 'response', None)
+    return response is not None and response.status_code >= 500
+
+def list_works(d, days=1, modified=None):
+    """Phase 1 of the two-phase plan: {work URI: its document date} for the works dated in the
+    window (or modified in the period, see get_sparql_query), in URI order.
+
+    Pages of SPARQL_LIST_PAGE_SIZE are fetched by keyset pagination (works
+    after the last URI of the previous page), which, unlike OFFSET, costs
+    the same for every page and never skips or repeats a work.
+    """
+    works, after = {}, None
+    while True:
+        query = get_works_query(d, days=days, modified=modified, after=after, limit=SPARQL_LIST_PAGE_SIZE)
+        page = _execute(query, "text/csv", _read_csv)
+        if 'work' not in page.columns:
+            return works
+        works.update(zip(page['work'], page['day'].str.slice(0, 10)))
+        if len(page) < SPARQL_LIST_PAGE_SIZE:
+            return works
+        after = page['work'][-1]
+
+def _detail_chunk(works, lang, failed):
+    try:
+        rows = _execute(get_sparql_query(None, lang=lang, works=works), "text/csv", _read_csv, method='POST',
+                        timeout=SPARQL_DETAIL_TIMEOUT)
+    except requests.RequestException as e:
+        if len(works) > 1 and _is_overload(e):
+            reason = f"{type(e).__name__}: {e}"
+        elif failed is None:
+            raise
         else:
-            log.warning(f"Eurovoc term not found: {e}")
+            log.error(f"SPARQL details of {len(works)} works ({works[0]} ...) failed: {e}")
+            failed.extend(works)
+            return pl.DataFrame()
+    else:
+        if len(rows) < SPARQL_MAX_ROWS or len(works) == 1:
+            return rows
+        reason = f"{len(rows)} rows (limit {SPARQL_MAX_ROWS})"
+
+    half = len(works) // 2
+    get_metrics().count('sparql_chunk_splits')
+    log.warning(f"Splitting SPARQL detail chunk of {len(works)} works: {reason}")
+    parts = [part for part in (_detail_chunk(works[:half], lang, failed), _detail_chunk(works[half:], lang, failed))
+             if part.width]
+    return pl.concat(parts, how='diagonal') if parts else pl.DataFrame()
+
+def get_detail_bindings(works, lang=None, failed=None):
+    """Phase 2 of the two-phase plan: the result rows (see get_csv_response) of the given works.
+
+    The works are queried SPARQL_DETAIL_CHUNK at a time in a VALUES block,
+    up to SPARQL_MAX_CONCURRENCY chunks in parallel, each with the short
+    SPARQL_DETAIL_TIMEOUT. A chunk that times out, fails with a 5xx or hits
+    SPARQL_MAX_ROWS is split in half and retried, down to single works; a
+    work that still fails raises or, given a `failed` list, is logged and
+    appended to it.
+    """
+    works = list(works)
+    chunks = [works[i:i + SPARQL_DETAIL_CHUNK] for i in range(0, len(works), SPARQL_DETAIL_CHUNK)]
+    if not chunks:
+        return pl.DataFrame()
+    with ThreadPoolExecutor(max_workers=min(SPARQL_MAX_CONCURRENCY, len(chunks))) as pool:
+        parts = [part for part in pool.map(lambda chunk: _detail_chunk(chunk, lang, failed), chunks) if part.width]
+    return pl.concat(parts, how='diagonal') if parts else pl.DataFrame()
+
+def get_bindings(d, lang=None, days=1):
+    """Return the SPARQL result rows for a window (see get_csv_response), bisecting it when it is too slow or too large.
+
+    With SPARQL_PLAN 'two-phase' (the default), the window's works are
+    listed first (list_works) and their details fetched in small parallel
+    chunks (get_detail_bindings), so a slow window costs a few retried
+    chunks rather than the whole query. With 'single', one query returns
+    the whole window.
+
+    A multi-day window whose query (the listing, when two-phase) hits the
+    read timeout (or a 5xx) is split in half and each half queried
+    separately, recursively down to single days. A single query returning
+    SPARQL_MAX_ROWS rows or more is assumed to be truncated and split the
+    same way. If a single day still fails, or a detail chunk does (see
+    get_detail_bindings), the rest of the window is kept and
+    IncompleteResult is raised with it and the failed days: those of the
+    failed works, per the listing.
+    """
+    two_phase = SPARQL_PLAN == 'two-phase'
+    try:
+        if two_phase:
+            works = list_works(d, days=days)
+        else:
+            bindings = get_csv_response(d, lang=lang, days=days)
+    except requests.RequestException as e:
+        if days <= 1 or not _is_overload(e):
+            raise
+        reason = f"{type(e).__name__}: {e}"
+    else:
+        if two_phase:
+            failed = []
+            bindings = get_detail_bindings(works, lang=lang, failed=failed)
+            if failed:
+                days_failed = {datetime.date.fromisoformat(works[work]) for work in failed}
+                raise IncompleteResult(bindings, days_failed, f"details of {len(failed)} works")
+            return bindings
+        if len(bindings) < SPARQL_MAX_ROWS:
+            return bindings
+        if days <= 1:
+            log.warning(f"SPARQL result for {d} has {len(bindings)} rows and may be truncated")
+            return bindings
+        reason = f"{len(bindings)} rows (limit {SPARQL_MAX_ROWS})"
+
+    half = days // 2
+    get_metrics().count('sparql_bisections')
+    log.warning(f"Bisecting SPARQL window {d} (+{days}d) into {half} + {days - half} days: {reason}")
+    parts, failed = [], set()
+    for start, n in ((d, half), (d + datetime.timedelta(days=half), days - half)):
+        try:
+            parts.append(get_bindings(start, lang=lang, days=n))
+        except IncompleteResult as e:
+            parts.append(e.rows)
+            failed |= e.failed_dates
+        except requests.RequestException as e:
+            log.error(f"SPARQL window {start} (+{n}d) failed after bisection: {e}")
+            failed |= {start + datetime.timedelta(days=i) for i in range(n)}
+    parts = [part for part in parts if part.width]
+    rows = pl.concat(parts, how='diagonal') if parts else pl.DataFrame()
+    if failed:
+        raise IncompleteResult(rows, failed, f"window {d} (+{days}d) after bisection")
+    return rows
+
+def get_modified_bindings(since, until, lang=None):
+    """Return the SPARQL result rows of the works last modified in (since, until].
+
+    Like get_bindings (and with the same SPARQL_PLAN), a period whose query
+    times out or hits SPARQL_MAX_ROWS is bisected, down to
+    WATCH_MIN_SPAN_SECONDS. Unlike it, nothing is dropped: a part or detail
+    chunk that still fails raises, so that watch mode does not move its
+    mark past works it never saw.
+    """
+    two_phase = SPARQL_PLAN == 'two-phase'
+    try:
+        if two_phase:
+            works = list_works(None, modified=(since, until))
+        else:
+            rows = get_csv_response(None, lang=lang, modified=(since, until))
+    except requests.RequestException as e:
+        if (until - since).total_seconds() <= WATCH_MIN_SPAN_SECONDS or not _is_overload(e):
+            raise
+        reason = f"{type(e).__name__}: {e}"
+    else:
+        if two_phase:
+            return get_detail_bindings(works, lang=lang)
+        if len(rows) < SPARQL_MAX_ROWS:
+            return rows
+        if (until - since).total_seconds() <= WATCH_MIN_SPAN_SECONDS:
+            log.warning(f"SPARQL result for works modified in ({since}, {until}] has {len(rows)} rows "
+                        f"and may be truncated")
+            return rows
+        reason = f"{len(rows)} rows (limit {SPARQL_MAX_ROWS})"
+
+    middle = since + (until - since) / 2
+    get_metrics().count('sparql_bisections')
+    log.warning(f"Bisecting modification window ({since}, {until}] at {middle}: {reason}")
+    parts = [part for part in (get_modified_bindings(since, middle, lang=lang),
+                               get_modified_bindings(middle, until, lang=lang)) if part.width]
+    return pl.concat(parts, how='diagonal') if parts else pl.DataFrame()
@@ -0,0 +1,271 @@
+import cProfile
+import datetime
+import glob
+import json
+import logging
+import os
+import pstats
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# Stages timed across a run. sparql, eurovoc, clean, keywords, write and index
+# run in the main process; download on the downloader threads; parse in the
+# pool workers (timed there and reported back with each result).
+STAGES = ('sparql', 'eurovoc', 'download', 'parse', 'clean', 'keywords', 'write', 'index')
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, plus count, sum and max."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        cumulative, seen = {}, 0
+        for bound, n in zip((*BUCKETS, '+Inf'), self.counts):
+            seen += n
+            cumulative[str(bound)] = seen
+        return {'count': self.count, 'sum': round(self.sum, 3), 'max': round(self.max, 3),
+                'mean': round(self.sum / self.count, 4) if self.count else 0.0,
+                'p50': round(self.quantile(0.5), 3), 'p95': round(self.quantile(0.95), 3), 'buckets': cumulative}
+
+
+def peak_rss_mb():
+    """Peak RSS of this process in MB."""
+    scale = 1024 if sys.platform != 'darwin' else 1024 * 1024  # ru_maxrss is KB on Linux, bytes on macOS
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+class Metrics:
+    """Counters and per-stage latency histograms for one run, written as a JSON report.
+
+    `timed(stage)` measures a block; stages listed in `profile` are also run
+    under cProfile and their stats merged into one .prof file per stage.
+    Only one profiler can be active per process, so a stage entered while
+    another is being profiled (e.g. on a second thread) is timed only.
+    Parse profiles are taken in the pool workers, which dump them to
+    `profile_dir` for merging here.
+    """
+
+    def __init__(self, profile=()):
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.bytes_by_format = {}
+        self.docs_by_format = {}
+        self.caches = {}
+        self.limiters = {}
+        self.worker_rss_mb = 0.0
+        self.profile = set(profile)
+        self._profiles = {}
+        self._profiling = False
+        self.profile_dir = tempfile.mkdtemp(prefix='eurovoc-profile-') if 'parse' in self.profile else None
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.histograms.setdefault(stage, Histogram()).observe(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_format(self, accept, size, docs=0):
+        """Bytes downloaded (and documents parsed) for one manifestation type."""
+        with self._lock:
+            self.bytes_by_format[accept] = self.bytes_by_format.get(accept, 0) + size
+            self.docs_by_format[accept] = self.docs_by_format.get(accept, 0) + docs
+
+    def worker_rss(self, rss_mb):
+        """Record a parser worker's RSS; the report keeps the peak (workers are not our children to getrusage)."""
+        with self._lock:
+            self.worker_rss_mb = max(self.worker_rss_mb, rss_mb)
+
+    def set_cache(self, name, stats):
+        with self._lock:
+            self.caches[name] = dict(stats)
+
+    def set_limiter(self, name, stats):
+        with self._lock:
+            self.limiters[name] = dict(stats)
+
+    @contextmanager
+    def timed(self, stage):
+        profiler = None
+        if stage in self.profile:
+            with self._lock:
+                if not self._profiling:
+                    self._profiling = True
+                    profiler = cProfile.Profile()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                with self._lock:
+                    self._profiling = False
+                    profiler.create_stats()
+                    if stage in self._profiles:
+                        self._profiles[stage].add(profiler)
+                    else:
+                        self._profiles[stage] = pstats.Stats(profiler)
+            self.observe(stage, time.perf_counter() - start)
+
+    def _collect_worker_profiles(self):
+        if not self.profile_dir:
+            return
+        for path in sorted(glob.glob(os.path.join(self.profile_dir, '*.prof'))):
+            if 'parse' in self._profiles:
+                self._profiles['parse'].add(path)
+            else:
+                self._profiles['parse'] = pstats.Stats(path)
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.profile_dir = None
+
+    def report(self):
+        wall = time.perf_counter() - self._start
+        with self._lock:
+            documents = self.counters.get('documents', 0)
+            return {
+                'started_at': self.started_at.isoformat(),
+                'finished_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'argv': sys.argv[1:],
+                'wall_seconds': round(wall, 3),
+                'documents': documents,
+                'docs_per_second': round(documents / wall, 3) if wall else 0.0,
+                'peak_rss_mb': {'main': peak_rss_mb(), 'workers': round(self.worker_rss_mb, 1)},
+                'stages': {stage: h.to_dict() for stage, h in sorted(self.histograms.items())},
+                'bytes_by_format': dict(sorted(self.bytes_by_format.items())),
+                'docs_by_format': dict(sorted(self.docs_by_format.items())),
+                'counters': dict(sorted(self.counters.items())),
+                'caches': dict(self.caches),
+                'limiters': dict(self.limiters),
+            }
+
+    def write_report(self, path):
+        """Write the JSON report (and the merged .prof files of profiled stages next to it). Returns the report."""
+        report = self.report()
+        _write_atomic(path, json.dumps(report, indent=2) + '\n')
+        self._collect_worker_profiles()
+        stem = os.path.splitext(path)[0]
+        for stage, stats in sorted(self._profiles.items()):
+            prof_path = f"{stem}.{stage}.prof"
+            stats.dump_stats(prof_path)
+            log.info(f"Profile of stage '{stage}' -> {prof_path}; top functions by cumulative time:")
+            stats.sort_stats('cumulative').print_stats(15)
+        log.info(f"Run report: {report['documents']} documents in {report['wall_seconds']:.0f}s "
+                 f"({report['docs_per_second']:.2f} docs/s), peak RSS {report['peak_rss_mb']['main']} MB -> {path}")
+        return report
+
+    def write_prometheus(self, path, report=None):
+        """Write the report in the Prometheus textfile-collector format."""
+        report = report or self.report()
+        lines = [
+            '# TYPE eurovoc_miner_wall_seconds gauge',
+            f"eurovoc_miner_wall_seconds {report['wall_seconds']}",
+            '# TYPE eurovoc_miner_documents_total counter',
+            f"eurovoc_miner_documents_total {report['documents']}",
+            '# TYPE eurovoc_miner_docs_per_second gauge',
+            f"eurovoc_miner_docs_per_second {report['docs_per_second']}",
+            '# TYPE eurovoc_miner_peak_rss_megabytes gauge',
+            *(f'eurovoc_miner_peak_rss_megabytes{{process="{p}"}} {v}' for p, v in report['peak_rss_mb'].items()),
+            '# TYPE eurovoc_miner_stage_seconds histogram',
+        ]
+        for stage, h in report['stages'].items():
+            lines += [f'eurovoc_miner_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {n}'
+                      for le, n in h['buckets'].items()]
+            lines += [f'eurovoc_miner_stage_seconds_sum{{stage="{stage}"}} {h["sum"]}',
+                      f'eurovoc_miner_stage_seconds_count{{stage="{stage}"}} {h["count"]}']
+        lines.append('# TYPE eurovoc_miner_downloaded_bytes_total counter')
+        lines += [f'eurovoc_miner_downloaded_bytes_total{{format="{accept}"}} {n}'
+                  for accept, n in report['bytes_by_format'].items()]
+        lines.append('# TYPE eurovoc_miner_events_total counter')
+        lines += [f'eurovoc_miner_events_total{{event="{name}"}} {n}' for name, n in report['counters'].items()]
+        lines.append('# TYPE eurovoc_miner_cache_events_total counter')
+        for cache, stats in report['caches'].items():
+            lines += [f'eurovoc_miner_cache_events_total{{cache="{cache}",event="{event}"}} {stats[event]}'
+                      for event in ('hits', 'misses', 'stale') if event in stats]
+        lines.append('# TYPE eurovoc_miner_limiter_concurrency gauge')
+        lines += [f'eurovoc_miner_limiter_concurrency{{limiter="{name}"}} {stats["concurrency"]}'
+                  for name, stats in report.get('limiters', {}).items()]
+        _write_atomic(path, '\n'.join(lines) + '\n')
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def profiled(stage, profile_dir):
+    """Run a worker-side block under cProfile and dump the stats into profile_dir (no-op without one)."""
+    if not profile_dir:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(profile_dir, f"{stage}-{os.getpid()}-{time.monotonic_ns()}.prof"))
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide Metrics."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+    return _metrics
+
+
+def reset_metrics(profile=()):
+    """Start a fresh Metrics for this process (e.g. at the start of a run, with the stages to profile)."""
+    global _metrics
+    with _metrics_lock:
+        _metrics = Metrics(profile)
+    return _metrics
@@ -1,60 +1,242 @@
 import logging
+import re
+import sys
+import time
+import zipfile
+import xml.etree.ElementTree as ET
 from io import BytesIO
-from bs4 import BeautifulSoup
-import docx2txt
-from pdfminer.high_level import extract_text
-from .config import USER_AGENT, CACHE_DIR
+from .config import USER_AGENT, DOWNLOAD_TIMEOUT, FORMAT_PRIORITY, PDF_MAX_PAGES
 from .fetcher import get_session
-from joblib import Memory
+from .throttle import get_limiter
+from .pool import deadline, Deadline
+from .metrics import profiled
 
 log = logging.getLogger(__name__)
-memory = Memory(CACHE_DIR, verbose=0)
-
-@memory.cache()
-def get_pdf_body(r):
-    url, lang = r['url'], r['lang']
-    session = get_session()
-    response = session.get(url, headers={'Accept': 'application/pdf', 'Accept-Language': lang, 'User-Agent': USER_AGENT})
-    if response.status_code == 200:
-        return extract_text(BytesIO(response.content))
-    return ""
-
-@memory.cache()
-def get_html_content(r, accept='text/html'):
-    url, lang = r['url'], r['lang']
-    session = get_session()
-    response = session.get(url, headers={'Accept': accept, 'Accept-Language': lang, 'User-Agent': USER_AGENT})
-    if response.status_code == 200:
-        return BeautifulSoup(response.content, 'html.parser').get_text()
-    return ""
-
-@memory.cache()
-def get_doc_content(url, accept, lang='en'):
-    session = get_session()
-    response = session.get(url, headers={'Accept': accept, 'Accept-Language': lang, 'User-Agent': USER_AGENT})
-    if response.status_code == 200:
-        return docx2txt.process(BytesIO(response.content))
-    return ""
 
-def get_body(r):
-    """Factory function for document parsing."""
+# The parsing libraries are imported on first use: the main process only
+# picks formats, and the pool workers get them preloaded (see pool.PRELOAD).
+
+def parse_pdf(content):
+    from pdfminer.high_level import extract_text
+    return extract_text(BytesIO(content), maxpages=PDF_MAX_PAGES)
+
+def parse_pdf_pages(content, first, last):
+    """Text of pages [first, last) only (last=None: to the end); one shard of a large PDF."""
+    from pdfminer.high_level import extract_text
+    # A range is a container pdfminer can test page numbers against, open-ended or not.
+    return extract_text(BytesIO(content), page_numbers=range(first, last if last is not None else sys.maxsize))
+
+def pdf_truncated(content, max_pages=PDF_MAX_PAGES):
+    """Whether the PDF has pages past max_pages, which parse_pdf leaves out. Pages are listed, not parsed."""
+    if not max_pages:
+        return False
+    from pdfminer.pdfpage import PDFPage
     try:
-        formats = r.get('formats', [])
-        if 'pdf' in formats:
-            text = get_pdf_body(r)
-        elif any(f in formats for f in ['xhtml', 'html']):
-            text = get_html_content(r, 'application/xhtml+xml' if 'xhtml' in formats else 'text/html')
-        elif any(f in formats for f in ['docx', 'doc']):
-            accept = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml' if 'docx' in formats else 'application/msword'
-            text = get_doc_content(r['url'], accept, r['lang'])
-        else:
-            return None
+        return next(PDFPage.get_pages(BytesIO(content), pagenos={max_pages}), None) is not None
+    except Exception as e:
+        log.warning(f"Could not count the pages of a PDF: {e}")
+        return False
+
+def parse_html(content):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(content, 'html.parser').get_text()
+
+def parse_doc(content):
+    import docx2txt
+    return docx2txt.process(BytesIO(content))
+
+# Formex elements that end a line of text, and bibliographic/technical
+# blocks whose content is not part of the document text.
+FMX_BLOCKS = {
+    'TITLE', 'TI', 'STI', 'TI.ART', 'STI.ART', 'TI.CJT', 'P', 'ALINEA', 'PARAG', 'NO.PARAG', 'ITEM', 'NP',
+    'NO.P', 'TXT', 'CONSID', 'VISA', 'PREAMBLE.INIT', 'PREAMBLE.FINAL', 'PL.DATE', 'SIGNATORY', 'ROW',
+    'CELL', 'NOTE', 'HEADER.SUMMARY', 'TI.GR.SEQ', 'FORMULA', 'QUOT.S', 'ADR',
+}
+FMX_SKIP = {'BIB.INSTANCE', 'BIB.DATA', 'FMX.GEN', 'REF.PHYS', 'PAGE.HEADER'}
+
+def _iter_fmx_text(source):
+    """Yield the text of one Formex XML stream in document order.
+
+    Uses iterparse start/end events. An element's .text is complete when its
+    first child starts, and a child's .tail is complete when the next sibling
+    starts or the parent ends. So each finished child can be emitted and
+    removed at once, and the tree never holds more than one open branch.
+    """
+    stack = []    # [element, last finished child or None]
+    skipping = 0
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            if stack:
+                parent, prev = stack[-1]
+                piece = parent.text if prev is None else prev.tail
+                if piece and not skipping:
+                    yield piece
+                if prev is not None:
+                    parent.remove(prev)
+            stack.append([elem, None])
+            if tag in FMX_SKIP:
+                skipping += 1
+            continue
+        _elem, last = stack.pop()
+        piece = elem.text if last is None else last.tail
+        if piece and not skipping:
+            yield piece
+        if last is not None:
+            elem.remove(last)
+        if tag in FMX_SKIP:
+            skipping -= 1
+        elif tag in FMX_BLOCKS and not skipping:
+            yield '\n'
+        if stack:
+            stack[-1][1] = elem
+
+def _fmx_lines(pieces):
+    text = ''.join(pieces)
+    lines = (' '.join(line.split()) for line in text.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+def parse_fmx(content):
+    """Text of a Formex 4 manifestation: a ZIP of XML files, or a bare XML document.
+
+    Cellar packages an act as a ZIP with one XML file per part (main act,
+    annexes) plus a .doc.xml descriptor. The parts are read in name order,
+    which is document order, and each is decompressed and parsed as a
+    stream, skipping the descriptor.
+    """
+    if not content.startswith(b'PK'):
+        return _fmx_lines(_iter_fmx_text(BytesIO(content)))
+    parts = []
+    with zipfile.ZipFile(BytesIO(content)) as zf:
+        names = sorted(n for n in zf.namelist() if n.lower().endswith('.xml') and not n.lower().endswith('.doc.xml'))
+        for name in names:
+            with zf.open(name) as f:
+                parts.append(_fmx_lines(_iter_fmx_text(f)))
+    return '\n\n'.join(p for p in parts if p)
+
+PARSERS = {
+    'fmx': parse_fmx,
+    'pdf': parse_pdf,
+    'html': parse_html,
+    'doc': parse_doc,
+}
+
+# Cellar manifestation type -> (parser kind, Accept header). The PDF/A
+# variants are ordinary PDFs to pdfminer.
+FORMATS = {
+    'fmx4': ('fmx', 'application/zip;mtype=fmx4'),
+    'xhtml': ('html', 'application/xhtml+xml'),
+    'html': ('html', 'text/html'),
+    'docx': ('doc', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml'),
+    'doc': ('doc', 'application/msword'),
+    'pdf': ('pdf', 'application/pdf'),
+    'pdfa2a': ('pdf', 'application/pdf;type=pdfa2a'),
+    'pdfa1a': ('pdf', 'application/pdf;type=pdfa1a'),
+}
+
+def select_formats(formats, priority=FORMAT_PRIORITY):
+    """All manifestations we can parse, as [(kind, accept)] in priority order.
+
+    The first entry is downloaded; the rest are the fallback chain used when
+    it fails or parses to nothing. Several variants of one kind (pdf and
+    pdfa2a) are all kept, since they are separate downloads.
+    """
+    return [FORMATS[f] for f in priority if f in formats and f in FORMATS]
+
+def select_format(formats, priority=FORMAT_PRIORITY):
+    """Pick the manifestation to download. Returns (kind, accept) or None if unsupported."""
+    candidates = select_formats(formats, priority)
+    return candidates[0] if candidates else None
 
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+def estimate_pdf_pages(content):
+    """Cheap page count from the raw bytes (0 when the page objects are compressed away)."""
+    return len(_PDF_PAGE.findall(content))
+
+def pdf_shards(content, pages_per_shard, max_pages=PDF_MAX_PAGES):
+    """Page ranges [(first, last)] to extract in parallel, or None to parse the PDF in one task.
+
+    The page count is only an estimate, so the last shard runs up to
+    max_pages (last=None without a cap) rather than to the estimate.
+    """
+    pages = estimate_pdf_pages(content)
+    if max_pages:
+        pages = min(pages, max_pages)
+    if pages <= pages_per_shard:
+        return None
+    shards = [(first, min(first + pages_per_shard, pages)) for first in range(0, pages, pages_per_shard)]
+    shards[-1] = (shards[-1][0], max_pages or None)
+    return shards
+
+# What parse_body returns when the parser raised, as opposed to None for a
+# parse that ran but found no text. Only the latter is worth caching.
+PARSE_ERROR = 'parse_error'
+
+def parse_body(r, kind, content):
+    """Parse downloaded bytes into r['text']. Runs in the process pool; returns r, None (no text) or PARSE_ERROR."""
+    try:
+        text = PARSERS[kind](content)
         if not text or not text.strip():
             return None
-            
+
         r['text'] = text
         return r
     except Exception as e:
         log.error(f"Error parsing {r.get('url')}: {e}")
-        return None
+        return PARSE_ERROR
+
+def parse_body_timed(r, kind, content, timeout=0, profile_dir=None):
+    """parse_body under a wall-clock deadline, as (its result, seconds, timed_out, truncated). Runs in the pool.
+
+    truncated is set when a PDF was cut at PDF_MAX_PAGES. With a profile_dir
+    the parse runs under cProfile (see metrics.profiled).
+    """
+    start = time.perf_counter()
+    try:
+        with profiled('parse', profile_dir), deadline(timeout):
+            doc = parse_body(r, kind, content)
+            truncated = kind == 'pdf' and isinstance(doc, dict) and pdf_truncated(content, PDF_MAX_PAGES)
+    except Deadline:
+        return None, time.perf_counter() - start, True, False
+    return doc, time.perf_counter() - start, False, truncated
+
+def parse_pdf_pages_timed(url, content, first, last, timeout=0, profile_dir=None):
+    """One PDF shard as (text, seconds, timed_out, truncated); text is PARSE_ERROR if pdfminer raised.
+
+    Only the shard ending at PDF_MAX_PAGES checks whether the PDF goes on past it.
+    """
+    start = time.perf_counter()
+    truncated = False
+    try:
+        with profiled('parse', profile_dir), deadline(timeout):
+            text = parse_pdf_pages(content, first, last)
+            truncated = bool(PDF_MAX_PAGES) and last == PDF_MAX_PAGES and pdf_truncated(content, PDF_MAX_PAGES)
+    except Deadline:
+        return '', time.perf_counter() - start, True, False
+    except Exception as e:
+        log.error(f"Error parsing pages {first}-{last} of {url}: {e}")
+        text = PARSE_ERROR
+    return text, time.perf_counter() - start, False, truncated
+
+def get_body(r):
+    """Download and parse a single document synchronously, walking the format fallback chain."""
+    limiter = get_limiter('cellar')
+    session = get_session(limiter=limiter)
+    for kind, accept in select_formats(r.get('formats', [])):
+        try:
+            with limiter.slot() as report:
+                response = session.get(
+                    r['url'],
+                    headers={'Accept': accept, 'Accept-Language': r['lang'], 'User-Agent': USER_AGENT},
+                    timeout=DOWNLOAD_TIMEOUT,
+                )
+                report(response)
+            if response.status_code != 200:
+                continue
+            doc = parse_body(r, kind, response.content)
+            if doc and doc != PARSE_ERROR:
+                return doc
+        except Exception as e:
+            log.error(f"Error parsing {r.get('url')}: {e}")
+    return None
@@ -0,0 +1,208 @@
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from .config import MAX_WORKERS, WORKER_MAX_TASKS, WORKER_MAX_RSS_MB
+
+log = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Imported once by the forkserver, so every worker (and every replacement
+# worker) starts with the parsers loaded instead of importing them itself.
+PRELOAD = ['eurovoc_miner.parsers', 'pdfminer.high_level', 'bs4', 'docx2txt']
+
+# A task caught in a pool whose worker died abruptly (OOM kill, os._exit) is
+# resubmitted to the replacement pool at most this many times, so a document
+# that kills its worker every time fails alone instead of looping.
+BROKEN_POOL_RETRIES = 2
+
+
+class Deadline(BaseException):
+    """Raised in a worker when a task overruns its wall-clock deadline.
+
+    A BaseException so that the broad `except Exception` handlers in the
+    parsers (and in pdfminer) cannot swallow it.
+    """
+
+
+@contextmanager
+def deadline(seconds):
+    """Interrupt the block with Deadline after `seconds` (0 = no limit). Main thread only (SIGALRM)."""
+    if not seconds:
+        yield
+        return
+
+    def on_alarm(_signum, _frame):
+        raise Deadline(f"exceeded {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc; 0 elsewhere)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _call_with_rss(fn, args):
+    return fn(*args), current_rss_mb()
+
+
+class RecyclingPool:
+    """Process pool whose workers are replaced after max_tasks tasks or once they exceed max_rss_mb.
+
+    Task-count recycling is ProcessPoolExecutor's own max_tasks_per_child.
+    For memory, every task reports its worker's RSS; the first report over
+    the limit retires the whole executor (its queued tasks still finish) and
+    new work goes to a fresh one, so a leaking parser cannot bloat a worker
+    for the rest of the run. An executor broken by a worker dying abruptly
+    is replaced the same way, and the tasks it lost are resubmitted (up to
+    BROKEN_POOL_RETRIES times each).
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_tasks=WORKER_MAX_TASKS, max_rss_mb=WORKER_MAX_RSS_MB):
+        self.max_workers = max_workers
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        self.recycled = 0
+        self.restarted = 0
+        self.peak_rss_mb = 0.0
+        self._lock = threading.Lock()
+        self._retired = []
+        self._outstanding = {}  # executor -> tasks submitted and not yet done
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        # max_tasks_per_child needs a non-fork start method.
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(PRELOAD)
+        return ProcessPoolExecutor(max_workers=self.max_workers, max_tasks_per_child=self.max_tasks or None,
+                                   mp_context=context)
+
+    def _replace(self, executor, broken=False, rss=0.0):
+        with self._lock:
+            if executor is not self._executor:
+                return  # already replaced
+            if broken:
+                log.warning("Parser pool broken (a worker died abruptly); starting a fresh pool")
+                self.restarted += 1
+            else:
+                log.info(f"Worker RSS {rss:.0f} MB exceeds {self.max_rss_mb} MB; starting a fresh pool")
+                self.recycled += 1
+            self._executor = self._new_executor()
+            self._retired.append(executor)
+            idle = not self._outstanding.get(executor)
+        if idle:
+            self._retire(executor)
+
+    def _retire(self, executor):
+        # Only shut a retired pool down once its queued tasks are done: a
+        # pool with max_tasks_per_child stops replacing workers after
+        # shutdown(), which would strand whatever it still had queued.
+        with self._lock:
+            self._outstanding.pop(executor, None)
+        executor.shutdown(wait=False)
+
+    def _task_done(self, executor):
+        with self._lock:
+            self._outstanding[executor] = self._outstanding.get(executor, 1) - 1
+            drained = executor is not self._executor and not self._outstanding[executor]
+        if drained:
+            self._retire(executor)
+
+    def _start(self, outer, fn, args, retries):
+        """Submit fn(*args) to the current executor, resolving `outer` when it finishes."""
+        while True:
+            with self._lock:
+                executor = self._executor
+                self._outstanding[executor] = self._outstanding.get(executor, 0) + 1
+            try:
+                inner = executor.submit(_call_with_rss, fn, args)
+                break
+            except BrokenProcessPool:
+                self._task_done(executor)
+                if not retries:
+                    raise
+                retries -= 1
+                self._replace(executor, broken=True)
+            except BaseException:
+                self._task_done(executor)
+                raise
+
+        def unwrap(f):
+            self._task_done(executor)
+            if f.cancelled():
+                outer.cancel()
+                return
+            exc = f.exception()
+            if isinstance(exc, BrokenProcessPool) and retries:
+                self._replace(executor, broken=True)
+                try:
+                    self._start(outer, fn, args, retries - 1)
+                except BaseException as e:
+                    outer.set_exception(e)
+                return
+            if exc is not None:
+                outer.set_exception(exc)
+                return
+            result, rss = f.result()
+            self.peak_rss_mb = max(self.peak_rss_mb, rss)
+            outer.set_result(result)
+            if self.max_rss_mb and rss > self.max_rss_mb:
+                self._replace(executor, rss=rss)
+
+        inner.add_done_callback(unwrap)
+
+    def submit(self, fn, *args):
+        outer = Future()
+        self._start(outer, fn, args, BROKEN_POOL_RETRIES)
+        return outer
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executors = [*self._retired, self._executor]
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide parser pool, started on first use and kept for the whole run."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RecyclingPool()
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the process-wide parser pool, if one was started."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
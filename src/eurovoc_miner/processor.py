@@ -1,4 +1,7 @@
+import hashlib
+import re
 import polars as pl
+from .config import KEYWORD_OUTPUTS
 
 # optional preprocessing logic here
 # kept intentionally lean as overprocessing is detrimental for multi-purpose downstream tasks, see e.g. https://huggingface.co/datasets/EuropeanParliament/Eurovoc/discussions/5
@@ -25,29 +28,111 @@ def clean_text_batch(df: pl.DataFrame) -> pl.DataFrame:
         #.str.strip_chars()
     )
 
-def match_keywords(df: pl.DataFrame, keywords: list[str]) -> pl.DataFrame:
-    """Add boolean column for each keyword found in 'text'."""
+
+def keyword_column(kw: str, prefix: str = "match") -> str:
+    """Safe snake_case column name for a keyword, e.g. match_earth_observation."""
+    return f"{prefix}_{kw.lower().replace(' ', '_').replace('-', '_')}"
+
+def keyword_columns(keywords: list[str], prefix: str = "match") -> dict[str, str]:
+    """{keyword: column name} (see keyword_column) for distinct keywords.
+
+    Keywords that would share a name (EU and eu when case-sensitive, or
+    earth-observation and earth observation) each get a short hash of the
+    keyword appended, e.g. match_eu_608e01, so the names are unique and do
+    not depend on the keywords' order.
+    """
+    names = {kw: keyword_column(kw, prefix) for kw in keywords}
+    taken = {}
+    for name in names.values():
+        taken[name] = taken.get(name, 0) + 1
+    return {kw: name if taken[name] == 1 else f"{name}_{hashlib.sha1(kw.encode()).hexdigest()[:6]}"
+            for kw, name in names.items()}
+
+def load_keywords(path: str) -> list[str]:
+    """Read one keyword per line. Blank lines and lines starting with '#' are skipped."""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def _keyword_patterns(keywords: list[str], case_sensitive: bool) -> list[str]:
+    patterns = keywords if case_sensitive else [kw.lower() for kw in keywords]
+    return list(dict.fromkeys(patterns))
+
+def _folded_text(case_sensitive: bool) -> pl.Expr:
+    return pl.col("text") if case_sensitive else pl.col("text").str.to_lowercase()
+
+def _whole_word_regex(patterns: list[str]) -> str:
+    # Longest first, so "earth observation" wins over "earth" at the same position.
+    alternation = "|".join(re.escape(p) for p in sorted(patterns, key=len, reverse=True))
+    return rf"\b(?:{alternation})\b"
+
+def match_keywords(df: pl.DataFrame, keywords: list[str], whole_word: bool = False,
+                   case_sensitive: bool = False, output: str = "bool") -> pl.DataFrame:
+    """Add one column per keyword found in 'text' (one scan per text unless whole_word).
+
+    All keywords are compiled into a single Aho-Corasick automaton (Polars'
+    extract_many) instead of one regex pass per keyword. With whole_word each
+    keyword is matched by its own \\b-anchored regex: a single alternation
+    would only yield leftmost-longest, non-overlapping hits and lose a
+    keyword nested in a longer one (earth in "earth observation").
+
+    output selects the columns: 'bool' adds match_<kw> booleans, 'count' adds
+    count_<kw> hit counts and 'offset' adds offset_<kw> with the byte offset of
+    the first hit in the case-folded text (null when absent). Colliding names
+    are disambiguated (see keyword_columns).
+    """
     if not keywords:
         return df
-        
+    if output not in KEYWORD_OUTPUTS:
+        raise ValueError(f"Unknown keyword output '{output}', expected one of {KEYWORD_OUTPUTS}")
+
+    patterns = _keyword_patterns(keywords, case_sensitive)
+    text = _folded_text(case_sensitive)
+    names = keyword_columns(patterns, {"bool": "match"}.get(output, output))
+    if whole_word:
+        expressions = []
+        for kw in patterns:
+            bounded = rf"\b{re.escape(kw)}\b"
+            if output == "bool":
+                expressions.append(text.str.contains(bounded).alias(names[kw]))
+            elif output == "count":
+                expressions.append(text.str.count_matches(bounded).cast(pl.UInt32).alias(names[kw]))
+            else:
+                expressions.append(text.str.find(bounded).alias(names[kw]))
+        return df.with_columns(expressions)
+
+    columns = {"__kw_hits": text.str.extract_many(patterns, overlapping=True)}
+    if output == "offset":
+        columns["__kw_offsets"] = text.str.find_many(patterns, overlapping=True)
+    tmp = df.with_columns(**columns)
+
     expressions = []
-    for kw in keywords:
-        # Create a safe column name
-        col_name = f"match_{kw.lower().replace(' ', '_').replace('-', '_')}"
-        # Case-insensitive literal search using regex (?i)
-        # We escape the keyword to ensure special characters don't break regex
-        import re
-        pattern = f"(?i){re.escape(kw)}"
-        expressions.append(
-            pl.col("text").str.contains(pattern).alias(col_name)
-        )
-    
-    return df.with_columns(expressions)
-
-def filter_keyword_matches(df: pl.DataFrame, keywords: list[str]) -> pl.DataFrame:
-    """Filter rows that have at least one keyword match."""
+    for kw in patterns:
+        found = pl.col("__kw_hits").list.eval(pl.element() == kw)
+        if output == "bool":
+            expressions.append(found.list.any().alias(names[kw]))
+        elif output == "count":
+            expressions.append(found.list.sum().cast(pl.UInt32).alias(names[kw]))
+        else:
+            first = pl.col("__kw_offsets").list.gather(
+                pl.col("__kw_hits").list.eval(pl.arg_where(pl.element() == kw))).list.first()
+            expressions.append(first.cast(pl.UInt32).alias(names[kw]))
+
+    return tmp.with_columns(expressions).drop([c for c in tmp.columns if c.startswith("__kw_")])
+
+def filter_keyword_matches(df: pl.DataFrame, keywords: list[str], whole_word: bool = False,
+                           case_sensitive: bool = False) -> pl.DataFrame:
+    """Filter rows that have at least one keyword match.
+
+    Evaluated straight on 'text', so each row stops scanning at its first hit
+    and the result does not depend on which keyword columns were added.
+    """
     if not keywords or df.is_empty():
         return df
-        
-    match_cols = [f"match_{kw.lower().replace(' ', '_').replace('-', '_')}" for kw in keywords]
-    return df.filter(pl.any_horizontal(pl.col(match_cols)))
\ No newline at end of file
+
+    patterns = _keyword_patterns(keywords, case_sensitive)
+    text = _folded_text(case_sensitive)
+    if whole_word:
+        matched = text.str.contains(_whole_word_regex(patterns))
+    else:
+        matched = text.str.contains_any(patterns)
+    return df.filter(matched.fill_null(False))
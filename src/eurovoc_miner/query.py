@@ -0,0 +1,86 @@
+import datetime
+import os
+import polars as pl
+from .config import SCHEMA
+
+DEFAULT_COLUMNS = ['date', 'celex', 'title', 'url']
+
+
+def _aligned(lf, columns):
+    """Project columns from one file's scan, tolerating columns it lacks."""
+    return lf.select([c for c in columns if c in lf.collect_schema()])
+
+
+def _with_columns(df, columns):
+    # Columns no scanned file has (e.g. a keyword column) come back as null.
+    return df.with_columns(pl.lit(None).alias(c) for c in columns if c not in df.columns).select(columns)
+
+
+def scan_daily_files(paths, columns, from_date=None, to_date=None):
+    """Lazy scan over daily parquet files with projection and date-predicate pushdown.
+
+    The core SCHEMA columns are read through one multi-file scan. Keyword
+    columns differ between files (they depend on each run's --keywords), so
+    when one is requested every file is projected on its own and the results
+    are aligned, with null where a file lacks the column.
+    """
+    wanted = list(dict.fromkeys([*columns, 'date']))
+    if all(c in SCHEMA for c in columns):
+        lf = pl.scan_parquet(paths).select(wanted)
+    else:
+        lf = pl.concat([_aligned(pl.scan_parquet(p), wanted) for p in paths], how='diagonal_relaxed')
+    if from_date is not None:
+        lf = lf.filter(pl.col('date') >= from_date.isoformat())
+    if to_date is not None:
+        # Dates may carry a time part, so compare against the next day.
+        lf = lf.filter(pl.col('date') < (to_date + datetime.timedelta(days=1)).isoformat())
+    return lf
+
+
+def fetch_rows(root, hits, columns):
+    """Load the given columns for index hits ({(file, row): ...}) only, file by file."""
+    by_file = {}
+    for path, row in hits:
+        by_file.setdefault(path, []).append(row)
+    frames = []
+    for path, rows in sorted(by_file.items()):
+        lf = pl.scan_parquet(os.path.join(root, path))
+        frames.append(_aligned(lf.with_row_index('_row').filter(pl.col('_row').is_in(sorted(rows))), columns))
+    if not frames:
+        return pl.DataFrame(schema={c: pl.String for c in columns})
+    return _with_columns(pl.concat(frames, how='diagonal_relaxed').collect(), columns)
+
+
+def run_query(catalog, index, prefix, lang_suffix, columns=DEFAULT_COLUMNS, filters=None,
+              from_date=None, to_date=None, limit=None):
+    """Answer a query over the daily files of one prefix/lang.
+
+    `filters` maps an indexed field (see docindex.INDEXED_FIELDS) to a list of
+    values; documents must match at least one value of every given field.
+    With filters the inverted index picks the (file, row) pairs and only those
+    rows are read; without, the whole range is scanned lazily. Either way
+    only the requested columns are decoded.
+    """
+    existing = catalog.existing(prefix, lang_suffix)
+    root = catalog.root
+    if filters:
+        allowed = {os.path.relpath(path, root) for path, _rows in existing.values()}
+        hits = None
+        for field, values in filters.items():
+            found = index.lookup(field, values, from_date, to_date)
+            hits = set(found) if hits is None else hits & set(found)
+        hits = sorted(h for h in hits if h[0] in allowed)
+        if limit:
+            hits = hits[:limit]
+        df = fetch_rows(root, hits, columns)
+    else:
+        paths = sorted(path for iso, (path, rows) in existing.items()
+                       if rows and (from_date is None or iso >= from_date.isoformat())
+                       and (to_date is None or iso <= to_date.isoformat()))
+        if not paths:
+            return pl.DataFrame(schema={c: pl.String for c in columns})
+        lf = scan_daily_files(paths, columns, from_date, to_date)
+        if limit:
+            lf = lf.head(limit)
+        df = _with_columns(lf.collect(), columns)
+    return df.sort([c for c in ('date', 'celex') if c in df.columns])
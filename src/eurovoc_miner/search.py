@@ -0,0 +1,311 @@
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import polars as pl
+from .config import FILES_DIR, FTS_DIR
+
+log = logging.getLogger(__name__)
+
+TOKEN_PATTERN = r"\w+"
+MAX_TOKEN_LENGTH = 64
+BM25_K1 = 1.2
+BM25_B = 0.75
+DOC_COLUMNS = ['celex', 'date', 'title', 'url']
+
+
+def tokenize(text):
+    """Tokens of a query string, normalised exactly like indexed text."""
+    return [t for t in re.findall(TOKEN_PATTERN, text.lower()) if len(t) <= MAX_TOKEN_LENGTH]
+
+
+def build_postings(df):
+    """Turn a daily frame into (postings, docs) frames.
+
+    postings: one row per (term, row) with the term frequency and the token
+    positions, sorted by term so each segment's row-group statistics let a
+    term lookup skip most of the file. docs: the identity columns and token
+    count (for BM25 length normalisation) per row.
+    """
+    tokens = (df.with_row_index('row')
+                .select('row', pl.col('text').fill_null('').str.to_lowercase()
+                        .str.extract_all(TOKEN_PATTERN).alias('term')))
+    docs = df.select([c for c in DOC_COLUMNS if c in df.columns]).with_row_index('row').with_columns(
+        tokens['term'].list.len().cast(pl.UInt32).alias('length'))
+    postings = (tokens
+                .with_columns(pl.int_ranges(0, pl.col('term').list.len(), dtype=pl.UInt32).alias('pos'))
+                .explode('term', 'pos')
+                .drop_nulls('term')
+                .filter(pl.col('term').str.len_chars() <= MAX_TOKEN_LENGTH)
+                .group_by('term', 'row')
+                .agg(pl.len().cast(pl.UInt32).alias('tf'), pl.col('pos').sort().alias('positions'))
+                .sort('term', 'row'))
+    return postings, docs
+
+
+def _parse_query(query):
+    """Parse a query into a tree of ('term', t) / ('phrase', [t...]) / ('and'|'or', [a, b]) / ('not', a).
+
+    Grammar: juxtaposition and AND bind tighter than OR, NOT negates the next
+    operand, parentheses group and "double quotes" make a phrase.
+    """
+    tokens = re.findall(r'"[^"]*"|\(|\)|[^\s()"]+', query)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == 'OR':
+            take()
+            node = ('or', [node, parse_and()])
+        return node
+
+    def parse_and():
+        node = parse_unary()
+        while peek() not in (None, 'OR', ')'):
+            if peek() == 'AND':
+                take()
+            node = ('and', [node, parse_unary()])
+        return node
+
+    def parse_unary():
+        if peek() == 'NOT':
+            take()
+            return ('not', parse_unary())
+        return parse_atom()
+
+    def parse_atom():
+        if peek() is None:
+            raise ValueError(f"Unexpected end of query: {query!r}")
+        tok = take()
+        if tok == '(':
+            node = parse_or()
+            if peek() != ')':
+                raise ValueError(f"Unbalanced parentheses in query: {query!r}")
+            take()
+            return node
+        words = tokenize(tok.strip('"'))
+        if not words:
+            raise ValueError(f"Query term {tok!r} has no searchable tokens")
+        # Unquoted words that tokenise to several tokens (state-aid) are phrases too.
+        return ('phrase', words) if len(words) > 1 else ('term', words[0])
+
+    tree = parse_or()
+    if peek() is not None:
+        raise ValueError(f"Unexpected {peek()!r} in query: {query!r}")
+    return tree
+
+
+def _query_terms(node, positive=True):
+    """Terms of a query tree, split into those that contribute to the score and all of them."""
+    kind = node[0]
+    if kind == 'term':
+        return ({node[1]} if positive else set()), {node[1]}
+    if kind == 'phrase':
+        return (set(node[1]) if positive else set()), set(node[1])
+    if kind == 'not':
+        return set(), _query_terms(node[1], False)[1]
+    scoring, everything = set(), set()
+    for child in node[1]:
+        s, e = _query_terms(child, positive)
+        scoring |= s
+        everything |= e
+    return scoring, everything
+
+
+def _has_not(node):
+    if node[0] == 'not':
+        return True
+    return node[0] in ('and', 'or') and any(_has_not(child) for child in node[1])
+
+
+def _evaluate(node, postings, universe):
+    """Set of rows of one segment matching the tree; postings is {term: {row: positions}}."""
+    kind = node[0]
+    if kind == 'term':
+        return set(postings.get(node[1], {}))
+    if kind == 'phrase':
+        first, *rest = node[1]
+        rows = set(postings.get(first, {}))
+        for term in rest:
+            rows &= set(postings.get(term, {}))
+        matched = set()
+        for row in rows:
+            starts = set(postings[first][row])
+            for offset, term in enumerate(rest, 1):
+                starts &= {p - offset for p in postings[term][row]}
+            if starts:
+                matched.add(row)
+        return matched
+    if kind == 'not':
+        return universe - _evaluate(node[1], postings, universe)
+    results = [_evaluate(child, postings, universe) for child in node[1]]
+    return set.intersection(*results) if kind == 'and' else set.union(*results)
+
+
+class SearchIndex:
+    """Full-text index made of one immutable segment per daily file.
+
+    A segment is a pair of parquet files next to each other under FTS_DIR,
+    mirroring the daily file's path: <stem>.postings.parquet (term, row, tf,
+    positions; zstd) and <stem>.docs.parquet (row, celex, date, title, url,
+    length). Indexing a newly mined day only writes its own segment and
+    records it in a small SQLite manifest, together with the daily file's
+    sha256, so a changed day is re-indexed and untouched days never are.
+    Corpus statistics for BM25 (document count, average length) come from
+    the manifest.
+    """
+
+    def __init__(self, root=FTS_DIR, files_root=FILES_DIR):
+        self.root = root
+        self.files_root = files_root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'segments.sqlite'), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS segments (
+                path TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                n_docs INTEGER NOT NULL,
+                total_length INTEGER NOT NULL
+            )""")
+
+    def _segment_paths(self, rel_path):
+        stem = os.path.join(self.root, os.path.splitext(rel_path)[0])
+        return f"{stem}.postings.parquet", f"{stem}.docs.parquet"
+
+    def add(self, rel_path, sha256):
+        """Index (or re-index) one daily file, given relative to FILES_DIR."""
+        lf = pl.scan_parquet(os.path.join(self.files_root, rel_path))
+        available = lf.collect_schema()
+        df = lf.select([c for c in [*DOC_COLUMNS, 'text'] if c in available]).collect()
+        postings, docs = build_postings(df) if len(df) and 'text' in df.columns else (None, None)
+        for frame, path in zip((postings, docs), self._segment_paths(rel_path)):
+            if frame is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            frame.write_parquet(tmp, compression='zstd', statistics=True, row_group_size=65536)
+            os.replace(tmp, path)
+        n_docs = len(docs) if docs is not None else 0
+        total_length = int(docs['length'].sum()) if n_docs else 0
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?)",
+                               (rel_path, sha256, n_docs, total_length))
+
+    def remove(self, rel_path):
+        for path in self._segment_paths(rel_path):
+            if os.path.exists(path):
+                os.remove(path)
+        with self._lock:
+            self._conn.execute("DELETE FROM segments WHERE path = ?", (rel_path,))
+
+    def sync(self, catalog):
+        """Index new or changed cataloged files and drop segments of deleted ones. Returns (added, removed)."""
+        cataloged = {path: sha256 for path, sha256, _size in catalog.files()}
+        with self._lock:
+            known = dict(self._conn.execute("SELECT path, sha256 FROM segments"))
+        todo = [(path, sha256) for path, sha256 in cataloged.items() if known.get(path) != sha256]
+        for i, (path, sha256) in enumerate(todo, 1):
+            try:
+                self.add(path, sha256)
+            except Exception as exc:
+                log.warning(f"Could not index text of {path}: {exc}")
+            if i % 500 == 0:
+                log.info(f"Full-text index: {i}/{len(todo)} files indexed")
+        gone = [path for path in known if path not in cataloged]
+        for path in gone:
+            self.remove(path)
+        if todo or gone:
+            log.info(f"Full-text index synced: {len(todo)} files indexed, {len(gone)} removed")
+        return len(todo), len(gone)
+
+    def search(self, query, paths, limit=20):
+        """Run a boolean/phrase query over the segments of the given daily files.
+
+        Returns a DataFrame of matching documents (celex, date, title, url,
+        file, row, score) ranked by BM25 over the non-negated query terms.
+        """
+        tree = _parse_query(query)
+        scoring_terms, all_terms = _query_terms(tree)
+        with self._lock:
+            segments = {path: (n, length) for path, n, length in
+                        self._conn.execute("SELECT path, n_docs, total_length FROM segments")}
+        segments = {p: segments[p] for p in paths if p in segments and segments[p][0]}
+        empty = pl.DataFrame(schema={**{c: pl.String for c in DOC_COLUMNS},
+                                     'file': pl.String, 'row': pl.UInt32, 'score': pl.Float64})
+        if not segments:
+            return empty
+        n_total = sum(n for n, _ in segments.values())
+        avgdl = sum(length for _, length in segments.values()) / n_total
+
+        by_postings_file = {self._segment_paths(p)[0]: p for p in segments}
+        hits = (pl.scan_parquet(list(by_postings_file), include_file_paths='segment')
+                  .filter(pl.col('term').is_in(list(all_terms)))
+                  .collect())
+        doc_freq = dict(hits.group_by('term').len().iter_rows())
+        idf = {t: math.log(1 + (n_total - doc_freq.get(t, 0) + 0.5) / (doc_freq.get(t, 0) + 0.5))
+               for t in scoring_terms}
+
+        per_segment = {}
+        for segment, term, row, tf, positions in hits.select('segment', 'term', 'row', 'tf', 'positions').iter_rows():
+            per_segment.setdefault(segment, {}).setdefault(term, {})[row] = (tf, positions)
+
+        results = []
+        needs_universe = _has_not(tree)
+        for postings_file, rel_path in by_postings_file.items():
+            seg_hits = per_segment.get(postings_file, {})
+            if not seg_hits and not needs_universe:
+                continue
+            positions = {t: {row: pos for row, (_tf, pos) in rows.items()} for t, rows in seg_hits.items()}
+            universe = set(range(segments[rel_path][0])) if needs_universe else set()
+            for row in _evaluate(tree, positions, universe):
+                results.append((rel_path, row))
+        if not results:
+            return empty
+
+        matched = pl.DataFrame(results, schema={'file': pl.String, 'row': pl.UInt32}, orient='row')
+        docs = pl.concat([
+            pl.scan_parquet(self._segment_paths(rel_path)[1]).with_columns(pl.lit(rel_path).alias('file'))
+            for rel_path in matched['file'].unique().to_list()
+        ], how='diagonal_relaxed').join(matched.lazy(), on=['file', 'row']).collect()
+
+        scores = []
+        for rel_path, row, length in docs.select('file', 'row', 'length').iter_rows():
+            seg_hits = per_segment.get(self._segment_paths(rel_path)[0], {})
+            score = 0.0
+            for term in scoring_terms:
+                tf = seg_hits.get(term, {}).get(row, (0, None))[0]
+                if tf:
+                    score += idf[term] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl))
+            scores.append(score)
+        return (docs.with_columns(pl.Series('score', scores, dtype=pl.Float64))
+                    .sort(['score', 'date'], descending=[True, True])
+                    .head(limit)
+                    .select(*[c for c in DOC_COLUMNS if c in docs.columns], 'file', 'row', 'score'))
+
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Return the process-wide SearchIndex."""
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex()
+    return _search_index
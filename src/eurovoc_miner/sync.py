@@ -0,0 +1,283 @@
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from .catalog import FILENAME_RE
+from .config import SYNC_MANIFEST_NAME, SYNC_BATCH_FILES, SYNC_WORKERS, WATCH_STATE_FILE
+
+log = logging.getLogger(__name__)
+
+# Remote paths are relative to the dataset's files/ directory and always use
+# '/', e.g. '2026/dataset_2026-04-01_eng.parquet'.
+MANIFEST_FIELDS = ('prefix', 'date', 'lang', 'rows', 'bytes', 'sha256')
+# Small files at the top of files/ that travel with the dataset: the watch
+# mode marks (see watch.py).
+STATE_FILES = (os.path.basename(WATCH_STATE_FILE),)
+
+
+class LocalBackend:
+    """A directory standing in for the remote copy of files/ (tests, mirrors, a mounted share)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _local(self, path):
+        return os.path.join(self.root, *path.split('/'))
+
+    def list(self, directory):
+        """Return {path: (bytes, sha256 or None)} for the files under directory."""
+        out = {}
+        base = self._local(directory)
+        for dirpath, _dirs, names in os.walk(base):
+            for name in names:
+                full = os.path.join(dirpath, name)
+                out[os.path.relpath(full, self.root).replace(os.sep, '/')] = (os.path.getsize(full), None)
+        return out
+
+    def read(self, path):
+        """Return the bytes of a small file (a manifest), or None if it does not exist."""
+        try:
+            with open(self._local(path), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def fetch(self, path, dest):
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        shutil.copyfile(self._local(path), tmp)
+        os.replace(tmp, dest)
+
+    def put(self, items, message, workers=SYNC_WORKERS):
+        """Write [(local path or bytes, path)]; `message` only matters to versioned backends."""
+        def write(item):
+            source, path = item
+            dest = self._local(path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = f"{dest}.{os.getpid()}.tmp"
+            if isinstance(source, bytes):
+                with open(tmp, 'wb') as f:
+                    f.write(source)
+            else:
+                shutil.copyfile(source, tmp)
+            os.replace(tmp, dest)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(write, items))
+
+
+class HFBackend:
+    """The files/ directory of a Hugging Face dataset repo (needs huggingface_hub).
+
+    The tree listing carries the sha256 of every LFS file, so comparing it
+    with the catalog hashes nothing locally and downloads nothing.
+    """
+
+    def __init__(self, repo_id, token=None, path_in_repo='files', repo_type='dataset'):
+        from huggingface_hub import HfApi
+        self.repo_id = repo_id
+        self.token = token
+        self.path_in_repo = path_in_repo
+        self.repo_type = repo_type
+        self.api = HfApi(token=token)
+
+    def _remote(self, path):
+        return f"{self.path_in_repo}/{path}"
+
+    def list(self, directory):
+        from huggingface_hub.hf_api import RepoFile
+        from huggingface_hub.utils import EntryNotFoundError
+        out = {}
+        try:
+            for item in self.api.list_repo_tree(self.repo_id, path_in_repo=self._remote(directory), recursive=True,
+                                                repo_type=self.repo_type):
+                if isinstance(item, RepoFile):
+                    path = item.path[len(self.path_in_repo) + 1:]
+                    out[path] = (item.size, item.lfs.sha256 if item.lfs else None)
+        except EntryNotFoundError:
+            pass
+        return out
+
+    def _download(self, path, local_dir):
+        from huggingface_hub import hf_hub_download
+        return hf_hub_download(self.repo_id, self._remote(path), repo_type=self.repo_type, token=self.token,
+                               local_dir=local_dir)
+
+    def read(self, path):
+        from huggingface_hub.utils import EntryNotFoundError
+        with tempfile.TemporaryDirectory(prefix='eur_lex_sync_') as tmp:
+            try:
+                with open(self._download(path, tmp), 'rb') as f:
+                    return f.read()
+            except EntryNotFoundError:
+                return None
+
+    def fetch(self, path, dest):
+        with tempfile.TemporaryDirectory(prefix='eur_lex_sync_', dir=os.path.dirname(dest)) as tmp:
+            os.replace(self._download(path, tmp), dest)
+
+    def put(self, items, message, workers=SYNC_WORKERS):
+        """One commit for [(local path or bytes, path)]; LFS uploads run `workers` at a time."""
+        from huggingface_hub import CommitOperationAdd
+        operations = [CommitOperationAdd(path_in_repo=self._remote(path), path_or_fileobj=source)
+                      for source, path in items]
+        self.api.create_commit(self.repo_id, operations, commit_message=message, repo_type=self.repo_type,
+                               num_threads=workers)
+
+
+def open_backend(spec, token=None):
+    """'hf://<user>/<dataset>' -> HFBackend (token defaults to HF_TOKEN); anything else is a LocalBackend directory."""
+    if spec.startswith('hf://'):
+        return HFBackend(spec[len('hf://'):], token=token or os.environ.get('HF_TOKEN'))
+    return LocalBackend(spec)
+
+
+def _manifest_path(year):
+    return f"{year}/{SYNC_MANIFEST_NAME}"
+
+
+def read_manifest(backend, year):
+    """Return {path: {prefix, date, lang, rows, bytes, sha256}} for a year on the remote, or None if it has no manifest."""
+    data = backend.read(_manifest_path(year))
+    if data is None:
+        return None
+    return json.loads(data)['files']
+
+
+def _manifest_bytes(files):
+    return json.dumps({'version': 1, 'files': dict(sorted(files.items()))}, indent=0).encode()
+
+
+def _transfer(jobs, workers):
+    """Run (fn, *args) jobs on a thread pool, failing on the first error."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(*job) for job in jobs]:
+            future.result()
+
+
+def pull(backend, catalog, from_date, to_date=None, download_from=None, prefix=None, langs=None,
+         workers=SYNC_WORKERS):
+    """Seed the catalog from the remote copy for [from_date, to_date]. Returns (files known, files downloaded).
+
+    Only the per-year manifests are read: their entries go into the
+    catalog's remote table, so backfill gap detection sees the remote files
+    (and their row counts) without having them. Files dated from
+    download_from on are downloaded too, unless an identical copy is
+    already local, for runs that read them (--reuse-existing). prefix and
+    langs restrict the downloads. A year without a manifest (pushed before
+    manifests existed) is downloaded whole, once; the next push writes its
+    manifest. STATE_FILES are fetched when there is no local copy.
+    """
+    to_date = to_date or datetime.date.today()
+    for name in STATE_FILES:
+        local_path = os.path.join(catalog.root, name)
+        data = None if os.path.exists(local_path) else backend.read(name)
+        if data is not None:
+            os.makedirs(catalog.root, exist_ok=True)
+            with open(local_path, 'wb') as f:
+                f.write(data)
+    catalog.refresh()
+    local = {path.replace(os.sep, '/'): (sha256, size) for path, sha256, size in catalog.files()}
+
+    def wanted(entry_prefix, entry_lang):
+        return (prefix is None or entry_prefix == prefix) and (not langs or entry_lang in langs)
+
+    known, downloads = 0, []
+    for year in range(from_date.year, to_date.year + 1):
+        manifest = read_manifest(backend, year)
+        if manifest is None:
+            listing = backend.list(str(year))
+            matches = {path: size for path, (size, _sha) in listing.items()
+                       if (m := FILENAME_RE.match(path.rsplit('/', 1)[-1]))
+                       and wanted(m['prefix'], m['lang'] or '')}
+            log.warning(f"No sync manifest for {year} on the remote; downloading its {len(matches)} files once")
+            downloads += [path for path, size in matches.items() if local.get(path, (None, None))[1] != size]
+            continue
+        entries = [(path.replace('/', os.sep), *(e[f] for f in MANIFEST_FIELDS)) for path, e in manifest.items()]
+        catalog.set_remote(str(year), entries)
+        known += len(entries)
+        if download_from is not None:
+            first, last = max(from_date, download_from).isoformat(), to_date.isoformat()
+            downloads += [path for path, e in manifest.items()
+                          if first <= e['date'] <= last and wanted(e['prefix'], e['lang'])
+                          and local.get(path, (None,))[0] != e['sha256']]
+
+    jobs = []
+    for path in downloads:
+        dest = os.path.join(catalog.root, *path.split('/'))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        jobs.append((backend.fetch, path, dest))
+    _transfer(jobs, workers)
+    if downloads:
+        catalog.refresh()
+    log.info(f"Sync pull: {known} remote files known from manifests ({from_date} -> {to_date}), "
+             f"{len(downloads)} downloaded")
+    return known, len(downloads)
+
+
+def plan_push(backend, catalog):
+    """Compare the catalog with the remote listing. Returns ([changed paths], {year: new manifest}).
+
+    A remote file counts as unchanged when its sha256 (from the listing, or
+    from the manifest if the listing has none and the size matches) equals
+    the cataloged one, so nothing is hashed again.
+    """
+    by_year = {}
+    for path, *fields in catalog.entries():
+        path = path.replace(os.sep, '/')
+        if '/' in path:
+            by_year.setdefault(path.split('/', 1)[0], {})[path] = dict(zip(MANIFEST_FIELDS, fields))
+
+    changed, manifests = [], {}
+    for year, entries in sorted(by_year.items()):
+        listing = backend.list(year)
+        old = read_manifest(backend, year) or {}
+        for path, entry in entries.items():
+            size, sha256 = listing.get(path, (None, None))
+            if sha256 is None and path in old and old[path]['bytes'] == size:
+                sha256 = old[path]['sha256']
+            if sha256 != entry['sha256']:
+                changed.append(path)
+        # Remote files without a local copy keep their entries.
+        manifest = {path: e for path, e in old.items() if path in listing}
+        manifest.update(entries)
+        if manifest != old:
+            manifests[year] = manifest
+    return changed, manifests
+
+
+def push(backend, catalog, message, workers=SYNC_WORKERS, batch_files=SYNC_BATCH_FILES, dry_run=False):
+    """Upload the cataloged files whose bytes differ from the remote copy, plus the updated manifests.
+
+    Files go up in batches of batch_files (one commit each on HF), with
+    `workers` transfers in flight. The manifests (and STATE_FILES) are part
+    of the last batch, so they never describe files that failed to upload. Returns the paths
+    of the changed files.
+    """
+    catalog.refresh()
+    changed, manifests = plan_push(backend, catalog)
+    sizes = {path.replace(os.sep, '/'): size for path, _sha256, size in catalog.files()}
+    n_bytes = sum(sizes[path] for path in changed)
+    states = []
+    for name in STATE_FILES:
+        local_path = os.path.join(catalog.root, name)
+        if os.path.exists(local_path):
+            with open(local_path, 'rb') as f:
+                data = f.read()
+            if data != backend.read(name):
+                states.append((data, name))
+    log.info(f"Sync push: {len(changed)} of {len(sizes)} files changed ({n_bytes / 1e6:.1f} MB), "
+             f"{len(manifests)} manifests and {len(states)} state files to update")
+    if dry_run or not (changed or manifests or states):
+        return changed
+
+    items = [(os.path.join(catalog.root, *path.split('/')), path) for path in changed]
+    batches = [items[i:i + batch_files] for i in range(0, len(items), batch_files)] or [[]]
+    batches[-1] += [(_manifest_bytes(files), _manifest_path(year)) for year, files in manifests.items()]
+    batches[-1] += states
+    for i, batch in enumerate(batches, 1):
+        backend.put(batch, message if len(batches) == 1 else f"{message} ({i}/{len(batches)})", workers=workers)
+        log.info(f"Sync push: batch {i}/{len(batches)} uploaded ({len(batch)} files)")
+    return changed
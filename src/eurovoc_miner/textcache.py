@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+import pyarrow as pa
+from .config import TEXT_CACHE_FILE, TEXT_CACHE_MAX_BYTES
+
+log = logging.getLogger(__name__)
+
+CacheEntry = namedtuple('CacheEntry', ['text', 'etag', 'last_modified'])
+
+
+def cache_key(url, accept, lang):
+    """Content address of an extracted text: only the request that produced it matters."""
+    return hashlib.sha256(f"{url}\n{accept}\n{lang}".encode()).hexdigest()
+
+
+class TextCache:
+    """Extracted-text cache keyed on (url, accept, lang), stored zstd-compressed in SQLite.
+
+    The ETag / Last-Modified validators Cellar sent with the original download
+    are kept alongside the text so callers can revalidate with a conditional
+    GET. Once the stored payload exceeds max_bytes, evict() drops the least
+    recently used entries. SQLite runs in WAL mode with a busy timeout, so the
+    file can be shared by several processes at once.
+    """
+
+    def __init__(self, path=TEXT_CACHE_FILE, max_bytes=TEXT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS texts (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                accept TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                raw_size INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS texts_accessed ON texts(accessed)")
+
+    def get(self, url, accept, lang):
+        """Return a CacheEntry, or None on a miss."""
+        key = cache_key(url, accept, lang)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, raw_size, etag, last_modified FROM texts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE texts SET accessed = ? WHERE key = ?", (time.time(), key))
+        data, raw_size, etag, last_modified = row
+        text = pa.decompress(data, decompressed_size=raw_size, codec='zstd', asbytes=True).decode('utf-8')
+        return CacheEntry(text, etag, last_modified)
+
+    def put(self, url, accept, lang, text, etag=None, last_modified=None):
+        raw = (text or '').encode('utf-8')
+        data = pa.compress(raw, codec='zstd', asbytes=True)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(url, accept, lang), url, accept, lang, etag, last_modified,
+                 len(raw), len(data), data, time.time()))
+
+    def record_stale(self):
+        """Count an entry whose validators no longer matched (the server sent a new body)."""
+        with self._lock:
+            self.stale += 1
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache is back under 90% of its budget."""
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM texts").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            target = int(self.max_bytes * 0.9)
+            doomed = []
+            for key, size in self._conn.execute("SELECT key, size FROM texts ORDER BY accessed"):
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("DELETE FROM texts WHERE key = ?", doomed)
+            self._conn.execute("COMMIT")
+        log.info(f"Text cache: evicted {len(doomed)} entries to stay under {self.max_bytes} bytes")
+        return len(doomed)
+
+    def stats(self):
+        with self._lock:
+            entries, size, raw_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM texts").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'stale': self.stale,
+                'entries': entries, 'bytes': size, 'raw_bytes': raw_size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_text_cache():
+    """Return the process-wide TextCache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TextCache()
+    return _cache
@@ -0,0 +1,271 @@
+import email.utils
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib3.util import Retry
+from .config import (LIMITER_MIN_CONCURRENCY, LIMITER_MAX_RATE, LIMITER_MIN_RATE, LIMITER_LATENCY_FACTOR,
+                     LIMITER_LATENCY_SLACK, LIMITER_BACKOFF, LIMITER_INTERVAL, LIMITER_MAX_PAUSE, LIMITER_LOG_INTERVAL,
+                     DOWNLOAD_CONCURRENCY, SPARQL_MAX_CONCURRENCY)
+from .metrics import get_metrics
+
+log = logging.getLogger(__name__)
+
+# Responses that mean the endpoint is overloaded, as opposed to a bad request.
+CONGESTION_STATUS = {429, 502, 503, 504}
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AdaptiveLimiter:
+    """Token bucket plus an AIMD concurrency limit for the requests to one endpoint.
+
+    Every request takes a slot (at most `limit` in flight) and a token (the
+    bucket refills at `rate` per second, 0 = no rate cap).
+
+    - A 429/502/503/504, a timeout or connection error, or a smoothed
+      time to first byte above both `latency_factor` x the best seen so
+      far and the best plus LIMITER_LATENCY_SLACK seconds, multiplies the
+      limit (and the rate) by `backoff`, at most once per `interval`.
+    - Otherwise, once per `interval` in which requests had to wait for a
+      slot, the limit grows by one and the rate by a twentieth of its cap.
+
+    A Retry-After header also pauses the bucket for that long. The limiter
+    is shared by every thread of the process; decisions are logged, and the
+    state ends up in the run report.
+    """
+
+    def __init__(self, name, max_concurrency, min_concurrency=LIMITER_MIN_CONCURRENCY, initial_concurrency=None,
+                 max_rate=LIMITER_MAX_RATE, min_rate=LIMITER_MIN_RATE, latency_factor=LIMITER_LATENCY_FACTOR,
+                 backoff=LIMITER_BACKOFF, interval=LIMITER_INTERVAL):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        if initial_concurrency is None:
+            initial_concurrency = max(self.min_concurrency, self.max_concurrency // 4)
+        self.limit = min(max(initial_concurrency, self.min_concurrency), self.max_concurrency)
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate) if max_rate else 0.0
+        self.rate = max_rate
+        self.latency_factor = latency_factor
+        self.backoff = backoff
+        self.interval = interval
+        self.in_flight = 0
+        self.backoffs = 0
+        self.lowest_limit = self.limit
+        self.highest_limit = self.limit
+        self._cond = threading.Condition()
+        self._tokens = float(max(1.0, max_rate))
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._congested = None     # reason of the first congestion signal since the last decision
+        self._saturated = False    # a request waited for a slot since the last decision
+        self._latency = None       # smoothed time to first byte
+        self._best_latency = None
+        self._decided = time.monotonic()
+        self._backed_off = 0.0
+        self._logged = (time.monotonic(), self.limit)
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def acquire(self):
+        """Block until a slot and a token are free."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.in_flight >= self.limit:
+                    self._saturated = True
+                    wait = None
+                elif self.rate and self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    break
+                self._cond.wait(wait)
+            if self.rate:
+                self._tokens -= 1
+            self.in_flight += 1
+
+    def release(self, status=None, latency=None, retry_after=None, error=None):
+        """Free the slot and feed the request's outcome to the controller."""
+        with self._cond:
+            self.in_flight -= 1
+            self._observe(status, latency, retry_after, error)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for one request. Yields report(response).
+
+        An exception raised before a response was reported (timeout,
+        connection error) counts as congestion.
+        """
+        self.acquire()
+        outcome = {}
+
+        def report(response):
+            outcome['response'] = response
+
+        error = None
+        try:
+            yield report
+        except Exception as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            response = outcome.get('response')
+            if response is None:
+                self.release(error=error)
+            else:
+                self.release(response.status_code, response.elapsed.total_seconds(),
+                             retry_after_seconds(response.headers.get('Retry-After')))
+
+    def observe(self, status=None, latency=None, retry_after=None, error=None):
+        """Feed an outcome that did not hold a slot (e.g. a response urllib3 is about to retry)."""
+        with self._cond:
+            self._observe(status, latency, retry_after, error)
+            self._cond.notify_all()
+
+    def _observe(self, status, latency, retry_after, error):
+        now = time.monotonic()
+        if retry_after and status in CONGESTION_STATUS:
+            pause = min(retry_after, LIMITER_MAX_PAUSE)
+            was_paused = now < self._paused_until
+            self._paused_until = max(self._paused_until, now + pause)
+            if not was_paused:
+                get_metrics().count(f"limiter_{self.name}_retry_after")
+                log.warning(f"Limiter {self.name}: HTTP {status} with Retry-After {retry_after:.0f}s, "
+                            f"pausing requests for {pause:.0f}s")
+        if latency is not None and status is not None and status < 400:
+            self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+            self._best_latency = self._latency if self._best_latency is None else min(self._best_latency, self._latency)
+        # Signals within an interval of a backoff mostly come from requests
+        # sent before it, so they don't cut the limit again.
+        if now - self._backed_off >= self.interval and not self._congested:
+            if error is not None:
+                self._congested = error
+            elif status in CONGESTION_STATUS:
+                self._congested = f"HTTP {status}"
+            elif self.latency_factor and self._latency is not None \
+                    and self._latency > max(self.latency_factor * self._best_latency,
+                                            self._best_latency + LIMITER_LATENCY_SLACK):
+                self._congested = (f"time to first byte {self._latency:.2f}s > "
+                                   f"{self.latency_factor:g} x {self._best_latency:.2f}s")
+        # Back off at once; grow at most once per interval.
+        if self._congested or now - self._decided >= self.interval:
+            self._decide(now)
+
+    def _decide(self, now):
+        old_limit, old_rate = self.limit, self.rate
+        if self._congested:
+            self.limit = max(self.min_concurrency, int(self.limit * self.backoff))
+            if self.max_rate:
+                self.rate = max(self.min_rate, self.rate * self.backoff)
+            self.backoffs += 1
+            self.lowest_limit = min(self.lowest_limit, self.limit)
+            get_metrics().count(f"limiter_{self.name}_backoffs")
+            log.warning(f"Limiter {self.name}: {self._congested}; concurrency {old_limit} -> {self.limit}"
+                        + (f", rate {old_rate:.1f} -> {self.rate:.1f}/s" if self.max_rate else ''))
+            self._logged = (now, self.limit)
+            self._backed_off = now
+            # Later samples are judged against the latency of the reduced load.
+            self._best_latency = self._latency
+        elif self._saturated:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+            if self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+            self.highest_limit = max(self.highest_limit, self.limit)
+            logged_at, logged_limit = self._logged
+            if self.limit != logged_limit and now - logged_at >= LIMITER_LOG_INTERVAL:
+                log.info(f"Limiter {self.name}: no congestion, concurrency {logged_limit} -> {self.limit}"
+                         + (f", rate {self.rate:.1f}/s" if self.max_rate else ''))
+                self._logged = (now, self.limit)
+        self._congested = None
+        self._saturated = False
+        self._decided = now
+
+    def stats(self):
+        return {'concurrency': self.limit, 'max_concurrency': self.max_concurrency,
+                'lowest_concurrency': self.lowest_limit, 'highest_concurrency': self.highest_limit,
+                'rate': round(self.rate, 2), 'max_rate': self.max_rate, 'backoffs': self.backoffs}
+
+
+class ThrottledRetry(Retry):
+    """urllib3 Retry that reports every retried response or error to a limiter.
+
+    urllib3 retries 5xx responses inside session.get(), so without this hook
+    the limiter would only ever see the final attempt.
+    """
+
+    def __init__(self, *args, limiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.limiter = self.limiter
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if self.limiter is not None:
+            if response is not None:
+                self.limiter.observe(response.status, retry_after=retry_after_seconds(response.headers.get('Retry-After')))
+            elif error is not None:
+                self.limiter.observe(error=type(error).__name__)
+        return super().increment(method=method, url=url, response=response, error=error,
+                                 _pool=_pool, _stacktrace=_stacktrace)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# Per endpoint: (max concurrency, rate cap, latency factor). SPARQL query
+# times depend on the window, not on load, so latency is not used there.
+_DEFAULTS = {
+    'cellar': lambda: (DOWNLOAD_CONCURRENCY, LIMITER_MAX_RATE, LIMITER_LATENCY_FACTOR),
+    'sparql': lambda: (SPARQL_MAX_CONCURRENCY, 0.0, 0.0),
+}
+
+
+def get_limiter(name='cellar'):
+    """Return the process-wide limiter for an endpoint ('cellar' documents or 'sparql')."""
+    with _limiters_lock:
+        if name not in _limiters:
+            max_concurrency, max_rate, latency_factor = _DEFAULTS[name]()
+            _limiters[name] = AdaptiveLimiter(name, max_concurrency, max_rate=max_rate, latency_factor=latency_factor)
+        return _limiters[name]
+
+
+def configure_limiter(name='cellar', **limits):
+    """Replace an endpoint's limiter with one built from explicit limits (see AdaptiveLimiter)."""
+    with _limiters_lock:
+        max_concurrency, max_rate, latency_factor = _DEFAULTS[name]()
+        limits.setdefault('max_concurrency', max_concurrency)
+        limits.setdefault('max_rate', max_rate)
+        limits.setdefault('latency_factor', latency_factor)
+        _limiters[name] = AdaptiveLimiter(name, **limits)
+        return _limiters[name]
+
+
+def limiter_stats():
+    """{name: stats} of the limiters used so far."""
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in sorted(_limiters.items())}
@@ -0,0 +1,69 @@
+import datetime
+import json
+import logging
+import os
+from .config import WATCH_STATE_FILE
+
+log = logging.getLogger(__name__)
+
+
+class WatchState:
+    """High-water marks of watch mode: {prefix: {lang key: ISO timestamp}} in a JSON file.
+
+    A mark is the upper bound of the last modification window that was
+    mined completely. The file is rewritten atomically, and only after
+    every file touched by the pass has been written.
+    """
+
+    def __init__(self, path=WATCH_STATE_FILE):
+        self.path = path
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._marks = json.load(f)
+        except FileNotFoundError:
+            self._marks = {}
+
+    def mark(self, prefix, keys):
+        """The earliest mark of the language keys (None = every language), or None if one has none yet."""
+        marks = self._marks.get(prefix, {})
+        values = [marks.get(key or '') for key in keys]
+        if not values or None in values:
+            return None
+        return min(datetime.datetime.fromisoformat(v) for v in values)
+
+    def advance(self, prefix, keys, until):
+        marks = self._marks.setdefault(prefix, {})
+        for key in keys:
+            marks[key or ''] = until.isoformat()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._marks, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def merge_into(path, df, keys=('url',)):
+    """Merge freshly mined rows into a per-day parquet. Returns (rows replaced, rows in the file).
+
+    Existing rows sharing any of `keys` with a new row are replaced by it,
+    others are kept, so documents whose text could not be fetched this time
+    keep their previous row. Columns missing on either side (e.g. other
+    keyword columns) are filled with nulls. The file is replaced
+    atomically. It must exist: rows of a few modified works are not a day's
+    file, so FileNotFoundError is raised rather than creating one.
+    """
+    import polars as pl
+
+    existing = pl.read_parquet(path)
+    stale = pl.lit(False)
+    for key in keys:
+        if key in existing.columns and key in df.columns:
+            values = df[key].filter(df[key].is_not_null() & (df[key] != ''))
+            stale = stale | pl.col(key).is_in(values.implode())
+    kept = existing.filter(~stale.fill_null(False))
+    replaced = len(existing) - len(kept)
+    df = pl.concat([kept, df], how='diagonal_relaxed') if len(kept) else df
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.write_parquet(tmp)
+    os.replace(tmp, path)
+    return replaced, len(df)
@@ -0,0 +1,220 @@
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from .config import QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS
+
+log = logging.getLogger(__name__)
+
+
+def _now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class WorkQueue:
+    """SQLite queue of backfill tasks with time-limited leases.
+
+    One row per (prefix, date, lang): pending -> leased -> done, or back to
+    pending after a failure until max_attempts is reached (then failed). A
+    worker claims whole dates (all their languages at once, so they share
+    one SPARQL query), keeps its leases alive with heartbeat() while mining,
+    and marks each file done or failed; an outcome is only recorded while
+    the worker still holds the lease. Leases of a worker that died expire
+    after lease_seconds and are claimed again by anyone. Done tasks are not
+    redone, so a restarted run carries on where the queue stopped, unless
+    they are enqueued again (a later scan found their file missing or
+    empty), which also gives failed tasks a fresh set of attempts.
+
+    The default path ':memory:' gives a queue private to one run. A file
+    can be shared by any number of worker processes, or hosts on a
+    filesystem with working SQLite locking.
+    """
+
+    def __init__(self, path=':memory:', lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                prefix TEXT NOT NULL,
+                date TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                status TEXT,
+                rows INTEGER,
+                path TEXT,
+                error TEXT,
+                enqueued_at TEXT NOT NULL,
+                finished_at TEXT,
+                PRIMARY KEY (prefix, date, lang)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks(prefix, state, date)")
+
+    def enqueue(self, prefix, tasks):
+        """Add (iso_date, lang, reason) tasks. Returns the number added or reopened.
+
+        A known done or failed task is reset to pending with no attempts;
+        pending and leased ones are left alone.
+        """
+        rows = [(prefix, date, lang, reason, _now_iso()) for date, lang, reason in tasks]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("INSERT INTO tasks (prefix, date, lang, reason, enqueued_at) VALUES (?, ?, ?, ?, ?) "
+                                   "ON CONFLICT (prefix, date, lang) DO UPDATE SET "
+                                   "reason = excluded.reason, state = 'pending', owner = NULL, lease_expires = NULL, "
+                                   "attempts = 0, status = NULL, rows = NULL, path = NULL, error = NULL, "
+                                   "enqueued_at = excluded.enqueued_at, finished_at = NULL "
+                                   "WHERE state IN ('done', 'failed')", rows)
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def claim(self, prefix, owner, langs, max_dates):
+        """Lease the tasks of up to max_dates dates (earliest first). Returns {iso_date: {lang: reason}}.
+
+        Pending tasks and tasks whose lease has expired are both claimable;
+        only tasks in `langs` are considered.
+        """
+        now = time.time()
+        marks = ','.join('?' * len(langs))
+        claimable = (f"prefix = ? AND lang IN ({marks}) AND "
+                     f"(state = 'pending' OR (state = 'leased' AND lease_expires < ?))")
+        params = (prefix, *langs, now)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = self._conn.execute(f"SELECT COUNT(*) FROM tasks WHERE {claimable} AND state = 'leased'",
+                                             params).fetchone()[0]
+                dates = [d for (d,) in self._conn.execute(
+                    f"SELECT DISTINCT date FROM tasks WHERE {claimable} ORDER BY date LIMIT ?", (*params, max_dates))]
+                claimed = {}
+                if dates:
+                    date_marks = ','.join('?' * len(dates))
+                    rows = self._conn.execute(
+                        f"SELECT date, lang, reason FROM tasks WHERE {claimable} AND date IN ({date_marks})",
+                        (*params, *dates)).fetchall()
+                    self._conn.execute(
+                        f"UPDATE tasks SET state = 'leased', owner = ?, lease_expires = ? "
+                        f"WHERE {claimable} AND date IN ({date_marks})",
+                        (owner, now + self.lease_seconds, *params, *dates))
+                    for date, lang, reason in rows:
+                        claimed.setdefault(date, {})[lang] = reason
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if expired:
+            log.warning(f"Reclaimed {expired} expired leases")
+        return claimed
+
+    def renew(self, owner):
+        """Extend every lease held by owner. Returns the number renewed."""
+        with self._lock:
+            return self._conn.execute("UPDATE tasks SET lease_expires = ? WHERE state = 'leased' AND owner = ?",
+                                      (time.time() + self.lease_seconds, owner)).rowcount
+
+    @contextmanager
+    def heartbeat(self, owner):
+        """Renew owner's leases every third of the lease time while the block runs; release them on exit."""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(self.lease_seconds / 3):
+                self.renew(owner)
+
+        thread = threading.Thread(target=run, name='queue-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            released = self.release(owner)
+            if released:
+                log.info(f"Released {released} unfinished leases")
+
+    def release(self, owner):
+        """Hand owner's unfinished leases back to the queue. Returns the number released."""
+        with self._lock:
+            return self._conn.execute("UPDATE tasks SET state = 'pending', owner = NULL, lease_expires = NULL "
+                                      "WHERE state = 'leased' AND owner = ?", (owner,)).rowcount
+
+    def complete(self, prefix, date, lang, owner, status, rows, path):
+        """Mark owner's leased task done. Returns False, recording nothing, if owner no longer holds it."""
+        with self._lock:
+            done = self._conn.execute("UPDATE tasks SET state = 'done', status = ?, rows = ?, path = ?, error = NULL, "
+                                      "attempts = attempts + 1, lease_expires = NULL, finished_at = ? "
+                                      "WHERE prefix = ? AND date = ? AND lang = ? AND state = 'leased' AND owner = ?",
+                                      (status, rows, path, _now_iso(), prefix, date, lang, owner)).rowcount
+        if not done:
+            log.warning(f"Lease on {prefix}{date} {lang} lost by {owner}, its outcome was not recorded")
+        return bool(done)
+
+    def fail(self, prefix, date, lang, owner, error):
+        """Record a failed attempt of owner's leased task. Returns True if it goes back to pending for another try.
+
+        Nothing is recorded (and False returned) if owner no longer holds it.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT attempts FROM tasks WHERE prefix = ? AND date = ? AND lang = ? "
+                                         "AND state = 'leased' AND owner = ?", (prefix, date, lang, owner)).fetchone()
+                retry = row is not None and row[0] + 1 < self.max_attempts
+                if row is not None:
+                    self._conn.execute("UPDATE tasks SET state = ?, attempts = attempts + 1, error = ?, owner = NULL, "
+                                       "lease_expires = NULL, finished_at = ? "
+                                       "WHERE prefix = ? AND date = ? AND lang = ?",
+                                       ('pending' if retry else 'failed', error, _now_iso(), prefix, date, lang))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            log.warning(f"Lease on {prefix}{date} {lang} lost by {owner}, its failure was not recorded")
+        return retry
+
+    def reclaim(self):
+        """Put every expired lease back to pending. Returns the number reclaimed."""
+        with self._lock:
+            n = self._conn.execute("UPDATE tasks SET state = 'pending', owner = NULL, lease_expires = NULL "
+                                   "WHERE state = 'leased' AND lease_expires < ?", (time.time(),)).rowcount
+        if n:
+            log.warning(f"Reclaimed {n} expired leases")
+        return n
+
+    def summary(self, prefix, langs=None, from_date=None, to_date=None):
+        """Counts and per-task details of the queue for prefix (optionally langs and a date range)."""
+        query, params = "SELECT date, lang, reason, state, status, rows, path, error, attempts FROM tasks WHERE prefix = ?", [prefix]
+        if langs is not None:
+            query += f" AND lang IN ({','.join('?' * len(langs))})"
+            params += list(langs)
+        if from_date:
+            query, params = query + " AND date >= ?", params + [str(from_date)]
+        if to_date:
+            query, params = query + " AND date <= ?", params + [str(to_date)]
+        with self._lock:
+            tasks = self._conn.execute(query + " ORDER BY date, lang", params).fetchall()
+        out = {'tasks': len(tasks), 'pending': 0, 'leased': 0, 'done': 0, 'failed': 0, 'rows': 0, 'empty': 0,
+               'errors': [], 'empty_dates': []}
+        for date, lang, _reason, state, status, _rows, _path, error, _attempts in tasks:
+            out[state] += 1
+            if state == 'done':
+                out[status] += 1
+                if status == 'empty':
+                    out['empty_dates'].append((date, lang))
+            if error and state in ('failed', 'pending'):
+                out['errors'].append((date, lang, error))
+        return out
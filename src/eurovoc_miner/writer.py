@@ -0,0 +1,52 @@
+import os
+import pyarrow.parquet as pq
+
+
+def iter_batches(docs, batch_size, max_batch_bytes):
+    """Group a doc stream into lists of at most batch_size docs or max_batch_bytes of text."""
+    batch, size = [], 0
+    for doc in docs:
+        batch.append(doc)
+        size += len(doc.get('text') or '')
+        if len(batch) >= batch_size or size >= max_batch_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+class IncrementalParquetWriter:
+    """Append DataFrames to a single Parquet file, one row group per write().
+
+    The schema is fixed by the first frame; later frames are cast to it. Data
+    goes to a temporary file that replaces `path` on a clean exit, so an
+    interrupted run never leaves a truncated parquet behind.
+    """
+
+    def __init__(self, path, compression='zstd'):
+        self.path = path
+        self.rows = 0
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._compression = compression
+        self._writer = None
+
+    def write(self, df):
+        table = df.to_arrow()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._tmp, table.schema, compression=self._compression)
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._writer is not None:
+            self._writer.close()
+            if exc_type is None:
+                os.replace(self._tmp, self.path)
+            else:
+                os.remove(self._tmp)
+        return False